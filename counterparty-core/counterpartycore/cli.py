@@ -95,6 +95,22 @@ CONFIG_ARGS = [
             "help": "limit api calls to the set results (defaults to 1000). Setting to 0 removes the limit.",
         },
     ],
+    [
+        ("--api-max-offset",),
+        {
+            "type": int,
+            "default": config.DEFAULT_API_MAX_OFFSET,
+            "help": f"maximum `offset` accepted by the API, deeper pages must be fetched with the `cursor` parameter (defaults to {config.DEFAULT_API_MAX_OFFSET}). Setting to 0 removes the limit.",
+        },
+    ],
+    [
+        ("--api-max-result-count",),
+        {
+            "type": int,
+            "default": config.DEFAULT_API_MAX_RESULT_COUNT,
+            "help": f"maximum `result_count` returned by the API, counting more rows is not worth the cost (defaults to {config.DEFAULT_API_MAX_RESULT_COUNT}). Setting to 0 removes the limit.",
+        },
+    ],
     [("--backend-name",), {"default": "addrindex", "help": "the backend name to connect to"}],
     [
         ("--backend-connect",),
@@ -138,7 +154,7 @@ CONFIG_ARGS = [
         {
             "action": "store_true",
             "default": False,
-            "help": "Skip asset conservation checking (default: false)",
+            "help": "Check the asset conservation after every block and after catching up (default: false)",
         },
     ],
     [
@@ -311,6 +327,54 @@ CONFIG_ARGS = [
             "help": "size of the database connection pool",
         },
     ],
+    [
+        ("--decoding-workers",),
+        {
+            "type": int,
+            "default": config.DEFAULT_DECODING_WORKERS,
+            "help": "number of processes decoding the transactions of the next blocks while catching up (0 to disable)",
+        },
+    ],
+    [
+        ("--snapshot-interval",),
+        {
+            "type": int,
+            "default": config.DEFAULT_SNAPSHOT_INTERVAL,
+            "help": "number of blocks between two snapshots of the database used by `rollback` and `reparse` (default: 0, disabled)",
+        },
+    ],
+    [
+        ("--api-watcher-batch-size",),
+        {
+            "type": int,
+            "default": config.DEFAULT_API_WATCHER_BATCH_SIZE,
+            "help": "minimum number of events applied in one transaction when the API database catches up (whole blocks are applied)",
+        },
+    ],
+    [
+        ("--api-watcher-rollback-depth",),
+        {
+            "type": int,
+            "default": config.DEFAULT_API_WATCHER_ROLLBACK_DEPTH,
+            "help": "number of blocks for which the API database keeps the state of the updated objects, deeper rollbacks require to rebuild the API database",
+        },
+    ],
+    [
+        ("--api-cache-size",),
+        {
+            "type": int,
+            "default": config.DEFAULT_API_CACHE_SIZE,
+            "help": "number of API responses cached and shared by the API workers (0 to disable the cache)",
+        },
+    ],
+    [
+        ("--profile",),
+        {
+            "action": "store_true",
+            "default": False,
+            "help": "record the time, SQL statements and rows written by block phase and message type while parsing (see `show-profile`)",
+        },
+    ],
     [
         ("--json-logs",),
         {
@@ -468,6 +532,17 @@ def main():
     )
     setup.add_config_arguments(parser_show_config, CONFIG_ARGS, configfile)
 
+    parser_show_profile = subparsers.add_parser(
+        "show-profile", help="Show the parse profile recorded with `--profile`"
+    )
+    parser_show_profile.add_argument(
+        "--format",
+        choices=["json", "prometheus"],
+        default="json",
+        help="the format of the profile (default: json)",
+    )
+    setup.add_config_arguments(parser_show_profile, CONFIG_ARGS, configfile)
+
     args = parser.parse_args()
 
     # Help message
@@ -497,6 +572,9 @@ def main():
     elif args.action == "show-params":
         server.show_params()
 
+    elif args.action == "show-profile":
+        server.show_profile(output_format=args.format)
+
     elif args.action == "vacuum":
         server.vacuum()
 
@@ -4,7 +4,6 @@ import multiprocessing
 import os
 import threading
 import time
-from collections import OrderedDict
 from multiprocessing import Process, Value
 
 import flask
@@ -15,11 +14,12 @@ from counterpartycore.lib import (
     config,
     exceptions,
     ledger,
+    profiler,
     script,
     sentry,
     util,
 )
-from counterpartycore.lib.api import api_watcher, queries, wsgi
+from counterpartycore.lib.api import api_watcher, cache, queries, wsgi
 from counterpartycore.lib.api.routes import ROUTES
 from counterpartycore.lib.api.util import (
     clean_rowids_and_confirmed_fields,
@@ -27,7 +27,9 @@ from counterpartycore.lib.api.util import (
     init_api_access_log,
     inject_details,
     to_json,
+    to_json_chunks,
 )
+from counterpartycore.lib.backend import addrindexrs
 from counterpartycore.lib.database import APIDBConnectionPool
 from flask import Flask, request
 from flask_httpauth import HTTPBasicAuth
@@ -41,9 +43,6 @@ logger = logging.getLogger(config.LOGGER_NAME)
 auth = HTTPBasicAuth()
 
 
-BLOCK_CACHE = OrderedDict()
-MAX_BLOCK_CACHE_SIZE = 1000
-
 CURR_DIR = os.path.dirname(os.path.realpath(__file__))
 BLUEPRINT_FILEPATH = os.path.join(CURR_DIR, "..", "..", "..", "..", "apiary.apib")
 
@@ -87,6 +86,52 @@ def is_cachable(rule):
     return False
 
 
+def get_cache_policy(rule):
+    """
+    Return `"block"` if the response of the request can be cached for the current block,
+    `"immutable"` if it never changes and `None` if it can't be cached.
+    """
+    if config.API_CACHE_SIZE == 0 or request.method != "GET" or not rule.startswith("/v2/"):
+        return None
+    if request.args.get("show_unconfirmed", "false").lower() in ["true", "1"]:
+        return None
+    if "/compose" in rule or "mempool" in rule:
+        return None
+    if rule in ["/v2/", "/v2/healthz", "/v2/profile", "/v2/cache"]:
+        return None
+    # past blocks never change once confirmed enough
+    if rule.startswith("/v2/blocks/<int:block_index>") and cache.is_immutable_block(
+        request.view_args["block_index"]
+    ):
+        return "immutable"
+    return "block"
+
+
+def is_confirmed_transaction(rule, result):
+    if rule not in ["/v2/transactions/<int:tx_index>", "/v2/transactions/<tx_hash>"]:
+        return False
+    return (
+        isinstance(result, dict)
+        and result.get("block_index") is not None
+        and cache.is_immutable_block(result["block_index"])
+    )
+
+
+def set_cache_headers(response, etag, immutable):
+    response.set_etag(etag)
+    if immutable:
+        response.headers["Cache-Control"] = cache.IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers["Cache-Control"] = cache.BLOCK_CACHE_CONTROL
+
+
+def return_not_modified(etag, immutable):
+    response = flask.Response(status=304)
+    set_cache_headers(response, etag, immutable)
+    set_cors_headers(response)
+    return response
+
+
 def return_result_if_not_ready(rule):
     return (
         is_cachable(rule)
@@ -130,17 +175,25 @@ def return_result(
     result_count=None,
     start_time=None,
     query_args=None,
+    body=None,
+    stream=False,
 ):
     assert result is None or error is None
-    api_result = {}
-    if result is not None:
-        api_result["result"] = result
-        if isinstance(result, list):
-            api_result["next_cursor"] = next_cursor
-            api_result["result_count"] = result_count
-    if error is not None:
-        api_result["error"] = error
-    response = flask.make_response(to_json(api_result), http_code)
+    if body is None:
+        api_result = {}
+        if result is not None:
+            api_result["result"] = result
+            if isinstance(result, list):
+                api_result["next_cursor"] = next_cursor
+                api_result["result_count"] = result_count
+        if error is not None:
+            api_result["error"] = error
+        if stream and isinstance(result, list):
+            # serialized while it is sent, one chunk of rows at a time
+            body = to_json_chunks(api_result)
+        else:
+            body = to_json(api_result)
+    response = flask.make_response(body, http_code)
     response.headers["X-COUNTERPARTY-HEIGHT"] = util.CURRENT_BLOCK_INDEX
     response.headers["X-COUNTERPARTY-READY"] = wsgi.is_server_ready()
     response.headers["X-COUNTERPARTY-VERSION"] = config.VERSION_STRING
@@ -208,41 +261,11 @@ def prepare_args(route, **kwargs):
     return function_args
 
 
-def execute_api_function(db, rule, route, function_args):
-    # cache everything for one block
-    cache_key = f"{util.CURRENT_BLOCK_INDEX}:{request.url}"
-    # except for blocks and transactions cached forever
-    if (
-        request.path.startswith("/v2/blocks/") or request.path.startswith("/v2/transactions/")
-    ) and not request.path.startswith("/v2/blocks/last"):
-        cache_key = request.url
-
-    with start_sentry_span(op="cache.get") as sentry_get_span:
-        sentry_get_span.set_data("cache.key", cache_key)
-        if cache_key in BLOCK_CACHE:
-            result = BLOCK_CACHE[cache_key]
-            sentry_get_span.set_data("cache.hit", True)
-            return result
-        else:
-            sentry_get_span.set_data("cache.hit", False)
-
-    with start_sentry_span(op="cache.put") as sentry_put_span:
+def execute_api_function(db, route, function_args):
+    with start_sentry_span(op="api.function"):
         if function_needs_db(route["function"]):
-            result = route["function"](db, **function_args)
-        else:
-            result = route["function"](**function_args)
-        # don't cache API v1 and mempool queries
-        if (
-            is_cachable(rule)
-            and route["function"].__name__ != "redirect_to_api_v1"
-            and not request.path.startswith("/v2/mempool/")
-        ):
-            sentry_put_span.set_data("cache.key", cache_key)
-            BLOCK_CACHE[cache_key] = result
-            if len(BLOCK_CACHE) > MAX_BLOCK_CACHE_SIZE:
-                BLOCK_CACHE.popitem(last=False)
-
-        return result
+            return route["function"](db, **function_args)
+        return route["function"](**function_args)
 
 
 def get_transaction_name(rule):
@@ -300,10 +323,28 @@ def handle_route(**kwargs):
 
     logger.trace(f"API Request - Arguments: {function_args}")
 
+    verbose = request.args.get("verbose", "False")
+    cache_policy = get_cache_policy(rule)
+    if cache_policy is not None:
+        # read before the query to not cache a response made obsolete by a rollback
+        blocks_version = cache.BLOCKS_VERSION.value
+        cache_key = cache.get_cache_key(rule, function_args, verbose.lower() in ["true", "1"])
+        with start_sentry_span(op="cache.get") as sentry_get_span:
+            sentry_get_span.set_data("cache.key", cache_key)
+            cached_response = cache.APIResponseCache().get(cache_key, util.CURRENT_BLOCK_INDEX)
+            sentry_get_span.set_data("cache.hit", cached_response is not None)
+        if cached_response is not None:
+            body, etag, immutable = cached_response
+            if request.if_none_match.contains(etag):
+                return return_not_modified(etag, immutable)
+            response = return_result(200, start_time=start_time, query_args=query_args, body=body)
+            set_cache_headers(response, etag, immutable)
+            return response
+
     # call the function
     try:
         with APIDBConnectionPool().connection() as db:
-            result = execute_api_function(db, rule, route, function_args)
+            result = execute_api_function(db, route, function_args)
     except (
         exceptions.JSONRPCInvalidRequest,
         flask.wrappers.BadRequest,
@@ -334,6 +375,9 @@ def handle_route(**kwargs):
         del headers["Connection"]  # remove "hop-by-hop" headers
         return result.content, result.status_code, headers
 
+    if isinstance(result, profiler.PrometheusText):
+        return flask.Response(result, mimetype="text/plain; version=0.0.4")
+
     # clean up and return the result
     if result is None:
         return return_result(404, error="Not found", start_time=start_time, query_args=query_args)
@@ -348,19 +392,39 @@ def handle_route(**kwargs):
     result = clean_rowids_and_confirmed_fields(result)
 
     # inject details
-    verbose = request.args.get("verbose", "False")
     if verbose.lower() in ["true", "1"]:
-        result = inject_details(db, result)
+        result = inject_details(db, result, use_worker_caches=True)
 
-    return return_result(
+    response = return_result(
         200,
         result=result,
         next_cursor=next_cursor,
         result_count=result_count,
         start_time=start_time,
         query_args=query_args,
+        # the body of the cached responses is needed in full
+        stream=cache_policy is None,
     )
 
+    if cache_policy is not None:
+        immutable = cache_policy == "immutable" or is_confirmed_transaction(rule, result)
+        body = response.get_data()
+        etag = cache.get_etag(body)
+        with start_sentry_span(op="cache.put") as sentry_put_span:
+            sentry_put_span.set_data("cache.key", cache_key)
+            cache.APIResponseCache().set(
+                cache_key,
+                None if immutable else util.CURRENT_BLOCK_INDEX,
+                body,
+                etag,
+                blocks_version,
+            )
+        if request.if_none_match.contains(etag):
+            return return_not_modified(etag, immutable)
+        set_cache_headers(response, etag, immutable)
+
+    return response
+
 
 def handle_not_found(error):
     return return_result(404, error="Not found")
@@ -403,14 +467,16 @@ def init_flask_app():
     return app
 
 
-def run_api_server(args, server_ready_value, stop_event):
+def run_api_server(args, server_ready_value, stop_event, event_feed):
     logger.info("Starting API Server process...")
 
     # Initialize Sentry, logging, config, etc.
     sentry.init()
     server.initialise_log_and_config(argparse.Namespace(**args), api=True)
+    cache.reset()
+    addrindexrs.reset_raw_transactions_cache()
 
-    watcher = api_watcher.APIWatcher()
+    watcher = api_watcher.APIWatcher(event_feed)
     watcher.start()
 
     app = init_flask_app()
@@ -485,12 +551,15 @@ class APIServer(object):
         self.process = None
         self.server_ready_value = Value("I", 0)
         self.stop_event = multiprocessing.Event()
+        # notified by the ledger, see `ledger.EVENT_FEED`
+        self.event_feed = api_watcher.EventFeed()
 
     def start(self, args):
         if self.process is not None:
             raise Exception("API Server is already running")
         self.process = Process(
-            target=run_api_server, args=(vars(args), self.server_ready_value, self.stop_event)
+            target=run_api_server,
+            args=(vars(args), self.server_ready_value, self.stop_event, self.event_feed),
         )
         self.process.start()
         return self.process
@@ -1,13 +1,15 @@
 import json
 import logging
+import multiprocessing
 import os
 import threading
 import time
+from multiprocessing import Value
 from random import randrange
 
 import apsw
 from counterpartycore.lib import blocks, config, database, exceptions, ledger
-from counterpartycore.lib.api import util
+from counterpartycore.lib.api import cache, util
 from counterpartycore.lib.util import format_duration
 from yoyo import get_backend, read_migrations
 from yoyo.exceptions import LockTimeout
@@ -50,6 +52,9 @@ ASSET_EVENTS = [
     "BURN",
 ]
 
+# events that change the fields of `assets_info` cached by the API workers
+ASSET_INFO_EVENTS = ["ASSET_CREATION", "ASSET_ISSUANCE", "RESET_ISSUANCE"]
+
 XCP_DESTROY_EVENTS = [
     "ASSET_ISSUANCE",
     "ASSET_DESTRUCTION",
@@ -89,6 +94,13 @@ EVENTS_ADDRESS_FIELDS = {
 SKIP_EVENTS = ["NEW_TRANSACTION_OUTPUT"]
 
 MEMPOOL_SKIP_EVENT_HASHES = []
+# transactions synchronized by `synchronize_mempool()`: for each tx_hash, the signature
+# of its events, the rows they inserted and the unconfirmed assets they created
+MEMPOOL_TRANSACTIONS = {}
+# seconds between two synchronizations of the mempool
+MEMPOOL_SYNC_INTERVAL = 10
+# worker caches to invalidate once the current transaction is committed
+STALE_WORKER_CACHES = set()
 
 
 def fetch_all(db, query, bindings=None):
@@ -126,6 +138,20 @@ def get_next_event_to_parse(api_db, ledger_db):
     return next_event
 
 
+def get_events_to_parse(ledger_db, last_parsed_message_index, chunk_size):
+    """
+    Yield the events after `last_parsed_message_index` in order. They are fetched `chunk_size`
+    at a time so the read transaction on the ledger database is not held during the catch up.
+    """
+    sql = "SELECT * FROM messages WHERE message_index > ? ORDER BY message_index ASC LIMIT ?"
+    while True:
+        events = fetch_all(ledger_db, sql, (last_parsed_message_index, chunk_size))
+        yield from events
+        if len(events) < chunk_size:
+            return
+        last_parsed_message_index = events[-1]["message_index"]
+
+
 def get_event_to_parse_count(api_db, ledger_db):
     last_parsed_message_index = get_last_parsed_message_index(api_db)
     sql = "SELECT message_index FROM messages ORDER BY message_index DESC LIMIT 1"
@@ -214,19 +240,114 @@ def get_event_previous_state(api_db, event):
     return previous_state
 
 
-def insert_event(api_db, event):
+def insert_previous_state(api_db, event):
+    if event["command"] not in ["update", "parse"]:
+        return
     previous_state = get_event_previous_state(api_db, event)
-    if previous_state is not None:
-        event["previous_state"] = util.to_json(previous_state)
-    else:
-        event["previous_state"] = None
+    if previous_state is None:
+        return
+    sql = """
+        INSERT INTO previous_states (message_index, block_index, previous_state)
+        VALUES (:message_index, :block_index, :previous_state)
+    """
+    bindings = {
+        "message_index": event["message_index"],
+        "block_index": event["block_index"],
+        "previous_state": util.to_json(previous_state),
+    }
+    cursor = api_db.cursor()
+    cursor.execute(sql, bindings)
+
+
+def get_rollback_previous_state(api_db, event):
+    saved_state = fetch_one(
+        api_db,
+        "SELECT previous_state FROM previous_states WHERE message_index = ?",
+        (event["message_index"],),
+    )
+    if saved_state is not None:
+        return json.loads(saved_state["previous_state"])
+    check_rollback_depth(api_db, event["block_index"])
+    # the updated row did not exist
+    return None
+
+
+def check_rollback_depth(api_db, block_index):
+    """
+    The previous states of the updated objects are only kept for the last
+    `config.API_WATCHER_ROLLBACK_DEPTH` blocks, deeper rollbacks require a rebuild.
+    """
+    sql = """
+        SELECT message_index FROM messages
+        WHERE block_index >= :block_index
+        AND command IN ('update', 'parse')
+        AND block_index < IFNULL(
+            (SELECT MIN(block_index) FROM previous_states), :last_block_index
+        )
+        LIMIT 1
+    """
+    last_block_index = fetch_one(api_db, "SELECT MAX(block_index) AS block_index FROM messages")
+    bindings = {"block_index": block_index, "last_block_index": last_block_index["block_index"] + 1}
+    if fetch_one(api_db, sql, bindings) is not None:
+        raise exceptions.APIWatcherError(
+            f"API Watcher - Unable to roll back to block {block_index}, the previous states are "
+            f"kept for the last {config.API_WATCHER_ROLLBACK_DEPTH} blocks only "
+            f"(`--api-watcher-rollback-depth`). Delete `{config.API_DATABASE}` to rebuild it."
+        )
+
+
+def prune_previous_states(api_db, block_index):
+    """Keep the previous states of the last `config.API_WATCHER_ROLLBACK_DEPTH` blocks."""
+    delete_all(
+        api_db,
+        "DELETE FROM previous_states WHERE block_index <= ?",
+        (block_index - config.API_WATCHER_ROLLBACK_DEPTH,),
+    )
+
+
+def execute_insert(api_db, sql, bindings, deferred_inserts=None):
+    # the inserts in tables never read while parsing can be grouped by `flush_inserts()`
+    if deferred_inserts is not None:
+        deferred_inserts.setdefault(sql, []).append(bindings)
+        return
+    cursor = api_db.cursor()
+    cursor.execute(sql, bindings)
+
+
+def flush_inserts(api_db, deferred_inserts):
+    cursor = api_db.cursor()
+    for sql, bindings_list in deferred_inserts.items():
+        cursor.executemany(sql, bindings_list)
+    deferred_inserts.clear()
+
+
+def insert_event(api_db, event, deferred_inserts=None):
     sql = """
         INSERT INTO messages 
-            (message_index, block_index, event, category, command, bindings, tx_hash, previous_state, insert_rowid, event_hash)
-        VALUES (:message_index, :block_index, :event, :category, :command, :bindings, :tx_hash, :previous_state, :insert_rowid, :event_hash)
+            (message_index, block_index, event, category, command, bindings, tx_hash, insert_rowid, event_hash)
+        VALUES (:message_index, :block_index, :event, :category, :command, :bindings, :tx_hash, :insert_rowid, :event_hash)
     """
+    execute_insert(api_db, sql, event, deferred_inserts)
+
+
+def restore_previous_state(api_db, event, previous_state):
+    id_field_names = UPDATE_EVENTS_ID_FIELDS[event["event"]]
+
+    sets = []
+    for key in previous_state.keys():
+        if key in id_field_names:
+            continue
+        sets.append(f"{key} = :{key}")
+    set_clause = ", ".join(sets)
+
+    where = []
+    for id_field_name in id_field_names:
+        where.append(f"{id_field_name} = :{id_field_name}")
+    where_clause = " AND ".join(where)
+
+    sql = f"UPDATE {event['category']} SET {set_clause} WHERE {where_clause}"  # noqa: S608
     cursor = api_db.cursor()
-    cursor.execute(sql, event)
+    cursor.execute(sql, previous_state)
 
 
 def rollback_event(api_db, event):
@@ -236,7 +357,7 @@ def rollback_event(api_db, event):
             sql = "DELETE FROM messages WHERE message_index = ?"
             delete_all(api_db, sql, (event["message_index"],))
             return
-        if event["previous_state"] is None or event["previous_state"] == "null":
+        if event["command"] == "insert":
             sql = f"DELETE FROM {event['category']} WHERE rowid = ?"  # noqa: S608
             deleted = delete_all(api_db, sql, (event["insert_rowid"],))
             if deleted == 0:
@@ -244,25 +365,11 @@ def rollback_event(api_db, event):
                     f"Failed to delete event: {event['message_index']} ({event['event']})"
                 )
         else:
-            previous_state = json.loads(event["previous_state"])
-
-            id_field_names = UPDATE_EVENTS_ID_FIELDS[event["event"]]
-
-            sets = []
-            for key in previous_state.keys():
-                if key in id_field_names:
-                    continue
-                sets.append(f"{key} = :{key}")
-            set_clause = ", ".join(sets)
-
-            where = []
-            for id_field_name in id_field_names:
-                where.append(f"{id_field_name} = :{id_field_name}")
-            where_clause = " AND ".join(where)
-
-            sql = f"UPDATE {event['category']} SET {set_clause} WHERE {where_clause}"  # noqa: S608
-            cursor = api_db.cursor()
-            cursor.execute(sql, previous_state)
+            previous_state = get_rollback_previous_state(api_db, event)
+            if previous_state is not None:
+                restore_previous_state(api_db, event, previous_state)
+            sql = "DELETE FROM previous_states WHERE message_index = ?"
+            delete_all(api_db, sql, (event["message_index"],))
 
         rollback_balances(api_db, event)
         rollback_expiration(api_db, event)
@@ -274,9 +381,16 @@ def rollback_event(api_db, event):
         sql = "DELETE FROM messages WHERE message_index = ?"
         delete_all(api_db, sql, (event["message_index"],))
 
+        if event["event"] in ASSET_INFO_EVENTS:
+            STALE_WORKER_CACHES.add("assets_info")
+        if event["event"] == "NEW_BLOCK":
+            STALE_WORKER_CACHES.add("blocks")
+    invalidate_worker_caches()
+
 
 def rollback_events(api_db, block_index):
     logger.debug(f"API Watcher - Rolling back events to block {block_index}...")
+    check_rollback_depth(api_db, block_index)
     # api_db.execute("""PRAGMA foreign_keys=OFF""")
     cursor = api_db.cursor()
     sql = "SELECT * FROM messages WHERE block_index >= ? ORDER BY message_index DESC"
@@ -342,12 +456,11 @@ def rollback_balances(api_db, event):
     update_balances(api_db, revert_event)
 
 
-def update_expiration(api_db, event):
+def update_expiration(api_db, event, deferred_inserts=None):
     if event["event"] not in EXPIRATION_EVENTS_OBJECT_ID:
         return
     event_bindings = json.loads(event["bindings"])
 
-    cursor = api_db.cursor()
     sql = """
         INSERT INTO all_expirations (object_id, block_index, type) 
         VALUES (:object_id, :block_index, :type)
@@ -357,7 +470,7 @@ def update_expiration(api_db, event):
         "block_index": event_bindings["block_index"],
         "type": event["event"].replace("_EXPIRATION", "").lower(),
     }
-    cursor.execute(sql, bindings)
+    execute_insert(api_db, sql, bindings, deferred_inserts)
 
 
 def rollback_expiration(api_db, event):
@@ -595,18 +708,20 @@ def rollback_xcp_supply(api_db, event):
     cursor.execute(sql, event_bindings)
 
 
-def update_address_events(api_db, event):
+def update_address_events(api_db, event, deferred_inserts=None):
     if event["event"] not in EVENTS_ADDRESS_FIELDS:
         return
     event_bindings = json.loads(event["bindings"])
-    cursor = api_db.cursor()
     for field in EVENTS_ADDRESS_FIELDS[event["event"]]:
         sql = """
             INSERT INTO address_events (address, event_index)
             VALUES (:address, :event_index)
             """
-        cursor.execute(
-            sql, {"address": event_bindings[field], "event_index": event["message_index"]}
+        execute_insert(
+            api_db,
+            sql,
+            {"address": event_bindings[field], "event_index": event["message_index"]},
+            deferred_inserts,
         )
 
 
@@ -652,28 +767,63 @@ def rollback_fairminters(api_db, event):
     cursor.execute(sql, event_bindings)
 
 
-def parse_event(api_db, event, watcher, catching_up=False):
+def apply_event(api_db, event, deferred_inserts=None, save_previous_state=True):
     if event["event"] in SKIP_EVENTS:
         event["insert_rowid"] = None
-        insert_event(api_db, event)
+        insert_event(api_db, event, deferred_inserts)
+        return
+    logger.trace(f"API Watcher - Parsing event: {event}")
+    if event["event"] == "NEW_BLOCK":
+        clean_mempool(api_db)
+    if save_previous_state:
+        insert_previous_state(api_db, event)
+    event["insert_rowid"] = execute_event(api_db, event)
+    update_balances(api_db, event)
+    update_expiration(api_db, event, deferred_inserts)
+    update_assets_info(api_db, event)
+    if event["event"] in ASSET_INFO_EVENTS:
+        STALE_WORKER_CACHES.add("assets_info")
+    update_xcp_supply(api_db, event)
+    update_address_events(api_db, event, deferred_inserts)
+    update_fairminters(api_db, event)
+    insert_event(api_db, event, deferred_inserts)
+    if event["event"] == "BLOCK_PARSED":
+        prune_previous_states(api_db, event["block_index"])
+    logger.event(f"API Watcher - Event parsed: {event['message_index']} {event['event']}")
+
+
+def parse_event(api_db, event, watcher):
+    if event["event"] in SKIP_EVENTS:
+        apply_event(api_db, event)
         return
     with api_db:
-        logger.trace(f"API Watcher - Parsing event: {event}")
-        if event["event"] == "NEW_BLOCK":
-            clean_mempool(api_db)
-        event["insert_rowid"] = execute_event(api_db, event)
-        update_balances(api_db, event)
-        update_expiration(api_db, event)
-        update_assets_info(api_db, event)
-        update_xcp_supply(api_db, event)
-        update_address_events(api_db, event)
-        update_fairminters(api_db, event)
-        insert_event(api_db, event)
-        logger.event(f"API Watcher - Event parsed: {event['message_index']} {event['event']}")
+        apply_event(api_db, event)
         if event["event"] == "BLOCK_PARSED":
             synchronize_mempool(api_db, api_db, watcher.stop_event)
 
 
+def parse_events_batch(api_db, events, batch_size, stop_event, rollback_from_block_index=0):
+    """
+    Apply the next `events` in one transaction, up to the end of the block
+    where `batch_size` is reached. Return the number of events applied.
+    The previous states are saved from `rollback_from_block_index`.
+    """
+    deferred_inserts = {}
+    event_count = 0
+    with api_db:
+        for event in events:
+            save_previous_state = event["block_index"] >= rollback_from_block_index
+            apply_event(api_db, event, deferred_inserts, save_previous_state)
+            event_count += 1
+            if stop_event.is_set():
+                break
+            if event["event"] == "BLOCK_PARSED" and event_count >= batch_size:
+                break
+        flush_inserts(api_db, deferred_inserts)
+    invalidate_worker_caches()
+    return event_count
+
+
 def catch_up(api_db, ledger_db, watcher):
     check_event_hashes(api_db, ledger_db)
     clean_mempool(api_db)
@@ -682,16 +832,27 @@ def catch_up(api_db, ledger_db, watcher):
         logger.debug(f"API Watcher - {event_to_parse_count} events to catch up...")
         start_time = time.time()
         event_parsed = 0
-        next_event = get_next_event_to_parse(api_db, ledger_db)
-        while next_event and not watcher.stop_event.is_set():
-            parse_event(api_db, next_event, watcher, catching_up=True)
-            event_parsed += 1
-            if event_parsed % 50000 == 0:
-                duration = time.time() - start_time
-                logger.debug(
-                    f"API Watcher - {event_parsed} / {event_to_parse_count} events parsed. ({format_duration(duration)})"
-                )
-            next_event = get_next_event_to_parse(api_db, ledger_db)
+        batch_size = config.API_WATCHER_BATCH_SIZE
+        events = get_events_to_parse(
+            ledger_db, get_last_parsed_message_index(api_db), max(batch_size, 1000)
+        )
+        # the events far below the tip will not be rolled back
+        last_ledger_event = get_last_event(ledger_db)
+        rollback_from_block_index = (
+            last_ledger_event["block_index"] - config.API_WATCHER_ROLLBACK_DEPTH
+        )
+        while not watcher.stop_event.is_set():
+            batch_event_count = parse_events_batch(
+                api_db, events, batch_size, watcher.stop_event, rollback_from_block_index
+            )
+            if batch_event_count == 0:
+                break
+            event_parsed += batch_event_count
+            duration = max(time.time() - start_time, 0.001)
+            logger.debug(
+                f"API Watcher - {event_parsed} / {event_to_parse_count} events parsed "
+                f"({event_parsed / duration:.0f} events/s). ({format_duration(duration)})"
+            )
         if not watcher.stop_event.is_set():
             duration = time.time() - start_time
             logger.info(f"API Watcher - Catch up completed. ({format_duration(duration)})")
@@ -755,31 +916,22 @@ def rollback(block_index):
     api_db.close()
 
 
-def parse_next_event(api_db, ledger_db, watcher):
+def parse_new_events(api_db, ledger_db, stop_event):
+    """
+    Apply the events committed by the ledger since the last call, one transaction per block.
+    Return the last event applied or `None`.
+    """
     check_event_hashes(api_db, ledger_db)
-
-    last_event_sql = "SELECT * FROM messages ORDER BY message_index DESC LIMIT 1"
-    last_ledger_event = fetch_one(ledger_db, last_event_sql)
-    last_api_event = fetch_one(api_db, last_event_sql)
-
-    if last_ledger_event is None:
-        raise exceptions.NoEventToParse("No event to parse")
-
-    if last_api_event is None:
-        next_event_sql = "SELECT * FROM messages ORDER BY message_index ASC LIMIT 1"
-        next_event = fetch_one(ledger_db, next_event_sql)
-        parse_event(api_db, next_event, watcher)
-        return next_event
-
-    if last_ledger_event["message_index"] > last_api_event["message_index"]:
-        next_event_sql = (
-            "SELECT * FROM messages WHERE message_index > ? ORDER BY message_index ASC LIMIT 1"
-        )
-        next_event = fetch_one(ledger_db, next_event_sql, (last_api_event["message_index"],))
-        parse_event(api_db, next_event, watcher)
-        return next_event
-
-    raise exceptions.NoEventToParse("No event to parse")
+    events = get_events_to_parse(ledger_db, get_last_parsed_message_index(api_db), 1000)
+    event_count = 0
+    while not stop_event.is_set():
+        batch_event_count = parse_events_batch(api_db, events, 1, stop_event)
+        if batch_event_count == 0:
+            break
+        event_count += batch_event_count
+    if event_count == 0:
+        return None
+    return get_last_event(api_db)
 
 
 def clean_mempool(api_db):
@@ -790,7 +942,9 @@ def clean_mempool(api_db):
             f"DELETE FROM {table} WHERE block_index = ?",  # noqa: S608
             (config.MEMPOOL_BLOCK_INDEX,),
         )
-    delete_all(api_db, "DELETE FROM assets_info WHERE confirmed = ?", (False,))
+    if delete_all(api_db, "DELETE FROM assets_info WHERE confirmed = ?", (False,)) > 0:
+        STALE_WORKER_CACHES.add("assets_info")
+    MEMPOOL_TRANSACTIONS.clear()
 
 
 def gen_random_tx_index(event):
@@ -803,89 +957,199 @@ def gen_random_tx_index(event):
     return event
 
 
+def get_mempool_transactions(ledger_db):
+    """Return the events of the ledger mempool grouped by tx_hash."""
+    transactions = {}
+    for event in fetch_all(ledger_db, "SELECT * FROM mempool"):
+        transactions.setdefault(event["tx_hash"], []).append(event)
+    return transactions
+
+
+def get_mempool_events_signature(events):
+    return hash(tuple((event["event"], event["bindings"]) for event in events))
+
+
+def add_mempool_transaction(api_db, tx_hash, events):
+    """
+    Execute the mempool events of `tx_hash` and remember the rows they insert,
+    so that `remove_mempool_transaction()` can delete them.
+    """
+    sql_insert = """INSERT INTO mempool (tx_hash, command, category, bindings, event, timestamp, addresses) VALUES (?, ?, ?, ?, ?, ?, ?)"""
+    # before `gen_random_tx_index()` changes the bindings
+    signature = get_mempool_events_signature(events)
+    inserted_rows = []
+    created_assets = []
+    cursor = api_db.cursor()
+    cursor.execute("DELETE FROM mempool WHERE tx_hash = ?", (tx_hash,))
+    for event in events:
+        if event["event"] in SKIP_EVENTS + ["NEW_BLOCK", "BLOCK_PARSED"]:
+            continue
+        if tx_hash in MEMPOOL_SKIP_EVENT_HASHES:
+            continue
+        event_bindings = json.loads(event["bindings"])
+        # edge case: asset already created in another confirmed tx
+        if event["event"] == "ASSET_CREATION":
+            existing_asset = fetch_one(
+                api_db,
+                "SELECT * FROM assets WHERE asset_name = ?",
+                (event_bindings["asset_name"],),
+            )
+            if existing_asset is not None:
+                continue
+            created_assets.append(event_bindings["asset_name"])
+        addresses = []
+        if event["event"] in EVENTS_ADDRESS_FIELDS:
+            for field in EVENTS_ADDRESS_FIELDS[event["event"]]:
+                if field in event_bindings and event_bindings[field] is not None:
+                    addresses.append(event_bindings[field])
+        addresses = list(set(addresses))
+        addresses = " ".join(addresses)
+
+        bindings = [
+            event["tx_hash"],
+            event["command"],
+            event["category"],
+            event["bindings"],
+            event["event"],
+            event["timestamp"],
+            addresses,
+        ]
+        cursor.execute(sql_insert, bindings)
+        event["block_index"] = config.MEMPOOL_BLOCK_INDEX
+        event = gen_random_tx_index(event)  # noqa: PLW2901
+        try:
+            insert_rowid = execute_event(api_db, event)
+            update_assets_info(api_db, event)
+        except apsw.ConstraintError as e:
+            if "UNIQUE constraint failed: transactions.tx_index" in str(e):
+                event = gen_random_tx_index(event)  # noqa: PLW2901
+                insert_rowid = execute_event(api_db, event)
+                update_assets_info(api_db, event)
+            else:
+                # Skipping duplicate event
+                MEMPOOL_SKIP_EVENT_HASHES.append(event["tx_hash"])
+                insert_rowid = None
+        except Exception as e:
+            logger.error(f"API Watcher - Error executing mempool event: {e}")
+            raise e
+        if insert_rowid is not None:
+            inserted_rows.append((event["category"], insert_rowid))
+    MEMPOOL_TRANSACTIONS[tx_hash] = {
+        "signature": signature,
+        "inserted_rows": inserted_rows,
+        "created_assets": created_assets,
+    }
+
+
+def remove_mempool_transaction(api_db, tx_hash):
+    transaction = MEMPOOL_TRANSACTIONS.pop(tx_hash)
+    cursor = api_db.cursor()
+    cursor.execute("DELETE FROM mempool WHERE tx_hash = ?", (tx_hash,))
+    for table, rowid in transaction["inserted_rows"]:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE rowid = ? AND block_index = ?",  # noqa: S608
+            (rowid, config.MEMPOOL_BLOCK_INDEX),
+        )
+    for asset in transaction["created_assets"]:
+        cursor.execute(
+            "DELETE FROM assets_info WHERE asset = ? AND confirmed = ?",
+            (asset, False),
+        )
+        STALE_WORKER_CACHES.add("assets_info")
+
+
 def synchronize_mempool(api_db, ledger_db, stop_event):
+    """
+    Add the new transactions of the ledger mempool and remove the ones that are
+    no longer there (confirmed or evicted). A transaction whose events changed is
+    replaced. The transactions already synchronized are left untouched.
+    """
     if config.NO_MEMPOOL or stop_event.is_set():
         return
     logger.trace("API Watcher - Synchronizing mempool...")
-    global MEMPOOL_SKIP_EVENT_HASHES  # noqa: PLW0602
     try:
-        mempool_events = fetch_all(ledger_db, "SELECT * FROM mempool")
-        sql_insert = """INSERT INTO mempool (tx_hash, command, category, bindings, event, timestamp, addresses) VALUES (?, ?, ?, ?, ?, ?, ?)"""
+        mempool_transactions = get_mempool_transactions(ledger_db)
         with api_db:
-            clean_mempool(api_db)
-            cursor = api_db.cursor()
-            for event in mempool_events:
+            removed_count = 0
+            for tx_hash, transaction in list(MEMPOOL_TRANSACTIONS.items()):
+                if (
+                    tx_hash not in mempool_transactions
+                    or tx_hash in MEMPOOL_SKIP_EVENT_HASHES
+                    or get_mempool_events_signature(mempool_transactions[tx_hash])
+                    != transaction["signature"]
+                ):
+                    remove_mempool_transaction(api_db, tx_hash)
+                    removed_count += 1
+            added_count = 0
+            for tx_hash, events in mempool_transactions.items():
                 if stop_event.is_set():
                     logger.info("API Watcher - Stopping mempool synchronization due to stop event.")
                     break
-                if event["event"] in SKIP_EVENTS + ["NEW_BLOCK", "BLOCK_PARSED"]:
+                if tx_hash in MEMPOOL_TRANSACTIONS or tx_hash in MEMPOOL_SKIP_EVENT_HASHES:
                     continue
-                if event["tx_hash"] in MEMPOOL_SKIP_EVENT_HASHES:
-                    continue
-                event_bindings = json.loads(event["bindings"])
-                # edge case: asset already created in another confirmed tx
-                if event["event"] == "ASSET_CREATION":
-                    existing_asset = fetch_one(
-                        api_db,
-                        "SELECT * FROM assets WHERE asset_name = ?",
-                        (event_bindings["asset_name"],),
-                    )
-                    if existing_asset is not None:
-                        continue
-                addresses = []
-                if event["event"] in EVENTS_ADDRESS_FIELDS:
-                    for field in EVENTS_ADDRESS_FIELDS[event["event"]]:
-                        if field in event_bindings and event_bindings[field] is not None:
-                            addresses.append(event_bindings[field])
-                addresses = list(set(addresses))
-                addresses = " ".join(addresses)
-
-                bindings = [
-                    event["tx_hash"],
-                    event["command"],
-                    event["category"],
-                    event["bindings"],
-                    event["event"],
-                    event["timestamp"],
-                    addresses,
-                ]
-                cursor.execute(sql_insert, bindings)
-                event["block_index"] = config.MEMPOOL_BLOCK_INDEX
-                event = gen_random_tx_index(event)  # noqa: PLW2901
-                try:
-                    execute_event(api_db, event)
-                    update_assets_info(api_db, event)
-                except apsw.ConstraintError as e:
-                    if "UNIQUE constraint failed: transactions.tx_index" in str(e):
-                        event = gen_random_tx_index(event)  # noqa: PLW2901
-                        execute_event(api_db, event)
-                        update_assets_info(api_db, event)
-                    else:
-                        # Skipping duplicate event
-                        MEMPOOL_SKIP_EVENT_HASHES.append(event["tx_hash"])
-                except Exception as e:
-                    logger.error(f"API Watcher - Error executing mempool event: {e}")
-                    raise e
-
-            if len(mempool_events) > 0:
-                logger.debug("API Watcher - %s mempool events synchronized", len(mempool_events))
+                add_mempool_transaction(api_db, tx_hash, events)
+                added_count += 1
+
+            if added_count > 0 or removed_count > 0:
+                logger.debug(
+                    "API Watcher - Mempool synchronized: %s transactions added, %s removed",
+                    added_count,
+                    removed_count,
+                )
+        invalidate_worker_caches()
     except apsw.SQLError:
         # TEMP: for testing
         pass
 
 
+def invalidate_worker_caches():
+    """Invalidate the caches of the API workers once the changes are committed."""
+    if "assets_info" in STALE_WORKER_CACHES:
+        cache.invalidate_assets_info()
+    if "blocks" in STALE_WORKER_CACHES:
+        cache.invalidate_blocks()
+    STALE_WORKER_CACHES.clear()
+
+
 def refresh_xcp_supply(ledger_db, api_db):
     xcp_supply = ledger.xcp_supply(ledger_db)
     cursor = api_db.cursor()
     cursor.execute("UPDATE assets_info SET supply = ? WHERE asset = 'XCP'", (xcp_supply,))
 
 
-class APIWatcher(threading.Thread):
+class EventFeed:
+    """
+    Wake the API Watcher when new events are committed. Created before the API process
+    is started and notified by the ledger with the index of the last committed event.
+    """
+
     def __init__(self):
+        self.last_message_index = Value("q", -1)
+        self.new_events = multiprocessing.Event()
+
+    def notify(self, message_index):
+        self.last_message_index.value = message_index
+        self.new_events.set()
+
+    def wait(self, timeout):
+        """Return the last message index committed or `None` if nothing was notified."""
+        if not self.new_events.wait(timeout=timeout):
+            return None
+        self.new_events.clear()
+        return self.last_message_index.value
+
+    def wake(self):
+        self.new_events.set()
+
+
+class APIWatcher(threading.Thread):
+    def __init__(self, event_feed=None):
         threading.Thread.__init__(self)
         logger.debug("Initializing API Watcher...")
         self.api_db = None
         self.ledger_db = None
+        # without an event feed the ledger database is polled
+        self.event_feed = event_feed
         apply_migration()
         self.stop_event = threading.Event()  # Add stop event
         self.api_db = database.get_db_connection(
@@ -940,23 +1204,33 @@ class APIWatcher(threading.Thread):
     def follow(self):
         refresh_xcp_supply(self.ledger_db, self.api_db)
         while not self.stop_event.is_set():
-            last_parsed_event = None
-            try:
-                last_parsed_event = parse_next_event(self.api_db, self.ledger_db, self)
-            except exceptions.NoEventToParse:
-                logger.trace("API Watcher - No new events to parse")
-                self.stop_event.wait(timeout=0.1)
+            last_parsed_event = parse_new_events(self.api_db, self.ledger_db, self.stop_event)
             if self.stop_event.is_set():
                 break
-            if time.time() - self.last_mempool_sync > 10 and (
+            if time.time() - self.last_mempool_sync > MEMPOOL_SYNC_INTERVAL and (
                 last_parsed_event is None or last_parsed_event["event"] == "BLOCK_PARSED"
             ):
                 synchronize_mempool(self.api_db, self.ledger_db, self.stop_event)
                 self.last_mempool_sync = time.time()
+            if last_parsed_event is None:
+                logger.trace("API Watcher - No new events to parse")
+                self.wait_for_events()
+
+    def wait_for_events(self):
+        if self.event_feed is None:
+            self.stop_event.wait(timeout=0.1)
+            return
+        # wake up for the next mempool synchronization at the latest
+        timeout = MEMPOOL_SYNC_INTERVAL - (time.time() - self.last_mempool_sync)
+        last_message_index = self.event_feed.wait(timeout=max(timeout, 0.1))
+        if last_message_index is not None:
+            logger.trace(f"API Watcher - Events committed up to {last_message_index}")
 
     def stop(self):
         logger.info("Stopping API Watcher thread...")
         self.stop_event.set()
+        if self.event_feed is not None:
+            self.event_feed.wake()
         self.join()
         if self.api_db is not None:
             self.api_db.close()
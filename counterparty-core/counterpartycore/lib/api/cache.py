@@ -0,0 +1,336 @@
+import array
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import Value
+
+import apsw
+from counterpartycore.lib import config, ledger, util
+from counterpartycore.lib.backend import bitcoind
+
+logger = logging.getLogger(config.LOGGER_NAME)
+
+# `Cache-Control` of the responses that never change and of the ones valid for one block
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+BLOCK_CACHE_CONTROL = "no-cache"
+
+# the responses about a block or its transactions are immutable only once a reorg is unlikely
+IMMUTABLE_MIN_CONFIRMATIONS = 6
+
+# maximum delay before a worker writes the statistics of the API response cache
+STATISTICS_FLUSH_INTERVAL = 10
+
+# maximum number of assets kept by `AssetsInfoCache` in each worker
+ASSETS_INFO_CACHE_SIZE = 50000
+
+# incremented by the API Watcher when the changes of `assets_info` and `blocks` are committed.
+# Created at import by the API process, before gunicorn forks the workers that read them.
+ASSETS_INFO_VERSION = Value("q", 0)
+BLOCKS_VERSION = Value("q", 0)
+
+
+def get_cache_key(rule, function_args, verbose):
+    # same key whatever the order of the query parameters or the default values given
+    normalized_args = json.dumps([rule, function_args, verbose], sort_keys=True, default=str)
+    return hashlib.sha256(normalized_args.encode("utf-8")).hexdigest()
+
+
+def is_immutable_block(block_index):
+    return block_index <= util.CURRENT_BLOCK_INDEX - IMMUTABLE_MIN_CONFIRMATIONS
+
+
+def get_etag(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+class APIResponseCache(metaclass=util.SingletonMeta):
+    """
+    LRU cache of the API responses, shared by the workers of the API server through the
+    SQLite database `config.API_CACHE_FILE`. The responses cached for a block are
+    invalidated when `util.CURRENT_BLOCK_INDEX` advances, the ones cached without block
+    are kept until they are evicted. All of them are removed when a block is rolled back.
+    A hit writes nothing: each worker counts its hits and misses and the use of the
+    responses in memory, and writes them with the next response cached or every
+    `STATISTICS_FLUSH_INTERVAL` seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.db = None
+        self.pid = None
+        self.last_purged_block_index = 0
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        self.hits = 0
+        self.misses = 0
+        # `last_used` of the responses served since the last flush
+        self.last_used = {}
+        self.last_flush = time.time()
+
+    def connection(self):
+        # the gunicorn workers are forked after the creation of the cache
+        if self.pid != os.getpid():
+            self.db = apsw.Connection(config.API_CACHE_FILE)
+            self.db.setbusytimeout(5000)
+            cursor = self.db.cursor()
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = OFF")
+            cursor.execute(
+                """CREATE TABLE IF NOT EXISTS responses(
+                    cache_key TEXT PRIMARY KEY,
+                    block_index INTEGER,
+                    body BLOB,
+                    etag TEXT,
+                    last_used REAL)
+                """
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_used_idx ON responses (last_used)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS responses_block_index_idx ON responses (block_index)"
+            )
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS statistics(name TEXT PRIMARY KEY, value INTEGER)"
+            )
+            cursor.execute(
+                """INSERT OR IGNORE INTO statistics VALUES
+                    ('hits', 0), ('misses', 0), ('entries', 0), ('size', 0)
+                """
+            )
+            # number and size of the responses maintained without counting them
+            cursor.execute(
+                """CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses
+                BEGIN
+                    UPDATE statistics SET value = value + 1 WHERE name = 'entries';
+                    UPDATE statistics SET value = value + LENGTH(NEW.body) WHERE name = 'size';
+                END
+                """
+            )
+            cursor.execute(
+                """CREATE TRIGGER IF NOT EXISTS responses_update AFTER UPDATE OF body ON responses
+                BEGIN
+                    UPDATE statistics SET value = value + LENGTH(NEW.body) - LENGTH(OLD.body)
+                    WHERE name = 'size';
+                END
+                """
+            )
+            cursor.execute(
+                """CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses
+                BEGIN
+                    UPDATE statistics SET value = value - 1 WHERE name = 'entries';
+                    UPDATE statistics SET value = value - LENGTH(OLD.body) WHERE name = 'size';
+                END
+                """
+            )
+            # the statistics of the parent process are not the ones of the worker
+            self.reset_statistics()
+            self.pid = os.getpid()
+        return self.db
+
+    def flush_statistics(self, cursor):
+        cursor.execute(
+            """UPDATE statistics SET value = value + CASE name
+                WHEN 'hits' THEN ? WHEN 'misses' THEN ? ELSE 0 END
+            WHERE name IN ('hits', 'misses')""",
+            (self.hits, self.misses),
+        )
+        cursor.executemany(
+            "UPDATE responses SET last_used = ? WHERE cache_key = ?",
+            [(last_used, cache_key) for cache_key, last_used in self.last_used.items()],
+        )
+        self.reset_statistics()
+
+    def get(self, cache_key, block_index):
+        """Return the `(body, etag, immutable)` cached for `cache_key` if still valid at `block_index`."""
+        with self.lock:
+            db = self.connection()
+            cursor = db.cursor()
+            cached = cursor.execute(
+                "SELECT body, etag, block_index FROM responses WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            hit = cached is not None and cached[2] in [None, block_index]
+            if hit:
+                self.hits += 1
+                self.last_used[cache_key] = time.time()
+            else:
+                self.misses += 1
+            if time.time() - self.last_flush > STATISTICS_FLUSH_INTERVAL:
+                with db:
+                    self.flush_statistics(cursor)
+            if not hit:
+                return None
+            return cached[0], cached[1], cached[2] is None
+
+    def set(self, cache_key, block_index, body, etag, blocks_version):
+        """
+        Cache `body` for `block_index`, or until evicted if `block_index` is `None`.
+        Not cached if a block was rolled back since `blocks_version` was read.
+        """
+        with self.lock:
+            db = self.connection()
+            cursor = db.cursor()
+            with db:
+                if blocks_version != BLOCKS_VERSION.value:
+                    return
+                # before the eviction of the least recently used responses
+                self.flush_statistics(cursor)
+                if block_index is not None and block_index > self.last_purged_block_index:
+                    cursor.execute("DELETE FROM responses WHERE block_index < ?", (block_index,))
+                    self.last_purged_block_index = block_index
+                cursor.execute(
+                    """INSERT INTO responses VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(cache_key) DO UPDATE SET
+                        block_index = excluded.block_index,
+                        body = excluded.body,
+                        etag = excluded.etag,
+                        last_used = excluded.last_used
+                    """,
+                    (cache_key, block_index, body, etag, time.time()),
+                )
+                entry_count = cursor.execute(
+                    "SELECT value FROM statistics WHERE name = 'entries'"
+                ).fetchone()[0]
+                if entry_count > config.API_CACHE_SIZE:
+                    cursor.execute(
+                        """DELETE FROM responses WHERE cache_key IN (
+                            SELECT cache_key FROM responses ORDER BY last_used LIMIT ?
+                        )""",
+                        (entry_count - config.API_CACHE_SIZE,),
+                    )
+
+    def clear(self):
+        with self.lock:
+            db = self.connection()
+            with db:
+                db.cursor().execute("DELETE FROM responses")
+
+    def statistics(self):
+        with self.lock:
+            db = self.connection()
+            cursor = db.cursor()
+            with db:
+                self.flush_statistics(cursor)
+            result = {
+                name: value for name, value in cursor.execute("SELECT name, value FROM statistics")
+            }
+        request_count = result["hits"] + result["misses"]
+        result["hit_rate"] = result["hits"] / request_count if request_count > 0 else 0
+        return result
+
+
+class AssetsInfoCache(metaclass=util.SingletonMeta):
+    """
+    Read-through LRU cache of `ledger.get_assets_last_issuance()` in each API worker,
+    cleared when `ASSETS_INFO_VERSION` changes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.assets = OrderedDict()
+        self.version = ASSETS_INFO_VERSION.value
+
+    def get_assets_last_issuance(self, db, asset_list):
+        result = {}
+        missing_assets = []
+        with self.lock:
+            version = ASSETS_INFO_VERSION.value
+            if version != self.version:
+                self.assets.clear()
+                self.version = version
+            for asset in asset_list:
+                if asset in self.assets:
+                    self.assets.move_to_end(asset)
+                    result[asset] = self.assets[asset]
+                else:
+                    missing_assets.append(asset)
+        if len(missing_assets) == 0:
+            return result
+
+        assets_info = ledger.get_assets_last_issuance(db, missing_assets)
+        with self.lock:
+            # not cached if `assets_info` changed during the query
+            if ASSETS_INFO_VERSION.value == self.version == version:
+                for asset in missing_assets:
+                    if asset in assets_info:
+                        self.assets[asset] = assets_info[asset]
+                while len(self.assets) > ASSETS_INFO_CACHE_SIZE:
+                    self.assets.popitem(last=False)
+        return result | assets_info
+
+
+class BlocksTimeCache(metaclass=util.SingletonMeta):
+    """
+    Read-through cache of `ledger.get_blocks_time()` in each API worker: an array of the
+    block times indexed by block height, cleared when `BLOCKS_VERSION` changes (rollback).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # `0` for the blocks not fetched yet
+        self.block_times = array.array("q")
+        self.version = BLOCKS_VERSION.value
+
+    def get_blocks_time(self, db, block_indexes):
+        result = {}
+        missing_block_indexes = []
+        with self.lock:
+            version = BLOCKS_VERSION.value
+            if version != self.version:
+                self.block_times = array.array("q")
+                self.version = version
+            for block_index in block_indexes:
+                position = block_index - config.BLOCK_FIRST
+                if 0 <= position < len(self.block_times) and self.block_times[position] > 0:
+                    result[block_index] = self.block_times[position]
+                else:
+                    missing_block_indexes.append(block_index)
+        if len(missing_block_indexes) == 0:
+            return result
+
+        block_times = ledger.get_blocks_time(db, missing_block_indexes)
+        with self.lock:
+            if BLOCKS_VERSION.value == self.version == version:
+                for block_index, block_time in block_times.items():
+                    # the mempool block index is not a height
+                    if not config.BLOCK_FIRST <= block_index <= util.CURRENT_BLOCK_INDEX:
+                        continue
+                    position = block_index - config.BLOCK_FIRST
+                    if position >= len(self.block_times):
+                        self.block_times.extend([0] * (position + 1 - len(self.block_times)))
+                    self.block_times[position] = block_time
+        return result | block_times
+
+
+def invalidate_assets_info():
+    with ASSETS_INFO_VERSION.get_lock():
+        ASSETS_INFO_VERSION.value += 1
+
+
+def invalidate_blocks():
+    with BLOCKS_VERSION.get_lock():
+        BLOCKS_VERSION.value += 1
+    # the responses cached for the blocks rolled back, immutable or not
+    if config.API_CACHE_SIZE > 0:
+        APIResponseCache().clear()
+
+
+def reset():
+    """Remove the responses cached by a previous run of the API server."""
+    for suffix in ["", "-wal", "-shm"]:
+        if os.path.exists(config.API_CACHE_FILE + suffix):
+            os.remove(config.API_CACHE_FILE + suffix)
+
+
+def get_cache_statistics():
+    """
+    Returns the number of hits and misses of the API response cache, its hit rate, the number of responses cached and their size in bytes, and the same statistics for the cache of the transaction outputs spent by the decoded transactions (`prevouts`)
+    """
+    statistics = APIResponseCache().statistics()
+    statistics["prevouts"] = bitcoind.PrevoutsCache().statistics()
+    return statistics
@@ -0,0 +1,10 @@
+-- depends: 0015.fix_asset_longname_field
+
+-- API tables are updated in place, they already have the current state
+-- of the objects read by the ledger from the `*_current` tables
+CREATE VIEW IF NOT EXISTS balances_current AS SELECT rowid AS rowid, * FROM balances;
+CREATE VIEW IF NOT EXISTS orders_current AS SELECT rowid AS rowid, * FROM orders;
+CREATE VIEW IF NOT EXISTS order_matches_current AS SELECT rowid AS rowid, * FROM order_matches;
+CREATE VIEW IF NOT EXISTS bets_current AS SELECT rowid AS rowid, * FROM bets;
+CREATE VIEW IF NOT EXISTS dispensers_current AS SELECT rowid AS rowid, * FROM dispensers;
+CREATE VIEW IF NOT EXISTS fairminters_current AS SELECT rowid AS rowid, * FROM fairminters;
@@ -0,0 +1,11 @@
+-- depends: 0016.create_current_state_views
+
+-- the state of the updated objects is only kept for the last blocks
+CREATE TABLE IF NOT EXISTS previous_states(
+    message_index INTEGER PRIMARY KEY,
+    block_index INTEGER,
+    previous_state TEXT);
+CREATE INDEX IF NOT EXISTS previous_states_block_index_idx ON previous_states (block_index);
+
+-- these states were saved after the update, they can not be used to roll back
+UPDATE messages SET previous_state = NULL WHERE previous_state IS NOT NULL;
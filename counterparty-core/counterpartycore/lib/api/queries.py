@@ -1,8 +1,9 @@
+import base64
 import json
 import typing
 from typing import Literal
 
-from counterpartycore.lib import config
+from counterpartycore.lib import config, exceptions
 from counterpartycore.lib.api.util import divide
 from flask import request
 from sentry_sdk import start_span as start_sentry_span
@@ -119,6 +120,69 @@ SUPPORTED_SORT_FIELDS = {
 ADDRESS_FIELDS = ["source", "address", "issuer", "destination"]
 
 
+def get_sort_order_by(table, sort):
+    order_by = []
+    for sort_field in sort.split(","):
+        if ":" in sort_field:
+            sort_name, sort_order = sort_field.split(":")[0:2]
+        else:
+            sort_name = sort_field
+            sort_order = "ASC"
+        if sort_order.upper() not in ["ASC", "DESC"]:
+            sort_order = "ASC"
+        if sort_name == "asset":
+            order_by.append(("COALESCE(asset_longname, asset)", sort_order.upper()))
+        elif sort_name in SUPPORTED_SORT_FIELDS.get(table, []):
+            order_by.append((sort_name, sort_order.upper()))
+    return order_by
+
+
+def encode_keyset_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_keyset_cursor(cursor, value_count):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise exceptions.JSONRPCInvalidRequest(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != value_count:
+        raise exceptions.JSONRPCInvalidRequest(f"Invalid cursor: {cursor}")
+    return values
+
+
+def get_keyset_condition(field, order, value, inclusive):
+    # SQLite sorts NULL before any value
+    if order == "ASC":
+        if value is None:
+            return "1" if inclusive else f"{field} IS NOT NULL", []
+        return f"{field} {'>=' if inclusive else '>'} ?", [value]
+    if value is None:
+        return f"{field} IS NULL" if inclusive else "0", []
+    return f"({field} {'<=' if inclusive else '<'} ? OR {field} IS NULL)", [value]
+
+
+def get_keyset_where(order_by, values):
+    """
+    Return the condition selecting the rows from the one with `values` in the `order_by`
+    fields, in the order of `order_by`.
+    """
+    or_where = []
+    bindings = []
+    for index, (field, order) in enumerate(order_by):
+        and_where = []
+        for previous_field, _ in order_by[:index]:
+            and_where.append(f"{previous_field} IS ?")
+        bindings += values[:index]
+        condition, condition_bindings = get_keyset_condition(
+            field, order, values[index], index == len(order_by) - 1
+        )
+        and_where.append(condition)
+        bindings += condition_bindings
+        or_where.append(f"({' AND '.join(and_where)})")
+    return f"({' OR '.join(or_where)})", bindings
+
+
 class QueryResult:
     def __init__(self, result, next_cursor, result_count=None):
         self.result = result
@@ -140,8 +204,23 @@ def select_rows(
     wrap_where=None,
     sort=None,
 ):
-    if offset is not None or sort is not None:
+    if offset is not None:
         last_cursor = None
+        if config.API_MAX_OFFSET and offset > config.API_MAX_OFFSET:
+            raise exceptions.JSONRPCInvalidRequest(
+                f"Offset should be lower or equal to {config.API_MAX_OFFSET}, use the `cursor` parameter to go further"
+            )
+
+    # with a sort, the cursor holds the values of all the fields of the `ORDER BY`
+    order_by = []
+    if sort is not None:
+        order_by = get_sort_order_by(table, sort)
+    keyset_cursor = len(order_by) > 0
+    order_by.append((cursor_field, order))
+    # the sorted fields are in the result except the expressions
+    cursor_sort_fields = {
+        field: f"cursor_sort_{index}" for index, (field, _) in enumerate(order_by) if "(" in field
+    }
 
     cursor = db.cursor()
 
@@ -222,11 +301,18 @@ def select_rows(
     if offset is None and last_cursor is not None:
         if where_clause != "":
             where_clause = f"({where_clause}) AND "
-        if order == "ASC":
+        if keyset_cursor:
+            keyset_where, keyset_bindings = get_keyset_where(
+                order_by, decode_keyset_cursor(last_cursor, len(order_by))
+            )
+            where_clause += keyset_where
+            bindings += keyset_bindings
+        elif order == "ASC":
             where_clause += f" {cursor_field} >= ?"
+            bindings.append(last_cursor)
         else:
             where_clause += f" {cursor_field} <= ?"
-        bindings.append(last_cursor)
+            bindings.append(last_cursor)
 
     if where_clause:
         where_clause = f"WHERE ({where_clause}) "
@@ -255,6 +341,8 @@ def select_rows(
         select = f"{select}, confirmed"
     if table in ["transactions", "sends", "btcpays", "sweeps", "dispenses"]:
         select += ", NULLIF(destination, '') AS destination"
+    for field, alias in cursor_sort_fields.items():
+        select += f", {field} AS {alias}"
 
     query = f"SELECT {select} FROM {table} {where_clause} {group_by_clause}"  # nosec B608  # noqa: S608
     query_count = f"SELECT {select} FROM {table} {where_clause_count} {group_by_clause}"  # nosec B608  # noqa: S608
@@ -271,28 +359,14 @@ def select_rows(
         wrap_where_clause = " AND ".join(wrap_where_field)
         wrap_where_clause = f"WHERE {wrap_where_clause}"
         query = f"SELECT * FROM ({query}) {wrap_where_clause}"  # nosec B608  # noqa: S608
-        query_count = f"SELECT COUNT(*) AS count FROM ({query_count}) {wrap_where_clause}"  # nosec B608  # noqa: S608
-    else:
-        query_count = f"SELECT COUNT(*) AS count FROM ({query_count})"  # nosec B608  # noqa: S608
+        query_count = f"SELECT * FROM ({query_count}) {wrap_where_clause}"  # nosec B608  # noqa: S608
+    if config.API_MAX_RESULT_COUNT:
+        # stop counting after `config.API_MAX_RESULT_COUNT` rows
+        query_count = f"{query_count} LIMIT ?"
+        bindings_count.append(config.API_MAX_RESULT_COUNT)
+    query_count = f"SELECT COUNT(*) AS count FROM ({query_count})"  # nosec B608  # noqa: S608
 
-    order_by = []
-    if sort is not None:
-        sort_fields = sort.split(",")
-        for sort_field in sort_fields:
-            if ":" in sort_field:
-                sort_name, sort_order = sort_field.split(":")[0:2]
-            else:
-                sort_name = sort_field
-                sort_order = "ASC"
-            if sort_order.upper() not in ["ASC", "DESC"]:
-                sort_order = "ASC"
-            if sort_name == "asset":
-                order_by.append(f"COALESCE(asset_longname, asset) {sort_order.upper()}")
-            elif sort_name in SUPPORTED_SORT_FIELDS.get(table, []):
-                order_by.append(f"{sort_name} {sort_order.upper()}")
-    if len(order_by) == 0:
-        order_by.append(f"{cursor_field} {order}")
-    order_by_clause = f"ORDER BY {','.join(order_by)}"
+    order_by_clause = f"ORDER BY {','.join(f'{field} {order}' for field, order in order_by)}"
 
     query = f"{query} {order_by_clause} LIMIT ?"  # nosec B608  # noqa: S608
     bindings.append(limit + 1)
@@ -305,16 +379,27 @@ def select_rows(
         cursor.execute(query, bindings)
         result = cursor.fetchall()
 
-    with start_sentry_span(op="db.sql.execute", description=query_count) as sql_span:
-        sql_span.set_tag("db.system", "sqlite3")
-        cursor.execute(query_count, bindings_count)
-        result_count = cursor.fetchone()["count"]
-
     if result and len(result) > limit:
         next_cursor = result[-1][cursor_field]
+        if keyset_cursor:
+            next_cursor = encode_keyset_cursor(
+                [result[-1][cursor_sort_fields.get(field, field)] for field, _ in order_by]
+            )
         result = result[:-1]
     else:
         next_cursor = None
+    for row in result:
+        for alias in cursor_sort_fields.values():
+            del row[alias]
+
+    if next_cursor is None and last_cursor is None and (offset is None or result):
+        # the last page gives the count
+        result_count = (offset or 0) + len(result)
+    else:
+        with start_sentry_span(op="db.sql.execute", description=query_count) as sql_span:
+            sql_span.set_tag("db.system", "sqlite3")
+            cursor.execute(query_count, bindings_count)
+            result_count = cursor.fetchone()["count"]
 
     if table in ["messages", "mempool"]:
         for row in result:
@@ -1550,7 +1635,7 @@ def get_address_balances(
     :param str cursor: The last index of the balances to return
     :param int limit: The maximum number of balances to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the balances to return (overrides the `cursor` parameter) (e.g. quantity:desc)
+    :param str sort: The sort order of the balances to return (e.g. quantity:desc)
     """
     return select_rows(
         db,
@@ -1595,7 +1680,7 @@ def get_balances_by_addresses(
     :param str cursor: The last index of the balances to return
     :param int limit: The maximum number of balances to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the balances to return (overrides the `cursor` parameter) (e.g. quantity:desc)
+    :param str sort: The sort order of the balances to return (e.g. quantity:desc)
     """
     assets_result = select_rows(
         db,
@@ -1912,7 +1997,7 @@ def get_dispensers(
     :param str cursor: The last index of the dispensers to return
     :param int limit: The maximum number of dispensers to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the dispensers to return (overrides the `cursor` parameter) (e.g. block_index:asc)
+    :param str sort: The sort order of the dispensers to return (e.g. block_index:asc)
     """
 
     return select_rows(
@@ -1943,7 +2028,7 @@ def get_dispensers_by_address(
     :param str cursor: The last index of the dispensers to return
     :param int limit: The maximum number of dispensers to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the dispensers to return (overrides the `cursor` parameter) (e.g. give_quantity:desc)
+    :param str sort: The sort order of the dispensers to return (e.g. give_quantity:desc)
     """
     return select_rows(
         db,
@@ -1973,7 +2058,7 @@ def get_dispensers_by_asset(
     :param str cursor: The last index of the dispensers to return
     :param int limit: The maximum number of dispensers to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the dispensers to return (overrides the `cursor` parameter) (e.g. give_quantity:desc)
+    :param str sort: The sort order of the dispensers to return (e.g. give_quantity:desc)
     """
     return select_rows(
         db,
@@ -2250,7 +2335,7 @@ def get_asset_balances(
     :param str cursor: The last index of the balances to return
     :param int limit: The maximum number of balances to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the balances to return (overrides the `cursor` parameter) (e.g. quantity:desc)
+    :param str sort: The sort order of the balances to return (e.g. quantity:desc)
     """
     return select_rows(
         db,
@@ -2312,7 +2397,7 @@ def get_orders(
     :param str cursor: The last index of the orders to return
     :param int limit: The maximum number of orders to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the orders to return (overrides the `cursor` parameter) (e.g. expiration:desc)
+    :param str sort: The sort order of the orders to return (e.g. expiration:desc)
     """
     where = {}
     if get_asset:
@@ -2348,7 +2433,7 @@ def get_orders_by_asset(
     :param str cursor: The last index of the orders to return
     :param int limit: The maximum number of orders to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the orders to return (overrides the `cursor` parameter) (e.g. expiration:desc)
+    :param str sort: The sort order of the orders to return (e.g. expiration:desc)
     """
     where = prepare_order_where(status, {"give_asset": asset.upper()}) + prepare_order_where(
         status, {"get_asset": asset.upper()}
@@ -2383,7 +2468,7 @@ def get_orders_by_address(
     :param str cursor: The last index of the orders to return
     :param int limit: The maximum number of orders to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the orders to return (overrides the `cursor` parameter) (e.g. expiration:desc)
+    :param str sort: The sort order of the orders to return (e.g. expiration:desc)
     """
     return select_rows(
         db,
@@ -2416,7 +2501,7 @@ def get_orders_by_two_assets(
     :param str cursor: The last index of the orders to return
     :param int limit: The maximum number of orders to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the orders to return (overrides the `cursor` parameter) (e.g. expiration:desc)
+    :param str sort: The sort order of the orders to return (e.g. expiration:desc)
     """
     where = prepare_order_where(
         status, {"give_asset": asset1.upper(), "get_asset": asset2.upper()}
@@ -2490,7 +2575,7 @@ def get_all_order_matches(
     :param str cursor: The last index of the order matches to return
     :param int limit: The maximum number of order matches to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the order matches to return (overrides the `cursor` parameter) (e.g. forward_quantity:desc)
+    :param str sort: The sort order of the order matches to return (e.g. forward_quantity:desc)
     """
     return select_rows(
         db,
@@ -2519,7 +2604,7 @@ def get_order_matches_by_order(
     :param str cursor: The last index of the order matches to return
     :param int limit: The maximum number of order matches to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the order matches to return (overrides the `cursor` parameter) (e.g. forward_quantity:desc)
+    :param str sort: The sort order of the order matches to return (e.g. forward_quantity:desc)
     """
     where = prepare_order_matches_where(
         status, {"tx0_hash": order_hash}
@@ -2551,7 +2636,7 @@ def get_order_matches_by_asset(
     :param str cursor: The last index of the order matches to return
     :param int limit: The maximum number of order matches to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the order matches to return (overrides the `cursor` parameter) (e.g. forward_quantity:desc)
+    :param str sort: The sort order of the order matches to return (e.g. forward_quantity:desc)
     """
     where = prepare_order_matches_where(
         status, {"forward_asset": asset.upper()}
@@ -2586,7 +2671,7 @@ def get_order_matches_by_two_assets(
     :param str cursor: The last index of the order matches to return
     :param int limit: The maximum number of order matches to return (e.g. 5)
     :param int offset: The number of lines to skip before returning results (overrides the `cursor` parameter)
-    :param str sort: The sort order of the order matches to return (overrides the `cursor` parameter) (e.g. forward_quantity:desc)
+    :param str sort: The sort order of the order matches to return (e.g. forward_quantity:desc)
     """
     where = prepare_order_matches_where(
         status, {"forward_asset": asset1.upper(), "backward_asset": asset2.upper()}
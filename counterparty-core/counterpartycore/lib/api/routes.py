@@ -1,4 +1,5 @@
-from counterpartycore.lib.api import compose, queries, util
+from counterpartycore.lib import profiler
+from counterpartycore.lib.api import cache, compose, queries, util
 from counterpartycore.lib.backend import addrindexrs, bitcoind
 
 
@@ -184,6 +185,10 @@ ROUTES = util.prepare_routes(
         "/v2/mempool/transactions/<tx_hash>/events": queries.get_mempool_events_by_tx_hash,
         ### /routes ###
         "/v2/routes": get_routes,
+        ### /profile ###
+        "/v2/profile": profiler.get_profile,
+        ### /cache ###
+        "/v2/cache": cache.get_cache_statistics,
         ### /healthz ###
         "/v2/healthz": util.check_server_health,
         "/healthz": util.check_server_health,
@@ -20,12 +20,15 @@ from counterpartycore.lib import (
     transaction_helper,
     util,
 )
-from counterpartycore.lib.api import compose
+from counterpartycore.lib.api import cache, compose
 from docstring_parser import parse as parse_docstring
 
 D = decimal.Decimal
 logger = logging.getLogger(config.LOGGER_NAME)
 
+# characters sent at once by `to_json_chunks()`
+JSON_CHUNK_SIZE = 65536
+
 
 def check_last_parsed_block(db, blockcount):
     """Checks database to see if is caught up with backend."""
@@ -296,6 +299,31 @@ def to_json(obj, indent=None):
     return json.dumps(obj, cls=ApiJsonEncoder, indent=indent)
 
 
+def to_json_chunks(api_result, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Yield the same JSON as `to_json(api_result)` in chunks of about `chunk_size` characters,
+    without building the whole string. The `result` key must come first.
+    """
+    # `encode()` uses the C encoder, `iterencode()` the pure Python one
+    encoder = ApiJsonEncoder()
+    chunk = ['{"result": [']
+    chunk_length = 0
+    for index, row in enumerate(api_result["result"]):
+        row_json = encoder.encode(row)
+        chunk.append(f", {row_json}" if index > 0 else row_json)
+        chunk_length += len(row_json)
+        if chunk_length >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+            chunk_length = 0
+    chunk.append("]")
+    for key, value in api_result.items():
+        if key != "result":
+            chunk.append(f", {encoder.encode(key)}: {encoder.encode(value)}")
+    chunk.append("}")
+    yield "".join(chunk)
+
+
 def divide(value1, value2):
     decimal.getcontext().prec = 8
     if value2 == 0 or value1 == 0:
@@ -308,7 +336,7 @@ def normalize_price(value):
     return "{0:.16f}".format(D(value))
 
 
-def inject_issuances_and_block_times(db, result_list):
+def inject_issuances_and_block_times(db, result_list, use_worker_caches=False):
     asset_fields = [
         "asset",
         "give_asset",
@@ -319,8 +347,8 @@ def inject_issuances_and_block_times(db, result_list):
     ]
 
     # gather asset list and block indexes
-    asset_list = []
-    block_indexes = []
+    asset_list = set()
+    block_indexes = set()
     for result_item in result_list:
         for field_name in [
             "block_index",
@@ -335,19 +363,14 @@ def inject_issuances_and_block_times(db, result_list):
                 and result_item["params"][field_name]
             ):
                 result_item["params"][field_name] = int(result_item["params"][field_name])
-            if (
-                field_name in result_item
-                and result_item[field_name] not in block_indexes
-                and result_item[field_name]
-            ):
-                block_indexes.append(result_item[field_name])
+            if field_name in result_item and result_item[field_name]:
+                block_indexes.add(result_item[field_name])
             if (
                 "params" in result_item
                 and field_name in result_item["params"]
-                and result_item["params"][field_name] not in block_indexes
                 and result_item["params"][field_name]
             ):
-                block_indexes.append(result_item["params"][field_name])
+                block_indexes.add(result_item["params"][field_name])
 
         if (
             "asset_longname" in result_item
@@ -366,17 +389,17 @@ def inject_issuances_and_block_times(db, result_list):
             if isinstance(item, list):
                 for sub_item in item:
                     if field_name in sub_item:
-                        if sub_item[field_name] not in asset_list:
-                            asset_list.append(sub_item[field_name])
+                        asset_list.add(sub_item[field_name])
             elif field_name in item:
-                if item[field_name] not in asset_list:
-                    asset_list.append(item[field_name])
+                asset_list.add(item[field_name])
 
-    # get asset issuances
-    issuance_by_asset = ledger.get_assets_last_issuance(db, asset_list)
-
-    # get block_time for each block_index
-    block_times = ledger.get_blocks_time(db, block_indexes)
+    # get asset issuances and block_time for each block_index
+    if use_worker_caches:
+        issuance_by_asset = cache.AssetsInfoCache().get_assets_last_issuance(db, asset_list)
+        block_times = cache.BlocksTimeCache().get_blocks_time(db, block_indexes)
+    else:
+        issuance_by_asset = ledger.get_assets_last_issuance(db, list(asset_list))
+        block_times = ledger.get_blocks_time(db, list(block_indexes))
 
     # inject issuance and block_time
     for result_item in result_list:
@@ -635,17 +658,29 @@ def inject_normalized_quantities(result_list):
     return enriched_result_list
 
 
-def inject_fiat_price(db, dispenser):
+def get_oracle_prices(db, dispensers):
+    """Return the last price of the oracles of `dispensers` by oracle address."""
+    oracle_addresses = {
+        dispenser["oracle_address"]
+        for dispenser in dispensers
+        if "satoshirate" in dispenser and dispenser.get("oracle_address") is not None
+    }
+    return ledger.get_oracles_last_price(db, list(oracle_addresses), util.CURRENT_BLOCK_INDEX)
+
+
+def inject_fiat_price(db, dispenser, oracle_prices=None):
     if "satoshirate" not in dispenser:
         return dispenser
     if dispenser["oracle_address"] != None:  # noqa: E711
         dispenser["fiat_price"] = util.satoshirate_to_fiat(dispenser["satoshirate"])
+        if oracle_prices is None:
+            oracle_prices = get_oracle_prices(db, [dispenser])
         (
             dispenser["oracle_price"],
             _oracle_fee,
             dispenser["fiat_unit"],
             dispenser["oracle_price_last_updated"],
-        ) = ledger.get_oracle_last_price(db, dispenser["oracle_address"], util.CURRENT_BLOCK_INDEX)
+        ) = oracle_prices.get(dispenser["oracle_address"], (None, None, None, None))
 
         if dispenser["oracle_price"] > 0:
             dispenser["satoshi_price"] = math.ceil(
@@ -662,23 +697,29 @@ def inject_fiat_price(db, dispenser):
     return dispenser
 
 
-def inject_fiat_prices(db, result_list):
+def inject_fiat_prices(db, result_list, oracle_prices=None):
+    if oracle_prices is None:
+        oracle_prices = get_oracle_prices(db, result_list)
     enriched_result_list = []
     for result_item in result_list:
-        enriched_result_list.append(inject_fiat_price(db, result_item))
+        enriched_result_list.append(inject_fiat_price(db, result_item, oracle_prices))
     return enriched_result_list
 
 
-def inject_dispensers(db, result_list):
-    # gather dispenser list
-    dispenser_list = []
-    for result_item in result_list:
-        if "dispenser_tx_hash" in result_item:
-            if result_item["dispenser_tx_hash"] not in dispenser_list:
-                dispenser_list.append(result_item["dispenser_tx_hash"])
+def get_dispensers_info(db, result_list):
+    dispenser_list = {
+        result_item["dispenser_tx_hash"]
+        for result_item in result_list
+        if "dispenser_tx_hash" in result_item
+    }
+    return ledger.get_dispensers_info(db, list(dispenser_list))
+
 
-    # get dispenser info
-    dispenser_info = ledger.get_dispensers_info(db, dispenser_list)
+def inject_dispensers(db, result_list, dispenser_info=None, oracle_prices=None):
+    if dispenser_info is None:
+        dispenser_info = get_dispensers_info(db, result_list)
+    if oracle_prices is None:
+        oracle_prices = get_oracle_prices(db, dispenser_info.values())
 
     # inject dispenser info
     enriched_result_list = []
@@ -688,7 +729,7 @@ def inject_dispensers(db, result_list):
             and result_item["dispenser_tx_hash"] in dispenser_info
         ):
             result_item["dispenser"] = inject_fiat_price(
-                db, dispenser_info[result_item["dispenser_tx_hash"]]
+                db, dispenser_info[result_item["dispenser_tx_hash"]], oracle_prices
             )
         enriched_result_list.append(result_item)
 
@@ -714,7 +755,7 @@ def inject_unpacked_data(db, result_list):
     return enriched_result_list
 
 
-def inject_details(db, result, rule=None):
+def inject_details(db, result, rule=None, use_worker_caches=False):
     if isinstance(result, (int, str)):
         return result
     # let's work with a list
@@ -724,10 +765,13 @@ def inject_details(db, result, rule=None):
         result_list = [result]
         result_is_dict = True
 
-    result_list = inject_dispensers(db, result_list)
-    result_list = inject_fiat_prices(db, result_list)
+    # the dispensers and the oracle prices of the whole list are fetched at once
+    dispenser_info = get_dispensers_info(db, result_list)
+    oracle_prices = get_oracle_prices(db, result_list + list(dispenser_info.values()))
+    result_list = inject_dispensers(db, result_list, dispenser_info, oracle_prices)
+    result_list = inject_fiat_prices(db, result_list, oracle_prices)
     result_list = inject_unpacked_data(db, result_list)
-    result_list = inject_issuances_and_block_times(db, result_list)
+    result_list = inject_issuances_and_block_times(db, result_list, use_worker_caches)
     result_list = inject_normalized_quantities(result_list)
 
     if result_is_dict:
@@ -64,7 +64,7 @@ def refresh_backend_height(db, start=False):
         BACKEND_HEIGHT = get_backend_height()
         # print(f"BACKEND_HEIGHT: {BACKEND_HEIGHT} ({os.getpid()})")
         refresh_current_block(db)
-        backend.addrindexrs.clear_raw_transactions_cache()
+        backend.addrindexrs.refresh_raw_transactions_cache()
         if not is_server_ready():
             if BACKEND_HEIGHT > util.CURRENT_BLOCK_INDEX:
                 logger.debug(
@@ -1,18 +1,19 @@
-import collections
 import concurrent.futures
 import hashlib
 import json
 import logging
-import queue
+import os
 import socket
 import sys
 import threading
 import time
+from collections import OrderedDict
 
+import apsw
 import bitcoin.wallet
 
 from counterpartycore.lib import config, exceptions, util
-from counterpartycore.lib.backend.bitcoind import getblockcount, rpc_call
+from counterpartycore.lib.backend.bitcoind import getblockcount, getblockhash, rpc_batch
 
 logger = logging.getLogger(config.LOGGER_NAME)
 
@@ -26,9 +27,170 @@ BACKOFF_MAX = 8
 BACKOFF_FACTOR = 2
 
 INDEXER_THREAD = None
-raw_transactions_cache = util.DictCache(
-    size=config.BACKEND_RAW_TRANSACTIONS_CACHE_SIZE
-)  # used in getrawtransaction_batch()
+# connections of `AddrIndexRsClientPool`, the requests are pipelined on each one
+INDEXER_CONNECTIONS = 4
+# addresses looked up concurrently by `get_unspent_txouts_by_addresses()`
+ADDRESSES_LOOKUP_WORKERS = 8
+
+# size of the JSON of the transactions kept in memory by `RawTransactionsCache`
+RAW_TRANSACTIONS_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# the transactions with enough confirmations to be safe from reorgs are shared by the
+# processes through `config.BACKEND_RAW_TRANSACTIONS_CACHE_FILE`
+RAW_TRANSACTIONS_STORE_MIN_CONFIRMATIONS = 6
+RAW_TRANSACTIONS_STORE_SIZE = 200000
+
+
+class RawTransactionsCache:
+    """
+    Threadsafe LRU cache of the verbose transactions by txid, used in `getrawtransaction_batch()`.
+    The confirmations of the confirmed transactions follow the block count given to
+    `new_block()`, which removes only the unconfirmed and missing transactions, and after
+    a reorg the ones that are not confirmed enough to be safe from it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # tx_hash -> (transaction, height, size)
+        self.transactions = OrderedDict()
+        self.size = 0
+        self.block_count = None
+        self.block_hash = None
+        self.db = None
+        self.pid = None
+
+    def connection(self):
+        if config.BACKEND_RAW_TRANSACTIONS_CACHE_FILE is None or self.block_count is None:
+            return None
+        # the gunicorn workers are forked after the creation of the cache
+        if self.pid != os.getpid():
+            self.db = apsw.Connection(config.BACKEND_RAW_TRANSACTIONS_CACHE_FILE)
+            self.db.setbusytimeout(5000)
+            cursor = self.db.cursor()
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = OFF")
+            cursor.execute(
+                """CREATE TABLE IF NOT EXISTS transactions(
+                    tx_hash TEXT PRIMARY KEY,
+                    height INTEGER,
+                    tx TEXT)
+                """
+            )
+            self.pid = os.getpid()
+        return self.db
+
+    def get_transaction(self, tx_hash):
+        transaction, height, _size = self.transactions[tx_hash]
+        if transaction is None or height is None or self.block_count is None:
+            return transaction
+        return transaction | {"confirmations": self.block_count - height + 1}
+
+    def add_transaction(self, tx_hash, transaction, height):
+        if tx_hash in self.transactions:
+            self.size -= self.transactions.pop(tx_hash)[2]
+        size = len(json.dumps(transaction)) if transaction is not None else 0
+        self.transactions[tx_hash] = (transaction, height, size)
+        self.size += size
+        while self.size > RAW_TRANSACTIONS_CACHE_MAX_BYTES:
+            self.size -= self.transactions.popitem(last=False)[1][2]
+
+    def get_many(self, tx_hashes):
+        """Return the cached transactions of `tx_hashes`, `None` for the missing ones."""
+        result = {}
+        with self.lock:
+            for tx_hash in tx_hashes:
+                if tx_hash in self.transactions:
+                    self.transactions.move_to_end(tx_hash)
+                    result[tx_hash] = self.get_transaction(tx_hash)
+            not_cached = [tx_hash for tx_hash in tx_hashes if tx_hash not in result]
+            db = self.connection()
+            if db is None or len(not_cached) == 0:
+                return result
+            cursor = db.cursor()
+            for chunk in util.chunkify(not_cached, 500):
+                bindings = ",".join(["?"] * len(chunk))
+                for tx_hash, height, tx in cursor.execute(
+                    f"SELECT tx_hash, height, tx FROM transactions WHERE tx_hash IN ({bindings})",  # noqa: S608
+                    chunk,
+                ):
+                    self.add_transaction(tx_hash, json.loads(tx), height)
+                    result[tx_hash] = self.get_transaction(tx_hash)
+        return result
+
+    def set_many(self, transactions, block_count=None):
+        """
+        Cache the `transactions` by txid fetched when Bitcoin Core had `block_count` blocks.
+        Their heights are computed from the block count of the last `new_block()`, the
+        confirmed transactions are not cached if the tip moved since.
+        """
+        stored_transactions = []
+        with self.lock:
+            for tx_hash, transaction in transactions.items():
+                height = None
+                confirmations = (transaction or {}).get("confirmations", 0)
+                if self.block_count is not None and confirmations > 0:
+                    if block_count != self.block_count:
+                        continue
+                    height = self.block_count - confirmations + 1
+                    if confirmations >= RAW_TRANSACTIONS_STORE_MIN_CONFIRMATIONS:
+                        stored_transactions.append((tx_hash, height, json.dumps(transaction)))
+                self.add_transaction(tx_hash, transaction, height)
+            db = self.connection()
+            if db is None or len(stored_transactions) == 0:
+                return
+            cursor = db.cursor()
+            with db:
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO transactions VALUES (?, ?, ?)", stored_transactions
+                )
+                entry_count = cursor.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+                if entry_count > RAW_TRANSACTIONS_STORE_SIZE:
+                    cursor.execute(
+                        """DELETE FROM transactions WHERE rowid IN (
+                            SELECT rowid FROM transactions ORDER BY rowid LIMIT ?
+                        )""",
+                        (entry_count - RAW_TRANSACTIONS_STORE_SIZE,),
+                    )
+
+    def new_block(self, block_count, block_hash, reorg=False):
+        """
+        Remove the transactions that the blocks since the last call may have changed. If the
+        last blocks are not only extended (`reorg`), the transactions with less than
+        `RAW_TRANSACTIONS_STORE_MIN_CONFIRMATIONS` confirmations are removed too.
+        """
+        with self.lock:
+            if block_count == self.block_count and block_hash == self.block_hash:
+                return
+            last_safe_height = None
+            if reorg and self.block_count is not None:
+                last_safe_height = (
+                    min(block_count, self.block_count)
+                    - RAW_TRANSACTIONS_STORE_MIN_CONFIRMATIONS
+                    + 1
+                )
+            for tx_hash, (transaction, height, size) in list(self.transactions.items()):
+                if (
+                    transaction is None
+                    or height is None
+                    or (last_safe_height is not None and height > last_safe_height)
+                ):
+                    del self.transactions[tx_hash]
+                    self.size -= size
+            self.block_count = block_count
+            self.block_hash = block_hash
+            db = self.connection()
+            if last_safe_height is not None and db is not None:
+                with db:
+                    db.cursor().execute(
+                        "DELETE FROM transactions WHERE height > ?", (last_safe_height,)
+                    )
+
+    def clear(self):
+        with self.lock:
+            self.transactions.clear()
+            self.size = 0
+
+
+raw_transactions_cache = RawTransactionsCache()  # used in getrawtransaction_batch()
 
 
 class BackendRPCError(Exception):
@@ -43,24 +205,6 @@ class AddrIndexRsClientError(Exception):
     pass
 
 
-def rpc_batch(request_list):
-    responses = collections.deque()
-
-    def make_call(chunk):
-        # send a list of requests to bitcoind to be executed
-        # note that this is list executed serially, in the same thread in bitcoind
-        # e.g. see: https://github.com/bitcoin/bitcoin/blob/master/src/rpcserver.cpp#L939
-        responses.extend(rpc_call(chunk))
-
-    chunks = util.chunkify(request_list, config.RPC_BATCH_SIZE)
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=config.BACKEND_RPC_BATCH_NUM_WORKERS
-    ) as executor:
-        for chunk in chunks:
-            executor.submit(make_call, chunk)
-    return list(responses)
-
-
 GETRAWTRANSACTION_MAX_RETRIES = 2
 MONOTONIC_CALL_ID = 0
 
@@ -81,13 +225,13 @@ def getrawtransaction_batch(txhash_list, verbose=False, skip_missing=False, _ret
 
     tx_hash_call_id = {}
     payload = []
-    noncached_txhashes = set()
 
     txhash_list = set(txhash_list)
+    cached_transactions = raw_transactions_cache.get_many(txhash_list)
 
     # payload for transactions not in cache
     for tx_hash in txhash_list:
-        if tx_hash not in raw_transactions_cache:
+        if tx_hash not in cached_transactions:
             # call_id = binascii.hexlify(os.urandom(5)).decode('utf8') # Don't drain urandom
             global MONOTONIC_CALL_ID  # noqa: PLW0603
             MONOTONIC_CALL_ID = MONOTONIC_CALL_ID + 1
@@ -100,24 +244,19 @@ def getrawtransaction_batch(txhash_list, verbose=False, skip_missing=False, _ret
                     "id": call_id,
                 }
             )
-            noncached_txhashes.add(tx_hash)
             tx_hash_call_id[call_id] = tx_hash
-    # refresh any/all cache entries that already exist in the cache,
-    # so they're not inadvertently removed by another thread before we can consult them
-    # (this assumes that the size of the working set for any given workload doesn't exceed the max size of the cache)
-    for tx_hash in txhash_list.difference(noncached_txhashes):
-        raw_transactions_cache.refresh(tx_hash)
 
     # populate cache
     if len(payload) > 0:
         batch_responses = rpc_batch(payload)
+        fetched_transactions = {}
         for response in batch_responses:
             if "error" not in response or response["error"] is None:
                 tx_hex = response["result"]
                 tx_hash = tx_hash_call_id[response["id"]]
-                raw_transactions_cache[tx_hash] = tx_hex
+                fetched_transactions[tx_hash] = tx_hex
             elif skip_missing and "error" in response and response["error"]["code"] == -5:
-                raw_transactions_cache[tx_hash] = None
+                fetched_transactions[tx_hash_call_id[response["id"]]] = None
                 # missing_tx_hash = tx_hash_call_id.get(response.get("id", "??"), "??")
                 # logger.debug(
                 #    f"Missing TX with no raw info skipped (txhash: {missing_tx_hash}): {response['error']}"
@@ -127,17 +266,23 @@ def getrawtransaction_batch(txhash_list, verbose=False, skip_missing=False, _ret
                 raise BackendRPCError(
                     f"{response['error']} (txhash:: {tx_hash_call_id.get(response.get('id', '??'), '??')})"
                 )
+        # counted after the fetch, the tip did not move since `new_block()` if it is the same
+        block_count = None
+        if raw_transactions_cache.block_count is not None:
+            block_count = getblockcount()
+        raw_transactions_cache.set_many(fetched_transactions, block_count)
+        cached_transactions.update(fetched_transactions)
 
     # get transactions from cache
     result = {}
     for tx_hash in txhash_list:
         try:
             if verbose:
-                result[tx_hash] = raw_transactions_cache[tx_hash]
+                result[tx_hash] = cached_transactions[tx_hash]
             else:
                 result[tx_hash] = (
-                    raw_transactions_cache[tx_hash]["hex"]
-                    if raw_transactions_cache[tx_hash] is not None
+                    cached_transactions[tx_hash]["hex"]
+                    if cached_transactions[tx_hash] is not None
                     else None
                 )
         except KeyError:  # shows up most likely due to finickyness with addrindex not always returning results that we need...
@@ -159,12 +304,33 @@ def getrawtransaction_batch(txhash_list, verbose=False, skip_missing=False, _ret
     return result
 
 
+def read_message(sock, buffer, buffer_size=READ_BUF_SIZE):
+    """
+    Read the next newline-delimited JSON message from `sock`. `buffer` is a `bytearray` with
+    the bytes received after the previous message, only the new chunks are searched for the
+    end of the message.
+    """
+    scanned = 0
+    while True:
+        end = buffer.find(b"\n", scanned)
+        if end >= 0:
+            message = json.loads(buffer[:end])
+            del buffer[: end + 1]
+            return message
+        scanned = len(buffer)
+        chunk = sock.recv(buffer_size)
+        if not chunk:
+            raise ConnectionAbortedError("Socket disconnected")
+        buffer += chunk
+
+
 class SocketManager:
     def __init__(self, host, port, timeout=SOCKET_TIMEOUT):
         self.host = host
         self.port = port
         self.timeout = timeout
         self.socket = None
+        self.buffer = bytearray()
         self.connected = False
 
     def log(self, message, level=logging.DEBUG):
@@ -181,6 +347,7 @@ class SocketManager:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(self.timeout)
             self.socket.connect((self.host, self.port))
+            self.buffer = bytearray()
             self.connected = True
             self.log("Connected")
         except socket.timeout as e:
@@ -196,6 +363,7 @@ class SocketManager:
     def disconnect(self):
         if self.connected:
             try:
+                self.shutdown()
                 self.socket.close()
                 self.connected = False
                 self.log("Disconnected")
@@ -203,6 +371,13 @@ class SocketManager:
                 self.log(f"Unknown exception: {e}", level=logging.ERROR)
                 raise e
 
+    def shutdown(self):
+        # wakes up the thread blocked in `recv()`, which `close()` does not
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
     def send(self, message):
         if not self.connected:
             self.connect()
@@ -219,36 +394,38 @@ class SocketManager:
             self.connected = False
             raise e
 
-    def recv(self, parse=lambda a: json.loads(a.decode("utf8")), buffer_size=READ_BUF_SIZE):
+    def recv(self, buffer_size=READ_BUF_SIZE):
         if not self.connected:
-            self.connect()
+            raise ConnectionError("Not connected")
+
+        try:
+            return read_message(self.socket, self.buffer, buffer_size)
+        except socket.timeout as e:
+            self.log(f"Timeout receiving message: {e}", level=logging.WARNING)
+            raise e
+        except Exception as e:
+            self.log(f"Error receiving message: {e}", level=logging.ERROR)
+            self.connected = False
+            raise e
 
-        response = b""
-        while True:
-            try:
-                chunk = self.socket.recv(buffer_size)
-                if not chunk:
-                    raise Exception("Socket disconnected")
-                response += chunk
-                # self.log(""chunk received: {chunk}, response: {response}")
-                try:
-                    res = parse(response)
-                    # self.log("received message: { res}")
-                    return res
-                except json.JSONDecodeError:
-                    # self.log("JSONDecodeError -- continuing")
-                    continue
-            except socket.timeout as e:
-                self.log(f"Timeout receiving message: {e}", level=logging.WARNING)
-                self.connected = False
-                raise e
-            except Exception as e:
-                self.log(f"Error receiving message: {e}", level=logging.ERROR)
-                self.connected = False
-                raise e
+
+class PendingRequest:
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+
+    def set_response(self, response):
+        self.response = response
+        self.event.set()
 
 
 class AddrIndexRsClient:
+    """
+    Pipelined client: the requests are written on the connection by the calling threads
+    without waiting for the previous responses, the thread of the client reads the responses
+    and dispatches them to the callers by id.
+    """
+
     def __init__(
         self,
         host,
@@ -260,19 +437,24 @@ class AddrIndexRsClient:
     ):
         self.host = host
         self.port = port
+        self.timeout = timeout
         self.socket_manager = SocketManager(host, port, timeout)
         self.log = self.socket_manager.log
         self.thread = threading.Thread(target=self._run, name="AddrIndexRsClient")
-        self.req_queue = queue.Queue()
-        self.res_queue = queue.Queue()
         self.is_running = False
+        # set while the connection is up, the reader thread reconnects when it is lost
+        self.ready = threading.Event()
 
+        self.backoff_start = backoff_start
         self.backoff = backoff_start
         self.backoff_max = backoff_max
         self.backoff_factor = backoff_factor
 
         self.msg_id = 0
         self.msg_id_lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        # id -> `PendingRequest` of the requests sent and not answered yet
+        self.pending = {}
 
     def start(self):
         if self.is_running:
@@ -283,6 +465,7 @@ class AddrIndexRsClient:
             try:
                 self.socket_manager.connect()
                 self.is_running = True
+                self.ready.set()
                 self.thread.start()
                 break
             except Exception as e:
@@ -300,25 +483,46 @@ class AddrIndexRsClient:
 
         self.is_running = False
         try:
+            self.ready.clear()
             self.socket_manager.disconnect()
-            self.req_queue.join()
-            self.res_queue.join()
             self.thread.join()
+            self._fail_pending("AddrIndexRsClient stopped")
         except Exception as e:
             self.log(f"Error while stopping: {e}", level=logging.ERROR)
 
+    def pending_count(self):
+        return len(self.pending)
+
     def send(self, msg):
+        pending = PendingRequest()
         with self.msg_id_lock:
             msg["id"] = self.msg_id
             self.msg_id += 1
+            self.pending[msg["id"]] = pending
 
         serialized_msg = (json.dumps(msg) + "\n").encode("utf8")
 
-        self.req_queue.put(serialized_msg)
-
-        res = self.res_queue.get()
-
-        self.res_queue.task_done()
+        if not self.ready.wait(self.timeout):
+            res = {"error": "Not connected"}
+        else:
+            try:
+                with self.send_lock:
+                    if not self.ready.is_set():
+                        raise ConnectionError("Not connected")
+                    try:
+                        self.socket_manager.send(serialized_msg)
+                    except Exception:
+                        # the reader thread resets the connection
+                        self.socket_manager.shutdown()
+                        raise
+            except Exception as e:
+                res = {"error": str(e)}
+            else:
+                if pending.event.wait(self.timeout):
+                    res = pending.response
+                else:
+                    res = {"error": "Timeout waiting for response"}
+        self.pending.pop(msg["id"], None)
 
         if "error" in res:
             if res["error"] == "no txs for address":
@@ -330,7 +534,7 @@ class AddrIndexRsClient:
 
         if res["id"] != msg["id"]:
             raise AddrIndexRsClientError(
-                "AddrIndexRsClient -- Invalid response id. Expected: {msg['id']}, received: {res['id']}"
+                f"AddrIndexRsClient -- Invalid response id. Expected: {msg['id']}, received: {res['id']}"
             )
 
         if "result" not in res:
@@ -340,25 +544,81 @@ class AddrIndexRsClient:
 
         return res
 
+    def _fail_pending(self, error):
+        with self.msg_id_lock:
+            pending_requests = list(self.pending.values())
+            self.pending.clear()
+        for pending in pending_requests:
+            pending.set_response({"error": error})
+
+    def _reconnect(self):
+        try:
+            self.socket_manager.connect()
+            self.backoff = self.backoff_start
+            self.ready.set()
+        except Exception as e:
+            self.log(
+                f"Failed to reconnect: {e}, retrying in {self.backoff} seconds...",
+                level=logging.WARNING,
+            )
+            time.sleep(self.backoff)
+            self.backoff = min(self.backoff * self.backoff_factor, self.backoff_max)
+
     def _run(self):
         while self.is_running:
+            if not self.ready.is_set():
+                self._reconnect()
+                continue
             try:
-                # logger.debug("AddrIndexRsClient.thread -- waiting for message")
-                # if there is no messager after 1 sec, it will raise queue.Empty
-                msg = self.req_queue.get(timeout=1)
-                self.socket_manager.send(msg)
-                self.req_queue.task_done()
-
-                # wait for response
                 res = self.socket_manager.recv()
-                # logger.debug(f"AddrIndexRsClient.thread -- received response: {res}")
-                self.res_queue.put(res)
-
-            except queue.Empty:
-                continue
+            except socket.timeout:
+                # idle connection
+                if not self.pending:
+                    continue
+                error = "Timeout receiving response"
             except Exception as e:
-                self.log(f"Thread exception: {e}", level=logging.ERROR)
-                self.res_queue.put({"error": str(e)})
+                error = str(e)
+            else:
+                pending = self.pending.pop(res.get("id"), None)
+                if pending is None:
+                    # the caller has already given up
+                    self.log(f"Unexpected response: {res}", level=logging.WARNING)
+                else:
+                    pending.set_response(res)
+                continue
+
+            if not self.is_running:
+                break
+            self.log(f"Thread exception: {error}", level=logging.ERROR)
+            # the requests sent on the lost connection will never be answered
+            with self.send_lock:
+                self.ready.clear()
+                self.socket_manager.shutdown()
+                self.socket_manager.socket.close()
+                self.socket_manager.connected = False
+            self._fail_pending(error)
+
+
+class AddrIndexRsClientPool:
+    """
+    A few pipelined connections to addrindexrs, each request goes through the connection with
+    the fewest pending requests.
+    """
+
+    def __init__(self, host, port, size=INDEXER_CONNECTIONS):
+        self.clients = [AddrIndexRsClient(host, port) for _i in range(size)]
+
+    def start(self):
+        for client in self.clients:
+            client.start()
+
+    def stop(self):
+        for client in self.clients:
+            client.stop()
+
+    def send(self, msg):
+        client = min(self.clients, key=lambda client: client.pending_count())
+        return client.send(msg)
 
 
 def indexer_check_version():
@@ -489,9 +749,17 @@ def get_unspent_txouts_by_addresses(addresses: str, unconfirmed: bool = False):
     :param addresses: The addresses to search for (e.g. $ADDRESS_7,$ADDRESS_8)
     :param unconfirmed: Include unconfirmed transactions
     """
+    init()
+    addresses = addresses.split(",")
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(len(addresses), ADDRESSES_LOOKUP_WORKERS)
+    ) as executor:
+        addresses_unspents = executor.map(
+            lambda address: get_unspent_txouts(address, unconfirmed), addresses
+        )
+        addresses_unspents = list(addresses_unspents)
     unspents = []
-    for address in addresses.split(","):
-        address_unspents = get_unspent_txouts(address, unconfirmed)
+    for address, address_unspents in zip(addresses, addresses_unspents):
         for unspent in address_unspents:
             unspent["address"] = address
         unspents += address_unspents
@@ -575,8 +843,7 @@ def init():
     global INDEXER_THREAD, INITIALIZED  # noqa: PLW0603
     if INITIALIZED:
         return
-    INDEXER_THREAD = AddrIndexRsClient(config.INDEXD_CONNECT, config.INDEXD_PORT)
-    INDEXER_THREAD.daemon = True
+    INDEXER_THREAD = AddrIndexRsClientPool(config.INDEXD_CONNECT, config.INDEXD_PORT)
     INDEXER_THREAD.start()
     logger.info("Connecting to address indexer...")
     indexer_check_version()
@@ -593,7 +860,6 @@ def stop():
 # No locking thread.
 # Assume only one instance of this class is used at a time and not concurrently.
 # This class does not handle most of the errors, it's up to the caller to do so.
-# This class assumes responses are always not longer than READ_BUF_SIZE (65536 bytes).
 # This class assumes responses are always valid JSON.
 
 ADDRINDEXRS_CLIENT_TIMEOUT = 60.0
@@ -613,6 +879,7 @@ class AddrindexrsSocket:
         self.connect()
 
     def connect(self):
+        self.buffer = bytearray()
         try:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.settimeout(ADDRINDEXRS_CLIENT_TIMEOUT)
@@ -627,33 +894,32 @@ class AddrindexrsSocket:
 
         message = (json.dumps(query) + "\n").encode("utf8")
 
-        self.sock.send(message)
+        self.sock.sendall(message)
 
         self.next_message_id += 1
 
-        start_time = time.time()
+        self.sock.settimeout(timeout)
         while True:
             try:
-                data = self.sock.recv(READ_BUF_SIZE)
+                response = read_message(self.sock, self.buffer)
             except (TimeoutError, ConnectionResetError) as e:
                 raise AddrindexrsSocketError("Timeout or connection reset. Please retry.") from e
-            if data:
-                response = json.loads(data.decode("utf-8"))  # assume valid JSON
-                if "id" not in response:
-                    raise AddrindexrsSocketError("No ID in response")
-                if response["id"] != query["id"]:
-                    raise AddrindexrsSocketError("ID mismatch in response")
-                if "error" in response:
-                    if response["error"] == "no txs for address":
-                        return {}
-                    raise AddrindexrsSocketError(response["error"])
-                if "result" not in response:
-                    raise AddrindexrsSocketError("No error and no result in response")
-                return response["result"]
-
-            duration = time.time() - start_time
-            if duration > timeout:
-                raise AddrindexrsSocketTimeoutError("Timeout. Please retry.")
+            except ConnectionAbortedError as e:
+                raise AddrindexrsSocketTimeoutError("Disconnected. Please retry.") from e
+            if "id" not in response:
+                raise AddrindexrsSocketError("No ID in response")
+            # late response to a query abandoned after an error
+            if response["id"] < query["id"]:
+                continue
+            if response["id"] != query["id"]:
+                raise AddrindexrsSocketError("ID mismatch in response")
+            if "error" in response:
+                if response["error"] == "no txs for address":
+                    return {}
+                raise AddrindexrsSocketError(response["error"])
+            if "result" not in response:
+                raise AddrindexrsSocketError("No error and no result in response")
+            return response["result"]
 
     def send(self, query, timeout=ADDRINDEXRS_CLIENT_TIMEOUT, retry=0):
         try:
@@ -713,5 +979,23 @@ def get_oldest_tx(address: str, block_index: int):
     return result
 
 
-def clear_raw_transactions_cache():
-    raw_transactions_cache.clear()
+def refresh_raw_transactions_cache():
+    # the confirmations are counted from the blocks of Bitcoin Core
+    block_count = getblockcount()
+    block_hash = getblockhash(block_count)
+    last_block_count = raw_transactions_cache.block_count
+    last_block_hash = raw_transactions_cache.block_hash
+    if block_count == last_block_count and block_hash == last_block_hash:
+        return
+    # the last tip is still in the chain if the blocks are only extended
+    extended = last_block_count is None or (
+        last_block_count <= block_count and getblockhash(last_block_count) == last_block_hash
+    )
+    raw_transactions_cache.new_block(block_count, block_hash, reorg=not extended)
+
+
+def reset_raw_transactions_cache():
+    """Remove the transactions stored by a previous run, their blocks may have been reorged since."""
+    for suffix in ["", "-wal", "-shm"]:
+        if os.path.exists(config.BACKEND_RAW_TRANSACTIONS_CACHE_FILE + suffix):
+            os.remove(config.BACKEND_RAW_TRANSACTIONS_CACHE_FILE + suffix)
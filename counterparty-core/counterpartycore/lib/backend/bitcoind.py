@@ -1,6 +1,10 @@
+import collections
+import concurrent.futures
 import functools
 import json
 import logging
+import os
+import threading
 import time
 from collections import OrderedDict
 
@@ -16,6 +20,26 @@ BLOCKS_CACHE = OrderedDict()
 BLOCKS_CACHE_MAX_SIZE = 1000
 TRANSACTIONS_CACHE = OrderedDict()
 TRANSACTIONS_CACHE_MAX_SIZE = 10000
+UTXOS_CACHE = OrderedDict()
+UTXOS_CACHE_MAX_SIZE = 1000
+# `UTXOS_CACHE` is shared by the threads of the API workers
+UTXOS_CACHE_LOCK = threading.Lock()
+PREVOUTS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# approximate memory used by a `PrevoutsCache` entry besides its script
+PREVOUT_ENTRY_BYTES = 250
+
+# keep-alive connections to Bitcoin Core, one `requests.Session` by thread
+SESSIONS = threading.local()
+
+
+def get_session():
+    # the sessions are not shared with the forked processes
+    if getattr(SESSIONS, "pid", None) != os.getpid():
+        SESSIONS.session = requests.Session()
+        SESSIONS.session.headers.update({"content-type": "application/json"})
+        SESSIONS.session.verify = not config.BACKEND_SSL_NO_VERIFY
+        SESSIONS.pid = os.getpid()
+    return SESSIONS.session
 
 
 def rpc_call(payload, retry=0):
@@ -28,11 +52,9 @@ def rpc_call(payload, retry=0):
     while True:
         try:
             tries += 1
-            response = requests.post(
+            response = get_session().post(
                 url,
                 data=json.dumps(payload),
-                headers={"content-type": "application/json"},
-                verify=(not config.BACKEND_SSL_NO_VERIFY),
                 timeout=config.REQUESTS_TIMEOUT,
             )
 
@@ -110,6 +132,25 @@ def rpc(method, params):
     return rpc_call(payload)
 
 
+def rpc_batch(request_list):
+    responses = collections.deque()
+
+    def make_call(chunk):
+        # send a list of requests to bitcoind to be executed
+        # note that this is list executed serially, in the same thread in bitcoind
+        # e.g. see: https://github.com/bitcoin/bitcoin/blob/master/src/rpcserver.cpp#L939
+        responses.extend(rpc_call(chunk))
+
+    chunks = util.chunkify(request_list, config.RPC_BATCH_SIZE)
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=config.BACKEND_RPC_BATCH_NUM_WORKERS
+    ) as executor:
+        # `result()` raises the errors of `rpc_call()`
+        for future in [executor.submit(make_call, chunk) for chunk in chunks]:
+            future.result()
+    return list(responses)
+
+
 def getblockcount():
     return rpc("getblockcount", [])
 
@@ -136,6 +177,29 @@ def getrawtransaction(tx_hash, verbose=False):
     return rpc("getrawtransaction", [tx_hash, 1 if verbose else 0])
 
 
+def getrawtransaction_batch(tx_hashes, verbose=False):
+    """
+    Return the raw transactions of `tx_hashes` found by Bitcoin Core, with JSON-RPC batches.
+    The transactions not found are skipped.
+    """
+    payload = [
+        {
+            "method": "getrawtransaction",
+            "params": [tx_hash, 1 if verbose else 0],
+            "jsonrpc": "2.0",
+            "id": index,
+        }
+        for index, tx_hash in enumerate(tx_hashes)
+    ]
+    raw_transactions = {}
+    for response in rpc_batch(payload):
+        if response.get("error") is None:
+            raw_transactions[tx_hashes[response["id"]]] = response["result"]
+        elif response["error"]["code"] != -5:  # RPC_INVALID_ADDRESS_OR_KEY
+            raise exceptions.BitcoindRPCError(response["error"]["message"])
+    return raw_transactions
+
+
 def createrawtransaction(inputs, outputs):
     return rpc("createrawtransaction", [inputs, outputs])
 
@@ -144,19 +208,60 @@ def getrawmempool(verbose=False):
     return rpc("getrawmempool", [True if verbose else False])
 
 
-@functools.lru_cache(maxsize=1000)
+def add_utxo_in_cache(utxo, transaction):
+    vout = int(utxo.split(":")[1])
+    if vout >= len(transaction["vout"]):
+        raise exceptions.InvalidUTXOError("vout index out of range")
+    if "address" not in transaction["vout"][vout]["scriptPubKey"]:
+        raise exceptions.InvalidUTXOError("vout does not have an address")
+    address_and_value = (
+        transaction["vout"][vout]["scriptPubKey"]["address"],
+        transaction["vout"][vout]["value"],
+    )
+    with UTXOS_CACHE_LOCK:
+        UTXOS_CACHE[utxo] = address_and_value
+        if len(UTXOS_CACHE) > UTXOS_CACHE_MAX_SIZE:
+            UTXOS_CACHE.popitem(last=False)
+    return address_and_value
+
+
 def get_utxo_address_and_value(utxo):
+    with UTXOS_CACHE_LOCK:
+        if utxo in UTXOS_CACHE:
+            UTXOS_CACHE.move_to_end(utxo)
+            return UTXOS_CACHE[utxo]
     tx_hash = utxo.split(":")[0]
-    vout = int(utxo.split(":")[1])
     try:
         transaction = getrawtransaction(tx_hash, True)
     except exceptions.BitcoindRPCError as e:
         raise exceptions.InvalidUTXOError(f"Could not find UTXO {utxo}") from e
-    if vout >= len(transaction["vout"]):
-        raise exceptions.InvalidUTXOError("vout index out of range")
-    if "address" not in transaction["vout"][vout]["scriptPubKey"]:
-        raise exceptions.InvalidUTXOError("vout does not have an address")
-    return transaction["vout"][vout]["scriptPubKey"]["address"], transaction["vout"][vout]["value"]
+    # possibly already evicted by another thread
+    return add_utxo_in_cache(utxo, transaction)
+
+
+def fill_utxos_cache(utxos):
+    """
+    Fetch with JSON-RPC batches the transactions of the `utxos` that are not in `UTXOS_CACHE`.
+    The invalid UTXOs are not cached, `get_utxo_address_and_value()` raises their error.
+    """
+    with UTXOS_CACHE_LOCK:
+        utxos = [utxo for utxo in dict.fromkeys(utxos) if utxo not in UTXOS_CACHE]
+    tx_hashes = list(dict.fromkeys(utxo.split(":")[0] for utxo in utxos))
+    # a single transaction is fetched by `get_utxo_address_and_value()`
+    if len(tx_hashes) < 2:
+        return
+    try:
+        transactions = getrawtransaction_batch(tx_hashes, verbose=True)
+    except exceptions.BitcoindRPCError:
+        return
+    for utxo in utxos:
+        tx_hash = utxo.split(":")[0]
+        if tx_hash not in transactions:
+            continue
+        try:
+            add_utxo_in_cache(utxo, transactions[tx_hash])
+        except exceptions.InvalidUTXOError:
+            pass
 
 
 def safe_get_utxo_address(utxo):
@@ -238,6 +343,61 @@ def wait_for_block(block_index):
         block_count = getblockcount()
 
 
+class PrevoutsCache(metaclass=util.SingletonMeta):
+    """
+    LRU cache of the outputs of the decoded transactions, by `(txid, n)`, used to resolve
+    the vins without `value`. Bounded to about `PREVOUTS_CACHE_MAX_BYTES`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prevouts = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def add_transaction(self, tx, txid=None):
+        # `tx_hash` is the wtxid of the segwit transactions decoded without `use_txid`
+        txid = txid or tx.get("tx_id") or tx["tx_hash"]
+        is_segwit = len(tx["vtxinwit"]) > 0
+        with self.lock:
+            for n, vout in enumerate(tx["vout"]):
+                if (txid, n) in self.prevouts:
+                    self.prevouts.move_to_end((txid, n))
+                    continue
+                self.prevouts[(txid, n)] = (vout["value"], vout["script_pub_key"], is_segwit)
+                self.size += PREVOUT_ENTRY_BYTES + len(vout["script_pub_key"])
+            while self.size > PREVOUTS_CACHE_MAX_BYTES:
+                _key, (_value, script_pub_key, _is_segwit) = self.prevouts.popitem(last=False)
+                self.size -= PREVOUT_ENTRY_BYTES + len(script_pub_key)
+
+    def get(self, txid, n):
+        """Return `(value, script_pub_key, is_segwit)` of the output `n` of `txid` or `None`."""
+        with self.lock:
+            prevout = self.prevouts.get((txid, n))
+            if prevout is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.prevouts.move_to_end((txid, n))
+            return prevout
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.prevouts
+
+    def statistics(self):
+        with self.lock:
+            request_count = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / request_count if request_count > 0 else 0,
+                "entries": len(self.prevouts),
+                "size": self.size,
+            }
+
+
 def add_transaction_in_cache(tx_hash, tx):
     TRANSACTIONS_CACHE[tx_hash] = tx
     if len(TRANSACTIONS_CACHE) > TRANSACTIONS_CACHE_MAX_SIZE:
@@ -250,6 +410,7 @@ def add_block_in_cache(block_index, block):
         BLOCKS_CACHE.popitem(last=False)
     for transaction in block["transactions"]:
         add_transaction_in_cache(transaction["tx_hash"], transaction)
+        PrevoutsCache().add_transaction(transaction)
 
 
 def get_decoded_block(block_index):
@@ -278,15 +439,54 @@ def get_decoded_transaction(tx_hash, block_index=None):
     tx = deserialize.deserialize_tx(raw_tx, use_txid=use_txid)
 
     add_transaction_in_cache(tx_hash, tx)
+    PrevoutsCache().add_transaction(tx, tx_hash)
 
     return tx
 
 
+def fill_prevouts_cache(vins):
+    """
+    Decode with one JSON-RPC batch the transactions spent by the `vins` without `value`
+    that are not in `PrevoutsCache`.
+    """
+    prevouts_cache = PrevoutsCache()
+    tx_hashes = []
+    for vin in vins:
+        if "value" in vin or vin.get("coinbase"):
+            continue
+        tx_hash = ib2h(vin["hash"]) if isinstance(vin["hash"], bytes) else vin["hash"]
+        if tx_hash not in tx_hashes and (tx_hash, vin["n"]) not in prevouts_cache:
+            tx_hashes.append(tx_hash)
+    # a single transaction is fetched by `get_decoded_transaction()`
+    if len(tx_hashes) < 2:
+        return
+    # decoded like `get_decoded_transaction()` does
+    use_txid = util.enabled("correct_segwit_txids")
+    for tx_hash, raw_tx in getrawtransaction_batch(tx_hashes).items():
+        tx = deserialize.deserialize_tx(raw_tx, use_txid=use_txid)
+        add_transaction_in_cache(tx_hash, tx)
+        prevouts_cache.add_transaction(tx, tx_hash)
+
+
 def get_tx_out_amount(tx_hash, vout):
     raw_tx = getrawtransaction(tx_hash, True)
     return raw_tx["vout"][vout]["value"]
 
 
+def get_tx_outs_amount(outputs):
+    """
+    Return the amounts of the `(tx_hash, vout)` of `outputs`, fetched with JSON-RPC batches.
+    The outputs not found are skipped.
+    """
+    tx_hashes = list(dict.fromkeys(tx_hash for tx_hash, _vout in outputs))
+    transactions = getrawtransaction_batch(tx_hashes, verbose=True)
+    amounts = {}
+    for tx_hash, vout in outputs:
+        if tx_hash in transactions and vout < len(transactions[tx_hash]["vout"]):
+            amounts[(tx_hash, vout)] = transactions[tx_hash]["vout"][vout]["value"]
+    return amounts
+
+
 class BlockFetcher:
     def __init__(self, first_block) -> None:
         self.current_block = first_block
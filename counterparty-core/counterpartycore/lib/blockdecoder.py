@@ -0,0 +1,110 @@
+import collections
+import logging
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from counterpartycore.lib import config, gettxinfo, util
+
+logger = logging.getLogger(config.LOGGER_NAME)
+
+LOOKAHEAD_BLOCKS = 10
+
+
+def get_config_snapshot():
+    snapshot = {}
+    for key, value in vars(config).items():
+        if not key.isupper():
+            continue
+        try:
+            pickle.dumps(value)
+        except Exception:  # noqa: S112
+            continue
+        snapshot[key] = value
+    return snapshot
+
+
+def initialise_worker(config_snapshot):
+    for key, value in config_snapshot.items():
+        setattr(config, key, value)
+
+
+def decode_transactions(block_index, transactions):
+    """Decode the transactions of a block in a worker process."""
+    util.CURRENT_BLOCK_INDEX = block_index
+    results = []
+    for position, decoded_tx in transactions:
+        try:
+            predecoded = gettxinfo.predecode_tx(decoded_tx, block_index)
+        except Exception:  # noqa: S112
+            # the transaction will be decoded, and the error raised, by the parser
+            continue
+        if predecoded is not None:
+            results.append((position, predecoded))
+    return results
+
+
+class BlockDecoder:
+    """
+    Decode the transactions of the next blocks returned by `fetcher` in worker processes
+    while the current block is being parsed. Only what doesn't depend on the ledger state is
+    decoded, `blocks.list_tx()` does the rest.
+    """
+
+    def __init__(self, fetcher, workers, lookahead=LOOKAHEAD_BLOCKS):
+        self.fetcher = fetcher
+        self.lookahead = lookahead
+        self.pending = collections.deque()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initialise_worker,
+            initargs=(get_config_snapshot(),),
+        )
+
+    def submit(self, decoded_block):
+        transactions = [
+            (position, decoded_tx)
+            for position, decoded_tx in enumerate(decoded_block["transactions"])
+            if gettxinfo.is_predecodable(decoded_tx)
+        ]
+        future = None
+        if transactions:
+            future = self.executor.submit(
+                decode_transactions, decoded_block["height"], transactions
+            )
+        self.pending.append((decoded_block, future))
+
+    def get_block(self, last_block_index):
+        """Return the next block, decoding ahead the blocks up to `last_block_index`."""
+        while len(self.pending) < self.lookahead and self.fetcher.next_height <= last_block_index:
+            decoded_block = self.fetcher.get_block()
+            if decoded_block is None:
+                break
+            self.submit(decoded_block)
+
+        if not self.pending:
+            return self.fetcher.get_block()
+
+        decoded_block, future = self.pending.popleft()
+        if future is not None:
+            try:
+                results = future.result()
+            except Exception as e:
+                # transactions are decoded by the parser instead
+                logger.warning(f"Failed to decode block {decoded_block['height']}: {e}")
+                results = []
+            for position, predecoded in results:
+                gettxinfo.merge_predecoded_tx(decoded_block["transactions"][position], predecoded)
+        return decoded_block
+
+    def reset(self, fetcher):
+        for _decoded_block, future in self.pending:
+            if future is not None:
+                future.cancel()
+        self.pending.clear()
+        self.fetcher = fetcher
+
+    def stop(self):
+        self.reset(None)
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -15,6 +15,7 @@ from datetime import timedelta
 
 from counterpartycore.lib import (  # noqa: E402
     backend,
+    blockdecoder,
     check,
     config,
     database,
@@ -25,6 +26,9 @@ from counterpartycore.lib import (  # noqa: E402
     log,
     mempool,
     message_type,
+    profiler,
+    snapshots,
+    undolog,
     util,
 )
 from counterpartycore.lib.backend import rsfetcher
@@ -95,6 +99,47 @@ TABLES = ["balances", "credits", "debits", "messages"] + [
     "transaction_count",
 ]
 
+# fields of the rolled back rows needed to patch the caches, see `patch_caches()`
+ROLLBACK_CACHES_FIELDS = {
+    "balances": ["address", "utxo", "asset"],
+    "issuances": ["asset"],
+    "destructions": ["asset"],
+    "orders": ["tx_hash"],
+    "dispensers": ["source"],
+}
+
+# names of the messages for the profiler, see `get_tx_profile_name()`
+MESSAGE_TYPE_NAMES = {
+    module.ID: module.__name__.split(".")[-1]
+    for module in [
+        send,
+        enhanced_send,
+        mpma,
+        order,
+        btcpay,
+        issuance,
+        broadcast,
+        bet,
+        dividend,
+        cancel,
+        rps,
+        rpsresolve,
+        destroy,
+        sweep,
+        dispenser,
+        fairminter,
+        fairmint,
+        utxo,
+        attach,
+        detach,
+    ]
+} | {
+    issuance.LR_ISSUANCE_ID: "issuance",
+    issuance.SUBASSET_ID: "issuance",
+    issuance.LR_SUBASSET_ID: "issuance",
+    dispenser.DISPENSE_ID: "dispense",
+}
+
 MAINNET_BURNS = {}
 CURR_DIR = os.path.dirname(os.path.realpath(__file__))
 with open(CURR_DIR + "/../mainnet_burns.csv", "r") as f:
@@ -103,6 +148,23 @@ with open(CURR_DIR + "/../mainnet_burns.csv", "r") as f:
         MAINNET_BURNS[line["tx_hash"]] = line
 
 
+def get_tx_profile_name(tx):
+    """Return the name of the function parsing the transaction, for the profiler."""
+    if not profiler.ENABLED:
+        return None
+    if tx["destination"] == config.UNSPENDABLE:
+        return "burn.parse"
+    if not tx["data"] or len(tx["data"]) <= 1:
+        return "move.move_assets"
+    try:
+        message_type_id, _message = message_type.unpack(tx["data"], tx["block_index"])
+    except struct.error:
+        message_type_id = None
+    if message_type_id not in MESSAGE_TYPE_NAMES:
+        return "unsupported"
+    return f"{MESSAGE_TYPE_NAMES[message_type_id]}.parse"
+
+
 def parse_tx(db, tx):
     util.CURRENT_TX_HASH = tx["tx_hash"]
     """Parse the transaction, return True for success."""
@@ -346,50 +408,80 @@ def parse_block(
     if reparsing:
         replay_transactions_events(db, transactions)
 
-    ledger.BLOCK_LEDGER = []
-    ledger.BLOCK_JOURNAL = []
+    ledger.BLOCK_SUPPLY_DELTAS = {}
+    ledger.BLOCK_HELD_DELTAS = {}
 
+    # the consensus hashes are computed as the block is parsed
     if block_index != config.MEMPOOL_BLOCK_INDEX:
         assert block_index == util.CURRENT_BLOCK_INDEX
+        previous_hashes, found_hashes = check.get_consensus_hashes(
+            db,
+            block_index,
+            {
+                "ledger_hash": previous_ledger_hash,
+                "txlist_hash": previous_txlist_hash,
+                "messages_hash": previous_messages_hash,
+            },
+        )
+        hashers = {
+            field: check.consensus_hasher(previous_hashes[field])
+            for field in check.CONSENSUS_HASH_FIELDS
+        }
+    else:
+        hashers = {field: util.DoubleHasher() for field in check.CONSENSUS_HASH_FIELDS}
+    ledger.BLOCK_LEDGER = hashers["ledger_hash"]
+    ledger.BLOCK_JOURNAL = hashers["messages_hash"]
+    txlist = hashers["txlist_hash"]
 
     # Expire orders, bets and rps.
-    order.expire(db, block_index)
-    bet.expire(db, block_index, block_time)
-    rps.expire(db, block_index)
+    with profiler.profile(db, "expire"):
+        order.expire(db, block_index)
+        bet.expire(db, block_index, block_time)
+        rps.expire(db, block_index)
 
     # Close dispensers
-    dispenser.close_pending(db, block_index)
+    with profiler.profile(db, "close_pending"):
+        dispenser.close_pending(db, block_index)
 
     # Fairminters operations
-    fairminter.before_block(db, block_index)
-
-    txlist = []
-    for tx in transactions:
-        try:
-            parse_tx(db, tx)
-            data = binascii.hexlify(tx["data"]).decode("UTF-8") if tx["data"] else ""
-            txlist.append(
-                f"{tx['tx_hash']}{tx['source']}{tx['destination']}{tx['btc_amount']}{tx['fee']}{data}"
-            )
-        except exceptions.ParseTransactionError as e:
-            logger.warning(f"ParseTransactionError for tx {tx['tx_hash']}: {e}")
-            raise e
-            # pass
+    with profiler.profile(db, "fairminter.before_block"):
+        fairminter.before_block(db, block_index)
+
+    with profiler.profile(db, "parse_transactions"):
+        for tx in transactions:
+            try:
+                with profiler.profile(db, get_tx_profile_name(tx)):
+                    parse_tx(db, tx)
+                data = binascii.hexlify(tx["data"]).decode("UTF-8") if tx["data"] else ""
+                txlist.update(
+                    f"{tx['tx_hash']}{tx['source']}{tx['destination']}{tx['btc_amount']}{tx['fee']}{data}"
+                )
+            except exceptions.ParseTransactionError as e:
+                logger.warning(f"ParseTransactionError for tx {tx['tx_hash']}: {e}")
+                raise e
+                # pass
 
     # Fairminters operations
-    fairminter.after_block(db, block_index)
+    with profiler.profile(db, "fairminter.after_block"):
+        fairminter.after_block(db, block_index)
 
     if block_index != config.MEMPOOL_BLOCK_INDEX:
+        # Check that the block conserved the assets it touched.
+        if config.CHECK_ASSET_CONSERVATION:
+            with profiler.profile(db, "check_asset_conservation"):
+                check.block_asset_conservation(db)
+
         # Calculate consensus hashes.
-        new_txlist_hash, found_txlist_hash = check.consensus_hash(
-            db, "txlist_hash", previous_txlist_hash, txlist
-        )
-        new_ledger_hash, found_ledger_hash = check.consensus_hash(
-            db, "ledger_hash", previous_ledger_hash, ledger.BLOCK_LEDGER
-        )
-        new_messages_hash, found_messages_hash = check.consensus_hash(
-            db, "messages_hash", previous_messages_hash, ledger.BLOCK_JOURNAL
-        )
+        with profiler.profile(db, "consensus_hashes"):
+            new_txlist_hash = check.consensus_hash(
+                "txlist_hash", txlist, found_hashes["txlist_hash"]
+            )
+            new_ledger_hash = check.consensus_hash(
+                "ledger_hash", ledger.BLOCK_LEDGER, found_hashes["ledger_hash"]
+            )
+            new_messages_hash = check.consensus_hash(
+                "messages_hash", ledger.BLOCK_JOURNAL, found_hashes["messages_hash"]
+            )
 
         update_block_query = """
             UPDATE blocks
@@ -424,11 +516,15 @@ def parse_block(
                 "transaction_count": len(transactions),
             },
         )
+        with profiler.profile(db, "flush_journal"):
+            ledger.flush_journal(db)
+            undolog.save_block(db, block_index, TABLES)
 
         cursor.close()
 
         return new_ledger_hash, new_txlist_hash, new_messages_hash
 
+    ledger.flush_journal(db)
     cursor.close()
     return None, None, None
 
@@ -822,6 +918,8 @@ def initialise(db):
         cursor.execute("""ALTER TABLE mempool ADD COLUMN event TEXT""")
 
     create_views(db)
+    create_current_state_tables(db)
+    undolog.initialise(db)
 
     # Lock UPDATE on all tables
     for table in TABLES:
@@ -974,6 +1072,74 @@ def create_views(db):
     cursor.close()
 
 
+def create_current_state_tables(db):
+    cursor = db.cursor()
+    for table, id_fields in ledger.CURRENT_STATE_TABLES.items():
+        database.create_current_state_table(cursor, table, id_fields)
+        database.create_indexes(cursor, f"{table}_current", [["block_index"]])
+    ledger.CURRENT_STATE_FIELDS.clear()
+
+    database.create_indexes(
+        cursor,
+        "balances_current",
+        [
+            ["address", "asset"],
+            ["utxo", "asset"],
+            ["asset"],
+        ],
+    )
+    database.create_indexes(
+        cursor,
+        "orders_current",
+        [
+            ["give_asset", "get_asset"],
+            ["source", "give_asset"],
+            ["expire_index"],
+            ["status"],
+        ],
+    )
+    database.create_indexes(
+        cursor,
+        "order_matches_current",
+        [
+            ["tx0_hash"],
+            ["tx1_hash"],
+            ["match_expire_index"],
+            ["status"],
+        ],
+    )
+    database.create_indexes(
+        cursor,
+        "bets_current",
+        [
+            ["feed_address", "bet_type"],
+            ["expire_index"],
+            ["status"],
+        ],
+    )
+    database.create_indexes(
+        cursor,
+        "dispensers_current",
+        [
+            ["source", "asset"],
+            ["asset"],
+            ["close_block_index"],
+            ["status"],
+        ],
+    )
+    database.create_indexes(
+        cursor,
+        "fairminters_current",
+        [
+            ["asset"],
+            ["start_block"],
+            ["end_block"],
+            ["soft_cap_deadline_block"],
+        ],
+    )
+    cursor.close()
+
+
 def list_tx(db, block_hash, block_index, block_time, tx_hash, tx_index, decoded_tx):
     assert type(tx_hash) == str  # noqa: E721
     util.CURRENT_TX_HASH = tx_hash
@@ -1058,12 +1224,73 @@ def clean_messages_tables(db, block_index=0):
     block_index = max(block_index, config.BLOCK_FIRST)
     if block_index == config.BLOCK_FIRST:
         rebuild_database(db, include_transactions=False)
+        reset_caches(db)
     else:
+        # rollback and reparse can be run before the first start
+        create_current_state_tables(db)
+        undolog.initialise(db)
+        # delete by rowid the rows inserted after the previous block when possible
+        undo_rowids = undolog.get_undo_rowids(db, block_index) or {}
         cursor = db.cursor()
         cursor.execute("""PRAGMA foreign_keys=OFF""")
+        rolled_back_rows = {}
         for table in TABLES:
-            clean_table_from(cursor, table, block_index)
+            undo_rowid = undo_rowids.get(table)
+            if undo_rowid is not None and not undolog.is_valid_undo_rowid(
+                cursor, table, block_index, undo_rowid
+            ):
+                undo_rowid = None
+            if table in ROLLBACK_CACHES_FIELDS:
+                rolled_back_rows[table] = undolog.get_rows_from(
+                    cursor, table, block_index, ROLLBACK_CACHES_FIELDS[table], undo_rowid
+                )
+            if undo_rowid is not None:
+                undolog.clean_table_from(cursor, table, undo_rowid)
+            else:
+                clean_table_from(cursor, table, block_index)
+        for table in ledger.CURRENT_STATE_TABLES:
+            ledger.rollback_current_state(cursor, table, block_index)
+        undolog.clean_from(db, block_index)
         cursor.execute("""PRAGMA foreign_keys=ON""")
+        patch_caches(db, block_index, rolled_back_rows)
+
+
+def patch_caches(db, block_index, rolled_back_rows):
+    """Reload from the database the cached objects touched by the rolled back rows."""
+    balances = rolled_back_rows["balances"]
+    ledger.remove_from_balances_cache(
+        db, {(balance["utxo"] or balance["address"], balance["asset"]) for balance in balances}
+    )
+    if ledger.AssetCache in ledger.AssetCache._instances:
+        assets = {
+            row["asset"] for row in rolled_back_rows["issuances"] + rolled_back_rows["destructions"]
+        }
+        ledger.AssetCache(db).refresh_assets(db, assets)
+    if ledger.OrdersCache in ledger.OrdersCache._instances:
+        tx_hashes = {order["tx_hash"] for order in rolled_back_rows["orders"]}
+        ledger.OrdersCache(db).refresh_orders(db, tx_hashes)
+    if ledger.UTXOBalancesCache in ledger.UTXOBalancesCache._instances:
+        utxos = {balance["utxo"] for balance in balances if balance["utxo"]}
+        # utxos are added to the cache before the transaction is parsed
+        utxos |= ledger.get_transactions_utxos(db, block_index)
+        ledger.UTXOBalancesCache(db).refresh_utxos(db, utxos)
+    if dispenser.DispensableCache in dispenser.DispensableCache._instances:
+        sources = {row["source"] for row in rolled_back_rows["dispensers"]}
+        dispenser.DispensableCache(db).refresh_sources(db, sources)
+
+
+def reset_caches(db):
+    ledger.clear_balances_cache(db)
+    for cache in [
+        ledger.AssetCache,
+        ledger.OrdersCache,
+        ledger.UTXOBalancesCache,
+        dispenser.DispensableCache,
+    ]:
+        if cache in cache._instances:
+            # reload the cache from the rebuilt database
+            cache._instances.pop(cache)
+            cache(db)
 
 
 def clean_transactions_tables(cursor, block_index=0):
@@ -1080,25 +1307,56 @@ def rebuild_database(db, include_transactions=True):
     tables_to_clean = list(TABLES)
     if include_transactions:
         tables_to_clean += ["transaction_outputs", "transactions", "blocks"]
+    tables_to_clean += [f"{table}_current" for table in ledger.CURRENT_STATE_TABLES]
+    tables_to_clean.append("undo_log")
     for table in tables_to_clean:
         cursor.execute(f"DROP TABLE IF EXISTS {table}")  # nosec B608
     cursor.execute("""PRAGMA foreign_keys=ON""")
     initialise(db)
 
 
+def restore_nearest_snapshot(db, block_index):
+    """
+    Restore the last snapshot before `block_index` when the undo log can't be used.
+    Return the index of the first block to replay.
+    """
+    snapshots.remove_from(block_index)
+    # rollback and reparse can be run before the first start
+    undolog.initialise(db)
+    if undolog.get_undo_rowids(db, block_index) is not None:
+        return block_index
+    snapshot_block_index = snapshots.get_nearest_snapshot(block_index)
+    if snapshot_block_index is None:
+        return block_index
+    snapshots.restore_snapshot(db, snapshot_block_index)
+    initialise(db)
+    reset_caches(db)
+    ledger.reset_journal_head(db)
+    return snapshot_block_index + 1
+
+
 def rollback(db, block_index=0):
     block_index = max(block_index, config.BLOCK_FIRST)
+    if block_index == config.BLOCK_FIRST:
+        snapshots.remove_from(block_index)
+    else:
+        first_block_index = restore_nearest_snapshot(db, block_index)
+        # replay the blocks between the snapshot and the rollback block
+        if first_block_index < block_index:
+            replay_blocks(db, first_block_index, last_block_index=block_index - 1)
     # clean all tables
     step = f"Rolling database back to Block {block_index}..."
     done_message = f"Database rolled back to Block {block_index} ({{}}s)"
     with log.Spinner(step, done_message):
         if block_index == config.BLOCK_FIRST:
             rebuild_database(db)
+            reset_caches(db)
         else:
             clean_messages_tables(db, block_index=block_index)
             cursor = db.cursor()
             clean_transactions_tables(cursor, block_index=block_index)
             cursor.close()
+    ledger.reset_journal_head(db)
     util.CURRENT_BLOCK_INDEX = block_index - 1
 
 
@@ -1130,67 +1388,84 @@ def reparse(db, block_index=0):
     if block_index > util.CURRENT_BLOCK_INDEX:
         logger.debug("Block index is higher than current block index. No need to reparse.")
         return
-    cursor = db.cursor()
     # clean all tables except assets' blocks', 'transaction_outputs' and 'transactions'
     with log.Spinner(f"Rolling database back to Block {block_index}..."):
-        clean_messages_tables(db, block_index=block_index)
+        # the consensus hashes of the blocks replayed before `block_index` are checked
+        first_block_index = restore_nearest_snapshot(db, block_index)
+        clean_messages_tables(db, block_index=first_block_index)
+        ledger.reset_journal_head(db)
 
-    step = "Recalculating consensus hashes..."
     with log.Spinner("Recalculating consensus hashes..."):
+        cursor = db.cursor()
         query = """
             UPDATE blocks
             SET ledger_hash=NULL, txlist_hash=NULL, messages_hash=NULL
             WHERE block_index >= ?
         """
         cursor.execute(query, (block_index,))
+    cursor.close()
+
+    replay_blocks(db, first_block_index)
+
 
-    # reparse blocks
+def replay_blocks(db, block_index, last_block_index=None):
+    """Parse again the blocks already in the database from `block_index`."""
+    cursor = db.cursor()
+    if last_block_index is None:
+        last_block_index = cursor.execute(
+            "SELECT MAX(block_index) AS block_index FROM blocks"
+        ).fetchone()["block_index"]
     start_time_all_blocks_parse = time.time()
     block_parsed_count = 0
-    count_query = "SELECT COUNT(*) AS cnt FROM blocks WHERE block_index >= ?"
-    block_count = cursor.execute(count_query, (block_index,)).fetchone()["cnt"]
+    count_query = "SELECT COUNT(*) AS cnt FROM blocks WHERE block_index BETWEEN ? AND ?"
+    block_count = cursor.execute(count_query, (block_index, last_block_index)).fetchone()["cnt"]
     step = f"Reparsing blocks from Block {block_index}..."
     message = ""
     with log.Spinner(step) as spinner:
         cursor.execute(
-            """SELECT * FROM blocks WHERE block_index >= ? ORDER BY block_index""",
-            (block_index,),
+            """SELECT * FROM blocks WHERE block_index BETWEEN ? AND ? ORDER BY block_index""",
+            (block_index, last_block_index),
         )
         for block in cursor.fetchall():
             start_time_block_parse = time.time()
             util.CURRENT_BLOCK_INDEX = block["block_index"]
-            # Add event manually to journal because block already exists
-            ledger.add_to_journal(
-                db,
-                block["block_index"],
-                "insert",
-                "blocks",
-                "NEW_BLOCK",
-                {
-                    "block_index": block["block_index"],
-                    "block_hash": block["block_hash"],
-                    "block_time": block["block_time"],
-                    "previous_block_hash": block["previous_block_hash"],
-                    "difficulty": block["difficulty"],
-                },
-            )
-            previous_ledger_hash = None
-            previous_txlist_hash = None
-            previous_messages_hash = None
-            if util.CURRENT_BLOCK_INDEX > config.BLOCK_FIRST:
-                previous_block = ledger.get_block(db, block["block_index"] - 1)
-                previous_ledger_hash = previous_block["ledger_hash"]
-                previous_txlist_hash = previous_block["txlist_hash"]
-                previous_messages_hash = previous_block["messages_hash"]
-            parse_block(
-                db,
-                block["block_index"],
-                block["block_time"],
-                previous_ledger_hash=previous_ledger_hash,
-                previous_txlist_hash=previous_txlist_hash,
-                previous_messages_hash=previous_messages_hash,
-                reparsing=True,
-            )
+            # one transaction per block, events are published after commit
+            with ledger.buffered_journal(db), db:
+                # Add event manually to journal because block already exists
+                ledger.add_to_journal(
+                    db,
+                    block["block_index"],
+                    "insert",
+                    "blocks",
+                    "NEW_BLOCK",
+                    {
+                        "block_index": block["block_index"],
+                        "block_hash": block["block_hash"],
+                        "block_time": block["block_time"],
+                        "previous_block_hash": block["previous_block_hash"],
+                        "difficulty": block["difficulty"],
+                    },
+                )
+                previous_ledger_hash = None
+                previous_txlist_hash = None
+                previous_messages_hash = None
+                if util.CURRENT_BLOCK_INDEX > config.BLOCK_FIRST:
+                    previous_block = ledger.get_block(db, block["block_index"] - 1)
+                    previous_ledger_hash = previous_block["ledger_hash"]
+                    previous_txlist_hash = previous_block["txlist_hash"]
+                    previous_messages_hash = previous_block["messages_hash"]
+                with profiler.profile(db, "parse_block"):
+                    parse_block(
+                        db,
+                        block["block_index"],
+                        block["block_time"],
+                        previous_ledger_hash=previous_ledger_hash,
+                        previous_txlist_hash=previous_txlist_hash,
+                        previous_messages_hash=previous_messages_hash,
+                        reparsing=True,
+                    )
+            snapshots.take_snapshot(db, block["block_index"], last_block_index)
+            profiler.save()
             block_parsed_count += 1
             message = generate_progression_message(
                 block,
@@ -1201,6 +1476,7 @@ def reparse(db, block_index=0):
             )
             spinner.set_messsage(message)
             spinner.done_message = str(block_parsed_count) + " blocks reparsed in {:.2f}s."
+    profiler.save(force=True)
 
 
 def get_next_tx_index(db):
@@ -1220,7 +1496,7 @@ def get_next_tx_index(db):
     return tx_index
 
 
-def parse_new_block(db, decoded_block, tx_index=None):
+def parse_new_block(db, decoded_block, tx_index=None, block_count=None):
     start_time = time.time()
 
     # increment block index
@@ -1266,7 +1542,8 @@ def parse_new_block(db, decoded_block, tx_index=None):
     else:
         decoded_block["block_index"] = decoded_block["height"]
 
-    with db:  # ensure all the block or nothing
+    # ensure all the block or nothing, events are published after commit
+    with ledger.buffered_journal(db), db:
         logger.info(f"Block {decoded_block['block_index']}", extra={"bold": True})
         # insert block
         block_bindings = {
@@ -1290,14 +1567,15 @@ def parse_new_block(db, decoded_block, tx_index=None):
                 decoded_tx=transaction,
             )
         # Parse the transactions in the block.
-        new_ledger_hash, new_txlist_hash, new_messages_hash = parse_block(
-            db,
-            decoded_block["block_index"],
-            decoded_block["block_time"],
-            previous_ledger_hash=previous_block["ledger_hash"],
-            previous_txlist_hash=previous_block["txlist_hash"],
-            previous_messages_hash=previous_block["messages_hash"],
-        )
+        with profiler.profile(db, "parse_block"):
+            new_ledger_hash, new_txlist_hash, new_messages_hash = parse_block(
+                db,
+                decoded_block["block_index"],
+                decoded_block["block_time"],
+                previous_ledger_hash=previous_block["ledger_hash"],
+                previous_txlist_hash=previous_block["txlist_hash"],
+                previous_messages_hash=previous_block["messages_hash"],
+            )
 
         duration = time.time() - start_time
 
@@ -1313,6 +1591,9 @@ def parse_new_block(db, decoded_block, tx_index=None):
             },
         )
 
+    snapshots.take_snapshot(db, decoded_block["block_index"], block_count)
+    profiler.save()
+
     return tx_index, decoded_block["block_index"]
 
 
@@ -1339,6 +1620,8 @@ def check_database_version(db):
 def catch_up(db, check_asset_conservation=True):
     logger.info("Catching up...")
     util.BLOCK_PARSER_STATUS = "catching up"
+    # serve balances from memory while catching up
+    ledger.BalancesCache(db)
     # update the current block index
     util.CURRENT_BLOCK_INDEX = ledger.last_db_index(db)
     if util.CURRENT_BLOCK_INDEX == 0:
@@ -1359,6 +1642,7 @@ def catch_up(db, check_asset_conservation=True):
     start_time = time.time()
     parsed_blocks = 0
     fetcher = None
+    decoder = None
 
     while util.CURRENT_BLOCK_INDEX < block_count:
         # Get block information and transactions
@@ -1366,7 +1650,13 @@ def catch_up(db, check_asset_conservation=True):
         if fetcher is None:
             fetcher = rsfetcher.RSFetcher()
             fetcher.start(util.CURRENT_BLOCK_INDEX + 1)
-        decoded_block = fetcher.get_block()
+            # decode the transactions of the next blocks while parsing the current one
+            if config.DECODING_WORKERS > 0:
+                decoder = blockdecoder.BlockDecoder(fetcher, config.DECODING_WORKERS)
+        if decoder is not None:
+            decoded_block = decoder.get_block(block_count)
+        else:
+            decoded_block = fetcher.get_block()
         block_height = decoded_block.get("height")
         fetch_time_end = time.time()
         fetch_duration = fetch_time_end - fetch_time_start
@@ -1376,13 +1666,17 @@ def catch_up(db, check_asset_conservation=True):
         assert block_height <= util.CURRENT_BLOCK_INDEX + 1
 
         # Parse the current block
-        tx_index, parsed_block_index = parse_new_block(db, decoded_block, tx_index=tx_index)
+        tx_index, parsed_block_index = parse_new_block(
+            db, decoded_block, tx_index=tx_index, block_count=block_count
+        )
         # check if the parsed block is the expected one
         # if not that means a reorg happened
         if parsed_block_index < block_height:
             fetcher.stop()
             fetcher = rsfetcher.RSFetcher()
             fetcher.start(util.CURRENT_BLOCK_INDEX + 1)
+            if decoder is not None:
+                decoder.reset(fetcher)
         else:
             assert parsed_block_index == block_height
         mempool.clean_mempool(db)
@@ -1400,15 +1694,19 @@ def catch_up(db, check_asset_conservation=True):
                 backend.bitcoind.wait_for_block(util.CURRENT_BLOCK_INDEX + 1)
             block_count = backend.bitcoind.getblockcount()
 
+    if decoder is not None:
+        decoder.stop()
     if fetcher is not None:
         fetcher.stop()
 
     if config.CHECK_ASSET_CONSERVATION and check_asset_conservation:
         # TODO: timer to check asset conservation every N hours
         check.asset_conservation(db)
+        check.balances_cache(db)
         # catch up new blocks during asset conservation check
         catch_up(db, check_asset_conservation=False)
 
+    profiler.save(force=True)
     logger.info("Catch up complete.")
 
 
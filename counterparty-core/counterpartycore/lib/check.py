@@ -850,31 +850,51 @@ class ConsensusError(Exception):
     pass
 
 
-def consensus_hash(db, field, previous_consensus_hash, content):
-    assert field in ("ledger_hash", "txlist_hash", "messages_hash")
+CONSENSUS_HASH_FIELDS = ("ledger_hash", "txlist_hash", "messages_hash")
 
-    cursor = db.cursor()
-    block_index = util.CURRENT_BLOCK_INDEX
 
-    # Initialise previous hash on first block.
-    if block_index <= config.BLOCK_FIRST:
-        assert not previous_consensus_hash
-        previous_consensus_hash = util.dhash_string(CONSENSUS_HASH_SEED)
+def get_consensus_hashes(db, block_index, previous_consensus_hashes):
+    """
+    Return the consensus hashes of the previous block, taken from `previous_consensus_hashes`
+    when provided, and the consensus hashes of the block already in the database.
+    """
+    cursor = db.cursor()
+    blocks = {
+        block["block_index"]: block
+        for block in cursor.execute(
+            """
+            SELECT block_index, ledger_hash, txlist_hash, messages_hash FROM blocks
+            WHERE block_index IN (?, ?)
+            """,
+            (block_index - 1, block_index),
+        )
+    }
+    cursor.close()
 
-    # Get previous hash.
-    if not previous_consensus_hash:
-        try:
-            previous_consensus_hash = list(
-                cursor.execute("""SELECT * FROM blocks WHERE block_index = ?""", (block_index - 1,))
-            )[0][field]
-        except IndexError:
-            previous_consensus_hash = None
+    previous_hashes = {}
+    for field in CONSENSUS_HASH_FIELDS:
+        previous_consensus_hash = previous_consensus_hashes.get(field)
+        # Initialise previous hash on first block.
+        if block_index <= config.BLOCK_FIRST:
+            assert not previous_consensus_hash
+            previous_consensus_hash = util.dhash_string(CONSENSUS_HASH_SEED)
+        # Get previous hash.
         if not previous_consensus_hash:
-            raise ConsensusError(
-                f"Empty previous {field} for block {block_index}. Please launch a `rollback`."
-            )
+            if block_index - 1 in blocks:
+                previous_consensus_hash = blocks[block_index - 1][field]
+            if not previous_consensus_hash:
+                raise ConsensusError(
+                    f"Empty previous {field} for block {block_index}. Please launch a `rollback`."
+                )
+        previous_hashes[field] = previous_consensus_hash
 
-    # Calculate current hash.
+    found_hashes = {field: blocks[block_index][field] or None for field in CONSENSUS_HASH_FIELDS}
+
+    return previous_hashes, found_hashes
+
+
+def consensus_hasher(previous_consensus_hash):
+    """Return a hasher to which the content of the block is added as it is parsed."""
     if config.TESTNET:
         consensus_hash_version = CONSENSUS_HASH_VERSION_TESTNET
     elif config.REGTEST:
@@ -882,18 +902,19 @@ def consensus_hash(db, field, previous_consensus_hash, content):
     else:
         consensus_hash_version = CONSENSUS_HASH_VERSION_MAINNET
 
-    calculated_hash = util.dhash_string(
-        previous_consensus_hash + f"{consensus_hash_version}{''.join(content)}"
-    )
+    return util.DoubleHasher(f"{previous_consensus_hash}{consensus_hash_version}")
+
+
+def consensus_hash(field, hasher, found_hash):
+    assert field in CONSENSUS_HASH_FIELDS
+
+    block_index = util.CURRENT_BLOCK_INDEX
+
+    # Calculate current hash.
+    calculated_hash = hasher.hexdigest()
 
     # Verify hash (if already in database) or save hash (if not).
     # NOTE: do not enforce this for messages_hashes, those are more informational (for now at least)
-    found_hash = (
-        list(cursor.execute("""SELECT * FROM blocks WHERE block_index = ?""", (block_index,)))[0][
-            field
-        ]
-        or None
-    )
     if found_hash and field != "messages_hash":
         # Check against existing value.
         if calculated_hash != found_hash:
@@ -917,7 +938,7 @@ def consensus_hash(db, field, previous_consensus_hash, content):
         error_message = f"Incorrect {field} hash for block {block_index}.  Calculated {calculated_hash} but expected {checkpoints[block_index][field]}"
         raise ConsensusError(error_message)
 
-    return calculated_hash, found_hash
+    return calculated_hash
 
 
 class SanityError(Exception):
@@ -952,6 +973,42 @@ def asset_conservation(db, stop_event=None):
     logger.debug("All assets have been conserved.")
 
 
+def block_asset_conservation(db):
+    """Check that the supply changes of the current block match its held quantity changes."""
+    issued_assets = ledger.AssetCache(db).assets
+    for asset in set(ledger.BLOCK_SUPPLY_DELTAS) | set(ledger.BLOCK_HELD_DELTAS):
+        # like `asset_conservation()`, only the assets with a supply are checked
+        if asset != config.XCP and asset not in issued_assets:
+            continue
+        supply_delta = ledger.BLOCK_SUPPLY_DELTAS.get(asset, 0)
+        held_delta = ledger.BLOCK_HELD_DELTAS.get(asset, 0)
+        if supply_delta != held_delta:
+            raise SanityError(
+                "{} {} issued ≠ {} {} held in block {}".format(
+                    ledger.value_out(db, supply_delta, asset),
+                    asset,
+                    ledger.value_out(db, held_delta, asset),
+                    asset,
+                    util.CURRENT_BLOCK_INDEX,
+                )
+            )
+
+
+def balances_cache(db):
+    if ledger.BalancesCache not in ledger.BalancesCache._instances:
+        return
+    logger.debug("Checking balances cache against the database.")
+    cached_balances = ledger.BalancesCache(db).balances
+    for (address, asset), cached_quantity in cached_balances.items():
+        balances = ledger.get_balance_no_cache(db, address, asset)
+        quantity = balances[0]["quantity"] if balances else None
+        if cached_quantity != quantity:
+            raise SanityError(
+                f"Cached balance of {address} for {asset} is {cached_quantity}, {quantity} in database"
+            )
+    logger.debug(f"{len(cached_balances)} cached balances are consistent.")
+
+
 class VersionError(Exception):
     pass
 
@@ -148,6 +148,8 @@ DEFAULT_RPC_BATCH_SIZE = 20  # A 1 MB block can hold about 4200 transactions.
 EXITCODE_UPDATE_REQUIRED = 5
 
 BACKEND_RAW_TRANSACTIONS_CACHE_SIZE = 20000
+# set by `server.initialise_config()`, shared by the API workers
+BACKEND_RAW_TRANSACTIONS_CACHE_FILE = None
 BACKEND_RPC_BATCH_NUM_WORKERS = 6
 
 DEFAULT_UTXO_LOCKS_MAX_ADDRESSES = 1000
@@ -158,6 +160,8 @@ ADDRESS_OPTION_MAX_VALUE = ADDRESS_OPTION_REQUIRE_MEMO  # Or list of all the add
 OLD_STYLE_API = True
 
 API_LIMIT_ROWS = 1000
+DEFAULT_API_MAX_RESULT_COUNT = 100000
+DEFAULT_API_MAX_OFFSET = 10000
 
 MPMA_LIMIT = 1000
 
@@ -186,3 +190,12 @@ INFLUX_DB_BUCKET = "node-telemetry"
 LOG_IN_CONSOLE = False
 
 DEFAULT_DB_CONNECTION_POOL_SIZE = 10
+
+DEFAULT_DECODING_WORKERS = 2
+
+DEFAULT_SNAPSHOT_INTERVAL = 0
+
+DEFAULT_API_WATCHER_BATCH_SIZE = 10000
+DEFAULT_API_WATCHER_ROLLBACK_DEPTH = 1000
+
+DEFAULT_API_CACHE_SIZE = 10000
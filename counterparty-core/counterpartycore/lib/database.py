@@ -324,6 +324,53 @@ def copy_old_table(cursor, table_name, new_create_query):
     cursor.execute(f"""DROP TABLE old_{table_name}""")
 
 
+def get_table_fields(cursor, table):
+    return [column["name"] for column in cursor.execute(f"PRAGMA table_info({table})")]
+
+
+# called by `blocks.create_current_state_tables()`, no sql injection
+def create_current_state_table(cursor, table_name, id_fields):
+    """
+    Create `{table_name}_current` with the last row of each object of `table_name`.
+    The rows keep the `rowid` of the row they are copied from.
+    """
+    current_table_name = f"{table_name}_current"
+    table_fields = get_table_fields(cursor, table_name)
+    if table_exists(cursor, current_table_name):
+        last_rowids = cursor.execute(
+            f"""
+            SELECT
+                (SELECT MAX(rowid) FROM {table_name}) AS last_rowid,
+                (SELECT MAX(rowid) FROM {current_table_name}) AS last_current_rowid
+            """  # nosec B608  # noqa: S608
+        ).fetchone()
+        if (
+            get_table_fields(cursor, current_table_name) == table_fields
+            and last_rowids["last_rowid"] == last_rowids["last_current_rowid"]
+        ):
+            return
+        # schema changed or table not maintained by a previous version
+        cursor.execute(f"DROP TABLE {current_table_name}")
+
+    cursor.execute(f"CREATE TABLE {current_table_name} AS SELECT * FROM {table_name} WHERE 0")  # nosec B608  # noqa: S608
+    # NULL values are distinct in an UNIQUE index
+    if len(id_fields) > 1:
+        id_expressions = [f"IFNULL({field}, '')" for field in id_fields]
+    else:
+        id_expressions = id_fields
+    cursor.execute(
+        f"CREATE UNIQUE INDEX {current_table_name}_id_idx ON {current_table_name} ({', '.join(id_expressions)})"
+    )
+    fields = ", ".join(["rowid"] + table_fields)
+    cursor.execute(
+        f"""
+        INSERT INTO {current_table_name} ({fields})
+        SELECT {fields} FROM {table_name}
+        WHERE rowid IN (SELECT MAX(rowid) FROM {table_name} GROUP BY {", ".join(id_fields)})
+        """  # nosec B608  # noqa: S608
+    )
+
+
 def table_exists(cursor, table):
     table_name = cursor.execute(
         f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'"  # nosec B608  # noqa: S608
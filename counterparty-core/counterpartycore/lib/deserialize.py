@@ -1,123 +1,187 @@
-from counterpartycore.lib.bc_data_stream import BCDataStream
+import hashlib
+import struct
+
+from counterpartycore.lib.exceptions import SerializationError
 from counterpartycore.lib.util import (
-    b2h,
     double_hash,
     ib2h,
 )
 
+# the fields are sliced from the raw bytes, the hashes are computed on `memoryview`s to
+# avoid copying the transactions
+INT32 = struct.Struct("<i")
+UINT16 = struct.Struct("<H")
+UINT32 = struct.Struct("<I")
+OUTPOINT = struct.Struct("<32sI")
+INT64 = struct.Struct("<q")
+UINT64 = struct.Struct("<Q")
+BLOCK_HEADER = struct.Struct("<i32s32sIII")
+
+NULL_HASH = b"\x00" * 32
+
+
+def read_compact_size(data, offset):
+    size = data[offset]
+    if size < 253:
+        return size, offset + 1
+    if size == 253:
+        return UINT16.unpack_from(data, offset + 1)[0], offset + 3
+    if size == 254:
+        return UINT32.unpack_from(data, offset + 1)[0], offset + 5
+    return UINT64.unpack_from(data, offset + 1)[0], offset + 9
+
+
+def read_tx_in(data, offset):
+    tx_hash, n = OUTPOINT.unpack_from(data, offset)
+    offset += 36
+    size = data[offset]
+    if size < 253:
+        offset += 1
+    else:
+        size, offset = read_compact_size(data, offset)
+    script_sig = data[offset : offset + size]
+    offset += size
+    tx_in = {
+        "hash": tx_hash,
+        "n": n,
+        "script_sig": script_sig,
+        "sequence": UINT32.unpack_from(data, offset)[0],
+        "coinbase": tx_hash == NULL_HASH,
+    }
+    return tx_in, offset + 4
+
+
+def read_tx_out(data, offset):
+    value = INT64.unpack_from(data, offset)[0]
+    offset += 8
+    size = data[offset]
+    if size < 253:
+        offset += 1
+    else:
+        size, offset = read_compact_size(data, offset)
+    tx_out = {"value": value, "script_pub_key": data[offset : offset + size]}
+    return tx_out, offset + size
+
+
+def read_transaction(data, offset=0, use_txid=True, view=None):
+    """
+    Read the transaction starting at `offset` in the bytes `data` (and `view`, its
+    `memoryview`), returns the decoded transaction and the offset of its end.
+    """
+    if view is None:
+        view = memoryview(data)
+    transaction = {}
+    start_pos = offset
+    transaction["version"] = INT32.unpack_from(data, offset)[0]
+    offset += 4
+
+    segwit = data[offset : offset + 2] == b"\x00\x01"
+    transaction["segwit"] = segwit
+    if segwit:
+        offset += 2
+    inputs_start = offset
+
+    coinbase = False
+    vins = []
+    vin_count, offset = read_compact_size(data, offset)
+    for _i in range(vin_count):
+        vin, offset = read_tx_in(data, offset)
+        vins.append(vin)
+        coinbase = coinbase or vin["coinbase"]
+    transaction["coinbase"] = coinbase
+    transaction["vin"] = vins
+
+    vouts = []
+    vout_count, offset = read_compact_size(data, offset)
+    for _i in range(vout_count):
+        vout, offset = read_tx_out(data, offset)
+        vouts.append(vout)
+    transaction["vout"] = vouts
+
+    witnesses = []
+    witnesses_start = offset
+    if segwit:
+        for _i in range(vin_count):
+            witnesses_count, offset = read_compact_size(data, offset)
+            for _j in range(witnesses_count):
+                witness_length, offset = read_compact_size(data, offset)
+                witnesses.append(data[offset : offset + witness_length])
+                offset += witness_length
+    transaction["vtxinwit"] = witnesses
+
+    transaction["lock_time"] = UINT32.unpack_from(data, offset)[0]
+    offset += 4
+    tx_data = view[start_pos:offset]
+
+    if segwit:
+        # the txid is hashed from the slices of the transaction without the marker, the flag
+        # and the witnesses, the wtxid only when it is the `tx_hash`
+        txid_hash = hashlib.sha256(view[start_pos : start_pos + 4])
+        txid_hash.update(view[inputs_start:witnesses_start])
+        txid_hash.update(view[offset - 4 : offset])
+        tx_id = ib2h(hashlib.sha256(txid_hash.digest()).digest())
+        transaction["tx_hash"] = tx_id if use_txid else ib2h(double_hash(tx_data))
+        transaction["tx_id"] = tx_id
+    else:
+        transaction["tx_hash"] = ib2h(double_hash(tx_data))
 
-def read_tx_in(vds):
-    tx_in = {}
-    tx_in["hash"] = vds.read_bytes(32)
-    tx_in["n"] = vds.read_uint32()
-    script_sig_size = vds.read_compact_size()
-    tx_in["script_sig"] = vds.read_bytes(script_sig_size)
-    tx_in["sequence"] = vds.read_uint32()
-    tx_in["coinbase"] = False
-    if (
-        tx_in["hash"]
-        == b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
-    ):
-        tx_in["coinbase"] = True
-    return tx_in
-
+    transaction["__data__"] = tx_data.hex()
 
-def read_tx_out(vds):
-    tx_out = {}
-    tx_out["value"] = vds.read_int64()
-    script = vds.read_bytes(vds.read_compact_size())
-    tx_out["script_pub_key"] = script
-    return tx_out
+    return transaction, offset
 
 
-def read_transaction(vds, use_txid=True):
-    transaction = {}
-    start_pos = vds.read_cursor
-    transaction["version"] = vds.read_int32()
-
-    flag = vds.read_bytes(2)
-    if flag == b"\x00\x01":
-        transaction["segwit"] = True
-    else:
-        transaction["segwit"] = False
-        vds.read_cursor = vds.read_cursor - 2
-
-    transaction["coinbase"] = False
-    transaction["vin"] = []
-    for _i in range(vds.read_compact_size()):  # noqa: B007
-        vin = read_tx_in(vds)
-        transaction["vin"].append(vin)
-        transaction["coinbase"] = transaction["coinbase"] or vin["coinbase"]
-
-    transaction["vout"] = []
-    for i in range(vds.read_compact_size()):  # noqa: B007
-        transaction["vout"].append(read_tx_out(vds))
-
-    transaction["vtxinwit"] = []
-    if transaction["segwit"]:
-        offset_before_tx_witnesses = vds.read_cursor - start_pos
-        for vin in transaction["vin"]:  # noqa: B007
-            witnesses_count = vds.read_compact_size()
-            for i in range(witnesses_count):  # noqa: B007
-                witness_length = vds.read_compact_size()
-                witness = vds.read_bytes(witness_length)
-                transaction["vtxinwit"].append(witness)
-
-    transaction["lock_time"] = vds.read_uint32()
-    data = vds.input[start_pos : vds.read_cursor]
-
-    transaction["tx_hash"] = ib2h(double_hash(data))
-    if transaction["segwit"]:
-        hash_data = data[:4] + data[6:offset_before_tx_witnesses] + data[-4:]
-        transaction["tx_id"] = ib2h(double_hash(hash_data))
-        if use_txid:
-            transaction["tx_hash"] = transaction["tx_id"]
-
-    transaction["__data__"] = b2h(data)
-
-    return transaction
-
-
-def read_block_header(vds):
+def read_block_header(data, offset=0):
     block_header = {}
-    block_header["magic_bytes"] = vds.read_int32()
-    # if block_header['magic_bytes'] != 118034699:
-    #   raise Exception('Not a block')
-    block_header["block_size"] = vds.read_int32()
-    header_start = vds.read_cursor
-    block_header["version"] = vds.read_int32()
-    block_header["hash_prev"] = ib2h(vds.read_bytes(32))
-    block_header["hash_merkle_root"] = ib2h(vds.read_bytes(32))
-    block_header["block_time"] = vds.read_uint32()
-    block_header["bits"] = vds.read_uint32()
-    block_header["nonce"] = vds.read_uint32()
-    header_end = vds.read_cursor
-    header = vds.input[header_start:header_end]
-    block_header["block_hash"] = ib2h(double_hash(header))
-    # block_header['__header__'] = b2h(header)
-    return block_header
-
-
-def read_block(vds, only_header=False, use_txid=True):
-    block = read_block_header(vds)
+    header_end = offset + BLOCK_HEADER.size
+    (
+        block_header["version"],
+        hash_prev,
+        hash_merkle_root,
+        block_header["block_time"],
+        block_header["bits"],
+        block_header["nonce"],
+    ) = BLOCK_HEADER.unpack_from(data, offset)
+    block_header["hash_prev"] = ib2h(hash_prev)
+    block_header["hash_merkle_root"] = ib2h(hash_merkle_root)
+    block_header["block_hash"] = ib2h(double_hash(memoryview(data)[offset:header_end]))
+    return block_header, header_end
+
+
+def read_block(data, only_header=False, use_txid=True):
+    block, offset = read_block_header(data)
     if only_header:
         return block
-    block["transaction_count"] = vds.read_compact_size()
+    block["transaction_count"], offset = read_compact_size(data, offset)
     block["transactions"] = []
-    for _i in range(block["transaction_count"]):  # noqa: B007
-        block["transactions"].append(read_transaction(vds, use_txid=use_txid))
+    view = memoryview(data)
+    for _i in range(block["transaction_count"]):
+        transaction, offset = read_transaction(data, offset, use_txid=use_txid, view=view)
+        block["transactions"].append(transaction)
+    check_end(data, offset)
     return block
 
 
+def to_bytes(raw):
+    # the RPC calls return hex, ZMQ returns bytes
+    if isinstance(raw, str):
+        return bytes.fromhex(raw)
+    return bytes(raw)
+
+
+def check_end(data, offset):
+    # the slices past the end are truncated silently
+    if offset > len(data):
+        raise SerializationError("attempt to read past end of buffer")
+
+
 def deserialize_tx(tx_hex, use_txid):
-    ds = BCDataStream()
-    ds.map_hex(tx_hex)
-    tx = read_transaction(ds, use_txid=use_txid)
+    """Decode a transaction given in hex or in bytes."""
+    data = to_bytes(tx_hex)
+    tx, offset = read_transaction(data, use_txid=use_txid)
+    check_end(data, offset)
     return tx
 
 
 def deserialize_block(block_hex, use_txid, only_header=False):
-    block_hex = ("00" * 8) + block_hex  # fake magic bytes and block size
-    ds = BCDataStream()
-    ds.map_hex(block_hex)
-    return read_block(ds, only_header=only_header, use_txid=use_txid)
+    """Decode a block given in hex or in bytes."""
+    return read_block(to_bytes(block_hex), only_header=only_header, use_txid=use_txid)
@@ -118,7 +118,9 @@ class BlockchainWatcher:
 
     def receive_rawblock(self, body):
         # parse blocks as they come in
-        decoded_block = deserialize.deserialize_block(body.hex(), use_txid=True)
+        decoded_block = deserialize.deserialize_block(body, use_txid=True)
+        for transaction in decoded_block["transactions"]:
+            backend.bitcoind.PrevoutsCache().add_transaction(transaction)
         # check if already parsed by block.catch_up()
         existing_block = ledger.get_block_by_hash(self.db, decoded_block["block_hash"])
         if existing_block is None:
@@ -140,7 +142,7 @@ class BlockchainWatcher:
         tx_hash = self.hash_by_sequence.get(sequence)
         if tx_hash is None:
             # when tx never seen in the mempool is included in a block
-            decoded_tx = deserialize.deserialize_tx(body.hex(), use_txid=True)
+            decoded_tx = deserialize.deserialize_tx(body, use_txid=True)
             tx_hash = decoded_tx["tx_hash"]
         if sequence in self.hash_by_sequence:
             self.hash_by_sequence.pop(sequence)
@@ -223,6 +225,7 @@ class BlockchainWatcher:
     async def handle(self):
         self.check_software_version_if_needed()
         util.BLOCK_PARSER_STATUS = "following"
+        ledger.drop_balances_cache()
 
         while True:
             try:
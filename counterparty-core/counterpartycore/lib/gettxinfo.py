@@ -146,6 +146,11 @@ def get_vin_info(vin):
     if "value" in vin:
         return vin["value"], vin["script_pub_key"], vin["is_segwit"]
 
+    tx_hash = util.ib2h(vin["hash"]) if isinstance(vin["hash"], bytes) else vin["hash"]
+    prevout = backend.bitcoind.PrevoutsCache().get(tx_hash, vin["n"])
+    if prevout is not None:
+        return prevout
+
     # Note: We don't know what block the `vin` is in, and the block might have been from a while ago, so this call may not hit the cache.
     vin_ctx = backend.bitcoind.get_decoded_transaction(vin["hash"])
 
@@ -159,6 +164,7 @@ def get_transaction_sources(decoded_tx):
     sources = []
     outputs_value = 0
 
+    backend.bitcoind.fill_prevouts_cache(decoded_tx["vin"])
     for vin in decoded_tx["vin"][:]:  # Loop through inputs.
         vout_value, script_pubkey, _is_segwit = get_vin_info(vin)
 
@@ -200,6 +206,7 @@ def get_transaction_source_from_p2sh(decoded_tx, p2sh_is_segwit):
     data = b""
     outputs_value = 0
 
+    backend.bitcoind.fill_prevouts_cache(decoded_tx["vin"])
     for vin in decoded_tx["vin"]:
         vout_value, _script_pubkey, is_segwit = get_vin_info(vin)
 
@@ -395,7 +402,13 @@ def get_tx_info_new(db, decoded_tx, block_index, p2sh_is_segwit=False, composing
     # Collect all (unique) source addresses.
     #   if we haven't found them yet
     if p2sh_encoding_source is None:
-        sources, outputs_value = get_transaction_sources(decoded_tx)
+        if "parsed_sources" in decoded_tx:
+            # sources already decoded by `predecode_tx()`
+            if isinstance(decoded_tx["parsed_sources"], Exception):
+                raise decoded_tx["parsed_sources"]
+            sources, outputs_value = decoded_tx["parsed_sources"]
+        else:
+            sources, outputs_value = get_transaction_sources(decoded_tx)
         if not fee_added:
             fee += outputs_value
     else:  # use the source from the p2sh data source
@@ -429,6 +442,68 @@ def get_tx_info_new(db, decoded_tx, block_index, p2sh_is_segwit=False, composing
     return sources, destinations, btc_amount, round(fee), data, []
 
 
+def is_predecodable(decoded_tx):
+    """Return True if the transaction may carry a Counterparty message with a source to decode."""
+    if decoded_tx["coinbase"]:
+        return False
+    if "parsed_vouts" not in decoded_tx:
+        return True
+    parsed_vouts = decoded_tx["parsed_vouts"]
+    if isinstance(parsed_vouts, Exception) or parsed_vouts == "DecodeError":
+        return False
+    destinations, _btc_amount, _fee, data, _potential_dispensers = parsed_vouts
+    # without data only dispenses need a source, and that depends on the ledger state
+    return bool(data) or destinations == [config.UNSPENDABLE]
+
+
+def predecode_tx(decoded_tx, block_index):
+    """
+    Decode the parts of a transaction that don't depend on the ledger state: the outputs,
+    the previous outputs spent by the inputs and the source addresses.
+    Returns the fields to merge into `decoded_tx` with `merge_predecoded_tx()`,
+    or None if the transaction must be decoded by `get_tx_info()` only.
+    """
+    if not is_predecodable(decoded_tx):
+        return None
+    if not util.enabled("multisig_addresses", block_index=block_index):
+        return None
+
+    predecoded = {}
+    if "parsed_vouts" in decoded_tx:
+        parsed_vouts = decoded_tx["parsed_vouts"]
+    else:
+        try:
+            parsed_vouts = parse_transaction_vouts(decoded_tx)
+        except DecodeError:
+            return None
+        predecoded["parsed_vouts"] = parsed_vouts
+    destinations, _btc_amount, _fee, data, _potential_dispensers = parsed_vouts
+    if not data and destinations != [config.UNSPENDABLE]:
+        return None
+
+    backend.bitcoind.fill_prevouts_cache(decoded_tx["vin"])
+    predecoded["vin_info"] = [get_vin_info(vin) for vin in decoded_tx["vin"]]
+    merge_predecoded_tx(decoded_tx, predecoded)
+
+    # P2SH encoded transactions get their source from the inputs scripts
+    if not (util.enabled("p2sh_encoding", block_index=block_index) and data == b"P2SH"):
+        try:
+            predecoded["parsed_sources"] = get_transaction_sources(decoded_tx)
+        except DecodeError as e:
+            predecoded["parsed_sources"] = e
+
+    return predecoded
+
+
+def merge_predecoded_tx(decoded_tx, predecoded):
+    for vin, (value, script_pub_key, is_segwit) in zip(decoded_tx["vin"], predecoded["vin_info"]):
+        vin["value"], vin["script_pub_key"], vin["is_segwit"] = value, script_pub_key, is_segwit
+    if "parsed_vouts" in predecoded:
+        decoded_tx["parsed_vouts"] = predecoded["parsed_vouts"]
+    if "parsed_sources" in predecoded:
+        decoded_tx["parsed_sources"] = predecoded["parsed_sources"]
+
+
 def get_tx_info_legacy(decoded_tx, block_index):
     """Get singlesig transaction info.
     The destination, if it exists, always comes before the data output; the
@@ -505,6 +580,7 @@ def get_tx_info_legacy(decoded_tx, block_index):
 
     # Collect all possible source addresses; ignore coinbase transactions and anything but the simplest Pay‐to‐PubkeyHash inputs.
     source_list = []
+    backend.bitcoind.fill_prevouts_cache(decoded_tx["vin"])
     for vin in decoded_tx["vin"][:]:  # Loop through input transactions.
         # Get the full transaction data for this input transaction.
         vout_value, script_pubkey, _is_segwit = get_vin_info(vin)
@@ -10,9 +10,31 @@ from counterpartycore.lib import backend, config, database, exceptions, log, uti
 
 logger = logging.getLogger(config.LOGGER_NAME)
 
-BLOCK_LEDGER = []
-BLOCK_JOURNAL = []
+# hashers of the ledger and of the journal of the current block, see `check.consensus_hasher()`
+BLOCK_LEDGER = util.DoubleHasher()
+BLOCK_JOURNAL = util.DoubleHasher()
 LAST_BLOCK = None
+# `messages` rows waiting to be written and events waiting to be published,
+# `JOURNAL_BUFFER` is `None` when the journal is written directly
+JOURNAL_BUFFER = None
+JOURNAL_PENDING_EVENTS = []
+# notified of the last message index after each committed block, see `api_watcher.EventFeed`
+EVENT_FEED = None
+# per asset changes of the supplies and of the held quantities in the current block,
+# see `check.block_asset_conservation()`
+BLOCK_SUPPLY_DELTAS = {}
+BLOCK_HELD_DELTAS = {}
+# id fields of the insert-only tables with a `{table}_current` table holding
+# the last row of each object, see `blocks.create_current_state_tables()`
+CURRENT_STATE_TABLES = {
+    "balances": ["address", "utxo", "asset"],
+    "orders": ["tx_hash"],
+    "order_matches": ["id"],
+    "bets": ["tx_hash"],
+    "dispensers": ["tx_hash"],
+    "fairminters": ["tx_hash"],
+}
+CURRENT_STATE_FIELDS = {}
 
 
 ###############################
@@ -36,6 +58,7 @@ def insert_record(db, table_name, record, event, event_info={}):  # noqa: B006
 
     with get_cursor(db) as cursor:
         cursor.execute(query, list(record.values()))
+        update_current_state(db, cursor, table_name)
         if table_name in ["issuances", "destructions"] and not util.PARSING_MEMPOOL:
             cursor.execute("SELECT last_insert_rowid() AS rowid")
             inserted_rowid = cursor.fetchone()["rowid"]
@@ -51,6 +74,7 @@ def insert_record(db, table_name, record, event, event_info={}):  # noqa: B006
             else:
                 AssetCache(db)  # initialization will add just created record to cache
 
+    track_asset_conservation(table_name, None, record)
     add_to_journal(db, util.CURRENT_BLOCK_INDEX, "insert", table_name, event, record | event_info)
 
 
@@ -59,10 +83,14 @@ def insert_record(db, table_name, record, event, event_info={}):  # noqa: B006
 # order updates and retrieve the row with the current data.
 def insert_update(db, table_name, id_name, id_value, update_data, event, event_info={}):  # noqa: B006
     cursor = db.cursor()
+    # the current state table has the last row of each object
+    select_table_name = table_name
+    if CURRENT_STATE_TABLES.get(table_name) == [id_name]:
+        select_table_name = f"{table_name}_current"
     # select records to update
     select_query = f"""
         SELECT *, rowid
-        FROM {table_name}
+        FROM {select_table_name}
         WHERE {id_name} = ?
         ORDER BY rowid DESC
         LIMIT 1
@@ -90,7 +118,9 @@ def insert_update(db, table_name, id_name, id_value, update_data, event, event_i
     # no sql injection here
     insert_query = f"""INSERT INTO {table_name} ({fields_name}) VALUES ({fields_values})"""  # nosec B608  # noqa: S608
     cursor.execute(insert_query, new_record)
+    update_current_state(db, cursor, table_name)
     cursor.close()
+    track_asset_conservation(table_name, need_update_record, new_record)
     # Add event to journal
     event_paylod = update_data | {id_name: id_value} | event_info
     if "rowid" in event_paylod:
@@ -98,6 +128,51 @@ def insert_update(db, table_name, id_name, id_value, update_data, event, event_i
     add_to_journal(db, util.CURRENT_BLOCK_INDEX, "update", table_name, event, event_paylod)
 
 
+def get_current_state_fields(cursor, table_name):
+    if table_name not in CURRENT_STATE_FIELDS:
+        fields = ["rowid"] + database.get_table_fields(cursor, table_name)
+        CURRENT_STATE_FIELDS[table_name] = ", ".join(fields)
+    return CURRENT_STATE_FIELDS[table_name]
+
+
+def update_current_state(db, cursor, table_name):
+    """Copy the row just inserted in `table_name` to its current state table."""
+    if table_name not in CURRENT_STATE_TABLES:
+        return
+    fields = get_current_state_fields(cursor, table_name)
+    # no sql injection here
+    query = f"""
+        INSERT OR REPLACE INTO {table_name}_current ({fields})
+        SELECT {fields} FROM {table_name} WHERE rowid = ?
+    """  # nosec B608  # noqa: S608
+    cursor.execute(query, (db.last_insert_rowid(),))
+
+
+def rollback_current_state(cursor, table_name, block_index):
+    """
+    Restore the current state of the objects updated since `block_index`.
+    Must be called after the rows of `table_name` from `block_index` are deleted.
+    """
+    id_fields = CURRENT_STATE_TABLES[table_name]
+    fields = get_current_state_fields(cursor, table_name)
+    # no sql injection here
+    select_query = f"""
+        SELECT {", ".join(id_fields)} FROM {table_name}_current WHERE block_index >= ?
+    """  # nosec B608  # noqa: S608
+    ids = cursor.execute(select_query, (block_index,)).fetchall()
+    delete_query = f"DELETE FROM {table_name}_current WHERE block_index >= ?"  # nosec B608  # noqa: S608
+    cursor.execute(delete_query, (block_index,))
+    where = " AND ".join([f"{field} IS ?" for field in id_fields])
+    insert_query = f"""
+        INSERT INTO {table_name}_current ({fields})
+        SELECT {fields} FROM {table_name}
+        WHERE {where}
+        ORDER BY rowid DESC LIMIT 1
+    """  # nosec B608  # noqa: S608
+    for id_values in ids:
+        cursor.execute(insert_query, [id_values[field] for field in id_fields])
+
+
 ###########################
 #         MESSAGES        #
 ###########################
@@ -122,6 +197,42 @@ def last_message(db):
     return last_message
 
 
+class JournalHead(metaclass=util.SingletonMeta):
+    """Keep the index and hash of the last `messages` row in memory."""
+
+    def __init__(self, db):
+        self.init(db)
+
+    def init(self, db):
+        self.db = db
+        try:
+            previous_message = last_message(db)
+            self.message_index = previous_message["message_index"]
+            self.event_hash = previous_message["event_hash"] or ""
+        except exceptions.DatabaseError:
+            self.message_index = -1
+            self.event_hash = ""
+        # explicit `ROLLBACK` (not `with db:` savepoints) must also invalidate the head
+        db.setrollbackhook(self.reset)
+
+    def reset(self):
+        # the head will be read again from the database on next access
+        self.db = None
+
+    def get(self, db):
+        if self.db is not db:
+            self.init(db)
+        return self.message_index, self.event_hash
+
+    def advance(self, message_index, event_hash):
+        self.message_index = message_index
+        self.event_hash = event_hash
+
+
+def reset_journal_head(db):
+    JournalHead(db).reset()
+
+
 def get_messages(db, block_index=None, block_index_in=None, message_index_in=None):
     cursor = db.cursor()
     where = []
@@ -143,6 +254,21 @@ def get_messages(db, block_index=None, block_index_in=None, message_index_in=Non
     return cursor.fetchall()
 
 
+INSERT_MESSAGE_QUERY = """INSERT INTO messages (
+        message_index, block_index, command, category, bindings, timestamp, event, tx_hash, event_hash
+    ) VALUES (
+        :message_index,
+        :block_index,
+        :command,
+        :category,
+        :bindings,
+        :timestamp,
+        :event,
+        :tx_hash,
+        :event_hash
+    )"""
+
+
 # we are using a function here for testing purposes
 def curr_time():
     return int(time.time())
@@ -150,13 +276,9 @@ def curr_time():
 
 def add_to_journal(db, block_index, command, category, event, bindings):
     # Get last message index.
-    try:
-        previous_message = last_message(db)
-        message_index = previous_message["message_index"] + 1
-        previous_event_hash = previous_message["event_hash"] or ""
-    except exceptions.DatabaseError:
-        message_index = 0
-        previous_event_hash = ""
+    journal_head = JournalHead(db)
+    previous_message_index, previous_event_hash = journal_head.get(db)
+    message_index = previous_message_index + 1
 
     items = {
         key: binascii.hexlify(value).decode("ascii") if isinstance(value, bytes) else value
@@ -189,28 +311,68 @@ def add_to_journal(db, block_index, command, category, event, bindings):
         "tx_hash": util.CURRENT_TX_HASH,
         "event_hash": event_hash,
     }
-    query = """INSERT INTO messages (
-                message_index, block_index, command, category, bindings, timestamp, event, tx_hash, event_hash
-            ) VALUES (
-                :message_index,
-                :block_index,
-                :command,
-                :category,
-                :bindings,
-                :timestamp,
-                :event,
-                :tx_hash,
-                :event_hash
-            )"""
-    cursor = db.cursor()
-    cursor.execute(query, message_bindings)
-    cursor.close()
+    journal_head.advance(message_index, event_hash)
 
-    BLOCK_JOURNAL.append(f"{command}{category}{bindings_string}")
+    BLOCK_JOURNAL.update(f"{command}{category}{bindings_string}")
+
+    if JOURNAL_BUFFER is not None:
+        JOURNAL_BUFFER.append(message_bindings)
+        JOURNAL_PENDING_EVENTS.append((block_index, message_index, event, items))
+        return
+
+    cursor = db.cursor()
+    cursor.execute(INSERT_MESSAGE_QUERY, message_bindings)
+    cursor.close()
 
     log.log_event(db, block_index, message_index, event, items)
 
 
+def publish_journal_events(db):
+    global JOURNAL_PENDING_EVENTS  # noqa: PLW0603
+    pending_events = JOURNAL_PENDING_EVENTS
+    JOURNAL_PENDING_EVENTS = []
+    for block_index, message_index, event, items in pending_events:
+        log.log_event(db, block_index, message_index, event, items)
+
+
+@contextmanager
+def buffered_journal(db, rollback_error=None):
+    """
+    Buffer the `messages` rows until `flush_journal()` and publish the events
+    only once the block is committed. Nothing is published if parsing fails,
+    except when `rollback_error` is raised to roll back on purpose.
+    """
+    global JOURNAL_BUFFER, JOURNAL_PENDING_EVENTS  # noqa: PLW0603
+    if JOURNAL_BUFFER is not None:  # already buffering
+        yield
+        return
+    JOURNAL_BUFFER = []
+    JOURNAL_PENDING_EVENTS = []
+    try:
+        yield
+    except Exception as e:
+        # buffered messages have been or will be rolled back
+        reset_journal_head(db)
+        JOURNAL_BUFFER = None
+        if rollback_error is not None and isinstance(e, rollback_error):
+            publish_journal_events(db)
+        JOURNAL_PENDING_EVENTS = []
+        raise
+    JOURNAL_BUFFER = None
+    publish_journal_events(db)
+    if EVENT_FEED is not None:
+        EVENT_FEED.notify(JournalHead(db).get(db)[0])
+
+
+def flush_journal(db):
+    if not JOURNAL_BUFFER:
+        return
+    cursor = db.cursor()
+    cursor.executemany(INSERT_MESSAGE_QUERY, JOURNAL_BUFFER)
+    cursor.close()
+    JOURNAL_BUFFER.clear()
+
+
 def replay_event(db, event, action, table, bindings, id_name=None):
     if action == "insert":
         if event == "DEBIT":
@@ -297,6 +459,9 @@ def remove_from_balance(db, address, asset, quantity, tx_index, utxo_address=Non
             VALUES (:address, :asset, :quantity, :block_index, :tx_index, :utxo, :utxo_address)
         """
         balance_cursor.execute(query, bindings)
+        update_current_state(db, balance_cursor, "balances")
+        update_balances_cache(db, address, asset, balance)
+        track_balance_held_delta(balance_address, utxo, asset, balance, old_balance)
 
 
 class DebitError(Exception):
@@ -348,7 +513,7 @@ def debit(db, address, asset, quantity, tx_index, action=None, event=None):
     }
     insert_record(db, "debits", bindings, "DEBIT")
 
-    BLOCK_LEDGER.append(f"{block_index}{address}{asset}{quantity}")
+    BLOCK_LEDGER.update(f"{block_index}{address}{asset}{quantity}")
 
 
 def add_to_balance(db, address, asset, quantity, tx_index, utxo_address=None):
@@ -378,6 +543,9 @@ def add_to_balance(db, address, asset, quantity, tx_index, utxo_address=None):
         VALUES (:address, :asset, :quantity, :block_index, :tx_index, :utxo, :utxo_address)
     """
     balance_cursor.execute(query, bindings)
+    update_current_state(db, balance_cursor, "balances")
+    update_balances_cache(db, address, asset, balance)
+    track_balance_held_delta(balance_address, utxo, asset, balance, old_balance)
 
 
 class CreditError(Exception):
@@ -428,7 +596,7 @@ def credit(db, address, asset, quantity, tx_index, action=None, event=None):
     }
     insert_record(db, "credits", bindings, "CREDIT")
 
-    BLOCK_LEDGER.append(f"{block_index}{address}{asset}{quantity}")
+    BLOCK_LEDGER.update(f"{block_index}{address}{asset}{quantity}")
 
 
 def transfer(db, source, destination, asset, quantity, action, event):
@@ -437,8 +605,8 @@ def transfer(db, source, destination, asset, quantity, action, event):
     credit(db, destination, asset, quantity, action=action, event=event)
 
 
-def get_balance(db, address, asset, raise_error_if_no_balance=False, return_list=False):
-    """Get balance of contract or address."""
+def get_balance_no_cache(db, address, asset):
+    """Get last balance record of contract or address."""
     cursor = db.cursor()
 
     field_name = "address"
@@ -446,26 +614,95 @@ def get_balance(db, address, asset, raise_error_if_no_balance=False, return_list
         field_name = "utxo"
 
     query = f"""
-        SELECT * FROM balances
+        SELECT * FROM balances_current
         WHERE ({field_name} = ? AND asset = ?)
         ORDER BY rowid DESC LIMIT 1
     """  # noqa: S608
     bindings = (address, asset)
     balances = list(cursor.execute(query, bindings))
     cursor.close()
+    return balances
+
+
+def get_balance(db, address, asset, raise_error_if_no_balance=False, return_list=False):
+    """Get balance of contract or address."""
     if return_list:
-        return balances
-    if not balances and raise_error_if_no_balance:
+        return get_balance_no_cache(db, address, asset)
+    if use_balances_cache(db):
+        quantity = BalancesCache(db).get_balance(db, address, asset)
+    else:
+        balances = get_balance_no_cache(db, address, asset)
+        quantity = balances[0]["quantity"] if balances else None
+    if quantity is None and raise_error_if_no_balance:
         raise exceptions.BalanceError(f"No balance for this address and asset: {address}, {asset}.")
-    if not balances:
+    if quantity is None:
         return 0
-    return balances[0]["quantity"]
+    return quantity
+
+
+class BalancesCache(metaclass=util.SingletonMeta):
+    """
+    Write-through cache of the last balance by (address or utxo, asset).
+    Filled lazily from the `balances` table and used only during catch up.
+    """
+
+    def __init__(self, db):
+        logger.debug("Initialising balances cache...")
+        # only the connection used to parse blocks can read the cache
+        self.db = db
+        self.balances = {}
+
+    def get_balance(self, db, address, asset):
+        key = (address, asset)
+        if key not in self.balances:
+            balances = get_balance_no_cache(db, address, asset)
+            self.balances[key] = balances[0]["quantity"] if balances else None
+        return self.balances[key]
+
+    def update_balance(self, address, asset, quantity):
+        self.balances[(address, asset)] = quantity
+
+    def clear(self):
+        self.balances = {}
+
+    def remove_balances(self, keys):
+        for key in keys:
+            self.balances.pop(key, None)
+
+
+def use_balances_cache(db):
+    return (
+        util.BLOCK_PARSER_STATUS == "catching up"
+        and not util.PARSING_MEMPOOL
+        and BalancesCache in BalancesCache._instances
+        and BalancesCache(db).db is db
+    )
+
+
+def update_balances_cache(db, address, asset, quantity):
+    if use_balances_cache(db):
+        BalancesCache(db).update_balance(address, asset, quantity)
+
+
+def drop_balances_cache():
+    # the cache is neither read nor updated once the blocks are followed
+    BalancesCache._instances.pop(BalancesCache, None)
+
+
+def clear_balances_cache(db):
+    if BalancesCache in BalancesCache._instances:
+        BalancesCache(db).clear()
+
+
+def remove_from_balances_cache(db, keys):
+    if BalancesCache in BalancesCache._instances:
+        BalancesCache(db).remove_balances(keys)
 
 
 class UTXOBalancesCache(metaclass=util.SingletonMeta):
     def __init__(self, db):
         logger.debug("Initialising utxo balances cache...")
-        sql = "SELECT utxo, asset, quantity, MAX(rowid) FROM balances WHERE utxo IS NOT NULL GROUP BY utxo, asset"
+        sql = "SELECT utxo FROM balances_current WHERE utxo IS NOT NULL"
         cursor = db.cursor()
         cursor.execute(sql)
         utxo_balances = cursor.fetchall()
@@ -479,6 +716,17 @@ class UTXOBalancesCache(metaclass=util.SingletonMeta):
     def add_balance(self, utxo):
         self.utxos_with_balance[utxo] = True
 
+    def refresh_utxos(self, db, utxos):
+        """Reload the given utxos from the database after a rollback."""
+        cursor = db.cursor()
+        for utxo in utxos:
+            query = "SELECT utxo FROM balances_current WHERE utxo = ? LIMIT 1"
+            if cursor.execute(query, (utxo,)).fetchone() is None:
+                self.utxos_with_balance.pop(utxo, None)
+            else:
+                self.utxos_with_balance[utxo] = True
+        cursor.close()
+
 
 def utxo_has_balance(db, utxo):
     return UTXOBalancesCache(db).has_balance(utxo)
@@ -497,7 +745,7 @@ def get_address_balances(db, address: str):
 
     query = f"""
         SELECT {field_name}, asset, quantity, utxo_address, MAX(rowid)
-        FROM balances
+        FROM balances_current
         WHERE {field_name} = ?
         GROUP BY {field_name}, asset
     """  # noqa: S608
@@ -519,7 +767,7 @@ def get_address_assets(db, address):
 
     query = f"""
         SELECT DISTINCT asset
-        FROM balances
+        FROM balances_current
         WHERE {field_name}=:address
         GROUP BY asset
     """  # noqa: S608
@@ -538,7 +786,7 @@ def get_balances_count(db, address):
     query = f"""
         SELECT COUNT(*) AS cnt FROM (
             SELECT DISTINCT asset
-            FROM balances
+            FROM balances_current
             WHERE {field_name}=:address
             GROUP BY asset
         )
@@ -829,7 +1077,7 @@ def get_asset_balances(db, asset: str, exclude_zero_balances: bool = True):
     cursor = db.cursor()
     query = """
         SELECT address, asset, quantity, MAX(rowid)
-        FROM balances
+        FROM balances_current
         WHERE asset = ?
         GROUP BY address, asset
         ORDER BY address
@@ -1099,6 +1347,39 @@ class AssetCache(metaclass=util.SingletonMeta):
             else:
                 self.assets_total_destroyed[destroyed["asset"]] = destroyed["quantity"]
 
+    def refresh_assets(self, db, assets):
+        """Reload the given assets from the database after a rollback."""
+        cursor = db.cursor()
+        for asset in assets:
+            last_issuance = self.assets.pop(asset, None)
+            if last_issuance is not None and last_issuance["asset_longname"] is not None:
+                self.assets.pop(last_issuance["asset_longname"], None)
+            query = """
+                SELECT * FROM issuances
+                WHERE asset = ? AND status = 'valid'
+                ORDER BY rowid DESC LIMIT 1
+            """
+            last_issuance = cursor.execute(query, (asset,)).fetchone()
+            if last_issuance is not None:
+                if last_issuance["asset_longname"] is not None:
+                    self.assets[last_issuance["asset_longname"]] = last_issuance
+                self.assets[asset] = last_issuance
+            for table, totals in [
+                ("issuances", self.assets_total_issued),
+                ("destructions", self.assets_total_destroyed),
+            ]:
+                # no sql injection here
+                query = f"""
+                    SELECT SUM(quantity) AS total, COUNT(*) AS count FROM {table}
+                    WHERE asset = ? AND status = 'valid'
+                """  # nosec B608  # noqa: S608
+                total = cursor.execute(query, (asset,)).fetchone()
+                if total["count"] == 0:
+                    totals.pop(asset, None)
+                else:
+                    totals[asset] = total["total"]
+        cursor.close()
+
 
 def asset_destroyed_total(db, asset):
     return AssetCache(db).assets_total_destroyed.get(asset, 0)
@@ -1173,7 +1454,10 @@ def get_oracle_last_price(db, oracle_address, block_index):
     if len(broadcasts) == 0:
         return None, None, None, None
 
-    oracle_broadcast = broadcasts[0]
+    return get_oracle_price(broadcasts[0])
+
+
+def get_oracle_price(oracle_broadcast):
     oracle_label = oracle_broadcast["text"].split("-")
     if len(oracle_label) == 2:
         fiat_label = oracle_label[1]
@@ -1188,6 +1472,20 @@ def get_oracle_last_price(db, oracle_address, block_index):
     )
 
 
+def get_oracles_last_price(db, oracle_addresses, block_index):
+    """Return the result of `get_oracle_last_price()` by address for several oracles with one query."""
+    cursor = db.cursor()
+    query = f"""
+        SELECT source, value, fee_fraction_int, text, block_index, MAX(tx_index) AS tx_index
+        FROM broadcasts
+        WHERE source IN ({",".join(["?"] * len(oracle_addresses))})
+        AND status = ? AND block_index < ?
+        GROUP BY source
+    """  # nosec B608  # noqa: S608
+    cursor.execute(query, oracle_addresses + ["valid", block_index])
+    return {broadcast["source"]: get_oracle_price(broadcast) for broadcast in cursor}
+
+
 def get_broadcasts_by_source(db, address: str, status: str = "valid", order_by: str = "DESC"):
     """
     Returns the broadcasts of a source
@@ -1381,6 +1679,25 @@ def get_transaction(db, tx_hash: str):
     return None
 
 
+def get_transactions_utxos(db, block_index):
+    """Return the utxos moved by the transactions since `block_index`."""
+    cursor = db.cursor()
+    query = """
+        SELECT utxos_info FROM transactions
+        WHERE block_index >= ? AND utxos_info IS NOT NULL AND utxos_info != ''
+    """
+    utxos = set()
+    for transaction in cursor.execute(query, (block_index,)):
+        sources, destination, _outputs_count, _op_return_output = util.parse_utxos_info(
+            transaction["utxos_info"]
+        )
+        utxos |= set(sources)
+        if destination:
+            utxos.add(destination)
+    cursor.close()
+    return utxos
+
+
 def get_transaction_source(db, tx_hash):
     cursor = db.cursor()
     query = """SELECT source FROM transactions WHERE tx_hash = ?"""
@@ -1481,7 +1798,7 @@ def get_pending_dispensers(db, block_index):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid) AS rowid
-            FROM dispensers
+            FROM dispensers_current
             WHERE close_block_index = :close_block_index
             GROUP BY source, asset
         )
@@ -1503,7 +1820,7 @@ def get_dispensers_count(db, source, status, origin):
     query = """
         SELECT count(*) cnt FROM (
             SELECT *, MAX(rowid)
-            FROM dispensers
+            FROM dispensers_current
             WHERE source = ? AND origin = ?
             GROUP BY tx_hash
         ) WHERE status = ?
@@ -1543,7 +1860,7 @@ def get_last_refills_block_index(db, dispenser_tx_hash):
 def get_dispenser(db, tx_hash):
     cursor = db.cursor()
     query = """
-        SELECT * FROM dispensers
+        SELECT * FROM dispensers_current
         WHERE tx_hash = ?
         ORDER BY rowid DESC LIMIT 1
     """
@@ -1601,7 +1918,7 @@ def get_dispensers(
     query = f"""
         SELECT *, rowid FROM (
             SELECT *, MAX(rowid) as rowid
-            FROM dispensers
+            FROM dispensers_current
             {first_where_str}
             {group_clause}
         ) {second_where_str}
@@ -1611,9 +1928,15 @@ def get_dispensers(
     return cursor.fetchall()
 
 
+def has_dispensers(db, source):
+    cursor = db.cursor()
+    query = """SELECT source FROM dispensers_current WHERE source = ? LIMIT 1"""
+    return cursor.execute(query, (source,)).fetchone() is not None
+
+
 def get_all_dispensables(db):
     cursor = db.cursor()
-    query = """SELECT DISTINCT source AS source FROM dispensers"""
+    query = """SELECT DISTINCT source AS source FROM dispensers_current"""
     dispensables = {}
     for row in cursor.execute(query).fetchall():
         dispensables[row["source"]] = True
@@ -1681,7 +2004,7 @@ def get_bet(db, bet_hash: str):
     """
     cursor = db.cursor()
     query = """
-        SELECT * FROM bets
+        SELECT * FROM bets_current
         WHERE tx_hash = ?
         ORDER BY rowid DESC LIMIT 1
     """
@@ -1695,7 +2018,7 @@ def get_bets_to_expire(db, block_index):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid)
-            FROM bets
+            FROM bets_current
             WHERE expire_index = ? - 1
             GROUP BY tx_hash
         ) WHERE status = ?
@@ -1711,7 +2034,7 @@ def get_matching_bets(db, feed_address, bet_type):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid)
-            FROM bets
+            FROM bets_current
             WHERE (feed_address = ? AND bet_type = ?)
             GROUP BY tx_hash
         ) WHERE status = ?
@@ -1732,7 +2055,7 @@ def get_bet_by_feed(db, address: str, status: str = "open"):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid)
-            FROM bets
+            FROM bets_current
             WHERE feed_address = ?
             GROUP BY tx_hash
         ) WHERE status = ?
@@ -1766,7 +2089,7 @@ def get_pending_order_matches(db, tx0_hash, tx1_hash):
     cursor = db.cursor()
     query = """
         SELECT * FROM (
-            SELECT *, MAX(rowid) as rowid FROM order_matches
+            SELECT *, MAX(rowid) as rowid FROM order_matches_current
             WHERE (
                 tx0_hash in (:tx0_hash, :tx1_hash) OR
                 tx1_hash in (:tx0_hash, :tx1_hash)
@@ -1785,7 +2108,7 @@ def get_pending_btc_order_matches(db, address):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid) AS rowid
-            FROM order_matches
+            FROM order_matches_current
             WHERE (tx0_address = ? AND forward_asset = ?) OR (tx1_address = ? AND backward_asset = ?)
         ) WHERE status = ?
         ORDER BY rowid
@@ -1799,7 +2122,7 @@ def get_order_match(db, id):
     cursor = db.cursor()
     query = """
         SELECT *, rowid
-        FROM order_matches
+        FROM order_matches_current
         WHERE id = ?
         ORDER BY rowid DESC LIMIT 1"""
     bindings = (id,)
@@ -1811,7 +2134,7 @@ def get_order_matches_to_expire(db, block_index):
     cursor = db.cursor()
     query = """SELECT * FROM (
         SELECT *, MAX(rowid) AS rowid
-        FROM order_matches
+        FROM order_matches_current
         WHERE match_expire_index = ? - 1
         GROUP BY id
     ) WHERE status = ?
@@ -1829,7 +2152,7 @@ def get_order(db, order_hash: str):
     """
     cursor = db.cursor()
     query = """
-        SELECT * FROM orders
+        SELECT * FROM orders_current
         WHERE tx_hash = ?
         ORDER BY rowid DESC LIMIT 1
     """
@@ -1854,7 +2177,7 @@ def get_orders_to_expire(db, block_index):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid)
-            FROM orders
+            FROM orders_current
             WHERE expire_index = ? - 1
             GROUP BY tx_hash
         ) WHERE status = ?
@@ -1870,7 +2193,7 @@ def get_open_btc_orders(db, address):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid)
-            FROM orders
+            FROM orders_current
             WHERE (source = ? AND give_asset = ?)
             GROUP BY tx_hash
         ) WHERE status = ?
@@ -1917,9 +2240,7 @@ class OrdersCache(metaclass=util.SingletonMeta):
             ],
         )
         select_orders_query = """
-            SELECT * FROM (
-                SELECT *, MAX(rowid) FROM orders GROUP BY tx_hash
-            ) WHERE status != 'expired'
+            SELECT * FROM orders_current WHERE status != 'expired'
         """
 
         with db:
@@ -1954,6 +2275,17 @@ class OrdersCache(metaclass=util.SingletonMeta):
         cursor.execute(sql, order)
         self.clean_filled_orders()
 
+    def refresh_orders(self, db, tx_hashes):
+        """Reload the given orders from the database after a rollback."""
+        cursor = db.cursor()
+        for tx_hash in tx_hashes:
+            self.cache_db.cursor().execute("DELETE FROM orders WHERE tx_hash = ?", (tx_hash,))
+            query = "SELECT * FROM orders_current WHERE tx_hash = ? AND status != 'expired'"
+            order = cursor.execute(query, (tx_hash,)).fetchone()
+            if order is not None:
+                self.insert_order(order)
+        cursor.close()
+
     def update_order(self, tx_hash, order):
         if order["status"] == "expired":
             self.cache_db.cursor().execute("DELETE FROM orders WHERE tx_hash = ?", (tx_hash,))
@@ -1995,7 +2327,7 @@ def get_matching_orders_no_cache(db, tx_hash, give_asset, get_asset):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid)
-            FROM orders
+            FROM orders_current
             WHERE (tx_hash != ? AND give_asset = ? AND get_asset = ?)
             GROUP BY tx_hash
         ) WHERE status = ?
@@ -2039,7 +2371,7 @@ def mark_order_as_filled(db, tx0_hash, tx1_hash, source=None):
     select_query = f"""
         SELECT * FROM (
             SELECT *, MAX(rowid) as rowid
-            FROM orders
+            FROM orders_current
             WHERE
                 tx_hash in (:tx0_hash, :tx1_hash)
                 {where_source}
@@ -2080,7 +2412,7 @@ def update_order_match_status(db, id, status):
 def get_fairminters_to_open(db, block_index):
     cursor = db.cursor()
     query = """
-        SELECT *, MAX(rowid) AS rowid FROM fairminters
+        SELECT *, MAX(rowid) AS rowid FROM fairminters_current
         WHERE start_block = :start_block
         GROUP BY tx_hash
         ORDER BY tx_index
@@ -2096,7 +2428,7 @@ def get_fairminters_to_close(db, block_index):
     cursor = db.cursor()
     query = """
         SELECT * FROM (
-            SELECT *, MAX(rowid) AS rowid FROM fairminters
+            SELECT *, MAX(rowid) AS rowid FROM fairminters_current
             WHERE end_block = :end_block
             GROUP BY tx_hash
         ) WHERE status != :status
@@ -2113,7 +2445,7 @@ def get_fairminters_to_close(db, block_index):
 def get_fairminter_by_asset(db, asset):
     cursor = db.cursor()
     query = """
-        SELECT * FROM fairminters
+        SELECT * FROM fairminters_current
         WHERE asset = ?
         ORDER BY rowid DESC LIMIT 1
     """
@@ -2145,7 +2477,7 @@ def get_fairminters_by_soft_cap_deadline(db, block_index):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid) AS rowid
-            FROM fairminters
+            FROM fairminters_current
             WHERE soft_cap > 0 AND soft_cap_deadline_block = :block_index
             GROUP BY tx_hash
         ) WHERE status = :status
@@ -2231,6 +2563,7 @@ def holders(db, asset, exclude_empty_holders=False):
     cursor = db.cursor()
 
     # Balances
+    # `_get_holders()` keeps the order of the first balance of each holder
 
     query = """
         SELECT *, rowid
@@ -2266,7 +2599,7 @@ def holders(db, asset, exclude_empty_holders=False):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid)
-            FROM orders
+            FROM orders_current
             WHERE give_asset = ?
             GROUP BY tx_hash
         ) WHERE status = ?
@@ -2286,7 +2619,7 @@ def holders(db, asset, exclude_empty_holders=False):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid)
-            FROM order_matches
+            FROM order_matches_current
             WHERE forward_asset = ?
             GROUP BY id
         ) WHERE status = ?
@@ -2304,7 +2637,7 @@ def holders(db, asset, exclude_empty_holders=False):
     query = """
         SELECT * FROM (
             SELECT *, MAX(rowid) AS rowid
-            FROM order_matches
+            FROM order_matches_current
             WHERE backward_asset = ?
         ) WHERE status = ?
         ORDER BY rowid
@@ -2324,7 +2657,7 @@ def holders(db, asset, exclude_empty_holders=False):
         query = """
             SELECT * FROM (
                 SELECT *, MAX(rowid)
-                FROM bets
+                FROM bets_current
                 GROUP BY tx_hash
             ) WHERE status = ?
             ORDER BY tx_index
@@ -2398,7 +2731,7 @@ def holders(db, asset, exclude_empty_holders=False):
         query = """
             SELECT * FROM (
                 SELECT *, MAX(rowid)
-                FROM dispensers
+                FROM dispensers_current
                 WHERE asset = ?
                 GROUP BY source, asset
             ) WHERE status = ?
@@ -2558,12 +2891,10 @@ def supplies(db):
 def held(db):  # TODO: Rename ?
     queries = [
         """
-        SELECT asset, SUM(quantity) AS total FROM (
-            SELECT address, asset, quantity, (address || asset) AS aa, MAX(rowid)
-            FROM balances
-            WHERE address IS NOT NULL AND utxo IS NULL
-            GROUP BY aa
-        ) GROUP BY asset
+        SELECT asset, SUM(quantity) AS total
+        FROM balances_current
+        WHERE address IS NOT NULL AND utxo IS NULL
+        GROUP BY asset
         """,
         """
         SELECT asset, SUM(quantity) AS total FROM (
@@ -2573,48 +2904,36 @@ def held(db):  # TODO: Rename ?
         ) GROUP BY asset
         """,
         """
-        SELECT asset, SUM(quantity) AS total FROM (
-            SELECT utxo, asset, quantity, (utxo || asset) AS aa, MAX(rowid)
-            FROM balances
-            WHERE address IS NULL AND utxo IS NOT NULL
-            GROUP BY aa
-        ) GROUP BY asset
+        SELECT asset, SUM(quantity) AS total
+        FROM balances_current
+        WHERE address IS NULL AND utxo IS NOT NULL
+        GROUP BY asset
         """,
         """
-        SELECT give_asset AS asset, SUM(give_remaining) AS total FROM (
-            SELECT give_asset, give_remaining, status, MAX(rowid)
-            FROM orders
-            GROUP BY tx_hash
-        ) WHERE status = 'open' GROUP BY asset
+        SELECT give_asset AS asset, SUM(give_remaining) AS total
+        FROM orders_current
+        WHERE status = 'open' GROUP BY asset
         """,
         """
-        SELECT give_asset AS asset, SUM(give_remaining) AS total FROM (
-            SELECT give_asset, give_remaining, status, MAX(rowid)
-            FROM orders
-            WHERE give_asset = 'XCP' AND get_asset = 'BTC'
-            GROUP BY tx_hash
-        ) WHERE status = 'filled' GROUP BY asset
+        SELECT give_asset AS asset, SUM(give_remaining) AS total
+        FROM orders_current
+        WHERE give_asset = 'XCP' AND get_asset = 'BTC' AND status = 'filled'
+        GROUP BY asset
         """,
         """
-        SELECT forward_asset AS asset, SUM(forward_quantity) AS total FROM (
-            SELECT forward_asset, forward_quantity, status, MAX(rowid)
-            FROM order_matches
-            GROUP BY id
-        ) WHERE status = 'pending' GROUP BY asset
+        SELECT forward_asset AS asset, SUM(forward_quantity) AS total
+        FROM order_matches_current
+        WHERE status = 'pending' GROUP BY asset
         """,
         """
-        SELECT backward_asset AS asset, SUM(backward_quantity) AS total FROM (
-            SELECT backward_asset, backward_quantity, status, MAX(rowid)
-            FROM order_matches
-            GROUP BY id
-        ) WHERE status = 'pending' GROUP BY asset
+        SELECT backward_asset AS asset, SUM(backward_quantity) AS total
+        FROM order_matches_current
+        WHERE status = 'pending' GROUP BY asset
         """,
         """
-        SELECT 'XCP' AS asset, SUM(wager_remaining) AS total FROM (
-            SELECT wager_remaining, status, MAX(rowid)
-            FROM bets
-            GROUP BY tx_hash
-        ) WHERE status = 'open'
+        SELECT 'XCP' AS asset, SUM(wager_remaining) AS total
+        FROM bets_current
+        WHERE status = 'open'
         """,
         """
         SELECT 'XCP' AS asset, SUM(forward_quantity) AS total FROM (
@@ -2645,11 +2964,9 @@ def held(db):  # TODO: Rename ?
         ) WHERE status IN ('pending', 'pending and resolved', 'resolved and pending')
         """,
         """
-        SELECT asset, SUM(give_remaining) AS total FROM (
-            SELECT asset, give_remaining, status, MAX(rowid)
-            FROM dispensers
-            GROUP BY tx_hash
-        ) WHERE status IN (0, 1, 11) GROUP BY asset
+        SELECT asset, SUM(give_remaining) AS total
+        FROM dispensers_current
+        WHERE status IN (0, 1, 11) GROUP BY asset
         """,
     ]
     # no sql injection here
@@ -2668,3 +2985,88 @@ def held(db):  # TODO: Rename ?
         held[asset] = total
 
     return held
+
+
+def supply_contributions(table_name, record):
+    """Return the `(asset, quantity)` pairs a record adds to `supplies()`."""
+    if record is None or record.get("status") != "valid":
+        return []
+    if table_name == "issuances":
+        return [
+            (record["asset"], record.get("quantity") or 0),
+            (config.XCP, -(record.get("fee_paid") or 0)),
+        ]
+    if table_name == "destructions":
+        return [(record["asset"], -(record.get("quantity") or 0))]
+    if table_name in ["dividends", "sweeps"]:
+        return [(config.XCP, -(record.get("fee_paid") or 0))]
+    if table_name == "burns":
+        return [(config.XCP, record.get("earned") or 0)]
+    return []
+
+
+def escrow_contributions(table_name, record):
+    """Return the `(asset, quantity)` pairs a record adds to `held()`, balances excepted."""
+    if record is None:
+        return []
+    status = record.get("status")
+    if table_name == "orders":
+        if status == "open" or (
+            status == "filled"
+            and record["give_asset"] == config.XCP
+            and record["get_asset"] == config.BTC
+        ):
+            return [(record["give_asset"], record["give_remaining"] or 0)]
+    elif table_name == "order_matches":
+        if status == "pending":
+            return [
+                (record["forward_asset"], record["forward_quantity"] or 0),
+                (record["backward_asset"], record["backward_quantity"] or 0),
+            ]
+    elif table_name == "bets":
+        if status == "open":
+            return [(config.XCP, record["wager_remaining"] or 0)]
+    elif table_name == "bet_matches":
+        if status == "pending":
+            return [
+                (config.XCP, (record["forward_quantity"] or 0) + (record["backward_quantity"] or 0))
+            ]
+    elif table_name == "rps":
+        if status == "open":
+            return [(config.XCP, record["wager"] or 0)]
+    elif table_name == "rps_matches":
+        if status in ["pending", "pending and resolved", "resolved and pending"]:
+            return [(config.XCP, (record["wager"] or 0) * 2)]
+    elif table_name == "dispensers":
+        if status in [0, 1, 11]:
+            return [(record["asset"], record["give_remaining"] or 0)]
+    return []
+
+
+def add_asset_deltas(deltas, contributions, sign=1):
+    for asset, quantity in contributions:
+        deltas[asset] = deltas.get(asset, 0) + sign * quantity
+
+
+def track_asset_conservation(table_name, old_record, new_record):
+    """Add the supply and held changes from `old_record` to `new_record` to the block deltas."""
+    if util.PARSING_MEMPOOL or not config.CHECK_ASSET_CONSERVATION:
+        return
+    add_asset_deltas(BLOCK_SUPPLY_DELTAS, supply_contributions(table_name, new_record))
+    add_asset_deltas(BLOCK_SUPPLY_DELTAS, supply_contributions(table_name, old_record), -1)
+    add_asset_deltas(BLOCK_HELD_DELTAS, escrow_contributions(table_name, new_record))
+    add_asset_deltas(BLOCK_HELD_DELTAS, escrow_contributions(table_name, old_record), -1)
+
+
+def track_held_delta(asset, quantity):
+    if util.PARSING_MEMPOOL or not config.CHECK_ASSET_CONSERVATION or quantity == 0:
+        return
+    BLOCK_HELD_DELTAS[asset] = BLOCK_HELD_DELTAS.get(asset, 0) + quantity
+
+
+def track_balance_held_delta(address, utxo, asset, balance, old_balance):
+    # like `held()`, every balance without address nor utxo is counted, not only the last one
+    if address is None and utxo is None:
+        track_held_delta(asset, balance)
+    else:
+        track_held_delta(asset, balance - old_balance)
@@ -14,7 +14,8 @@ def parse_mempool_transactions(db, raw_tx_list, timestamps=None):
     transaction_events = []
     cursor = db.cursor()
     try:
-        with db:
+        # events are published even though the fake block is rolled back
+        with ledger.buffered_journal(db, rollback_error=exceptions.MempoolError), db:
             # insert fake block
             cursor.execute(
                 """INSERT INTO blocks(
@@ -43,6 +44,8 @@ def parse_mempool_transactions(db, raw_tx_list, timestamps=None):
             decoded_tx_count = 0
             for raw_tx in raw_tx_list:
                 decoded_tx = deserialize.deserialize_tx(raw_tx, use_txid=True)
+                # the next mempool transactions can spend its outputs
+                backend.bitcoind.PrevoutsCache().add_transaction(decoded_tx)
                 existing_tx = ledger.get_transaction(db, decoded_tx["tx_hash"])
                 if existing_tx:
                     logger.trace(f"Transaction {decoded_tx['tx_hash']} already in the database")
@@ -78,6 +81,8 @@ def parse_mempool_transactions(db, raw_tx_list, timestamps=None):
             # we raise an exception to rollback the transaction
             raise exceptions.MempoolError("Mempool transaction parsed successfully")
     except exceptions.MempoolError:
+        # messages generated by the fake block have been rolled back
+        ledger.reset_journal_head(db)
         # save events in the mempool table
         for event in transaction_events:
             if timestamps:
@@ -112,7 +117,6 @@ def clean_mempool(db):
 def parse_raw_mempool(db):
     logger.debug("Parsing raw mempool...")
     raw_mempool = backend.bitcoind.getrawmempool(verbose=True)
-    raw_tx_list = []
     timestamps = {}
     cursor = db.cursor()
     for txid, tx_info in raw_mempool.items():
@@ -121,13 +125,8 @@ def parse_raw_mempool(db):
         ).fetchone()
         if existing_tx_in_mempool:
             continue
-        try:
-            raw_tx = backend.bitcoind.getrawtransaction(txid)
-            raw_tx_list.append(raw_tx)
-            timestamps[txid] = tx_info["time"]
-        except exceptions.BitcoindRPCError as e:
-            if "No such mempool or blockchain transaction" in str(e):
-                pass
-            else:
-                raise e
+        timestamps[txid] = tx_info["time"]
+    # the transactions removed from the mempool since `getrawmempool` are skipped
+    raw_transactions = backend.bitcoind.getrawtransaction_batch(list(timestamps))
+    raw_tx_list = [raw_transactions[txid] for txid in timestamps if txid in raw_transactions]
     parse_mempool_transactions(db, raw_tx_list, timestamps)
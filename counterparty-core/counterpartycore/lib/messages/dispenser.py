@@ -849,6 +849,14 @@ class DispensableCache(metaclass=util.SingletonMeta):
     def new_dispensable(self, source):
         self.dispensable[source] = True
 
+    def refresh_sources(self, db, sources):
+        """Reload the given sources from the database after a rollback."""
+        for source in sources:
+            if ledger.has_dispensers(db, source):
+                self.dispensable[source] = True
+            else:
+                self.dispensable.pop(source, None)
+
 
 def is_dispensable(db, address, amount):
     if address is None:
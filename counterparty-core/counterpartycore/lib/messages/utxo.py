@@ -93,7 +93,10 @@ def compose(
     if problems and not skip_validation:
         raise exceptions.ComposeError(problems)
 
-    # we make an RPC call only at the time of composition
+    # we make RPC calls only at the time of composition, in one batch
+    backend.bitcoind.fill_utxos_cache(
+        [utxo for utxo in [source, destination] if utxo and util.is_utxo_format(utxo)]
+    )
     if (
         destination
         and util.is_utxo_format(destination)
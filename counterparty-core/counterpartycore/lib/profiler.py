@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from counterpartycore.lib import config, util
+
+logger = logging.getLogger(config.LOGGER_NAME)
+
+# minimum number of seconds between two writes of `config.PROFILE_FILE`
+SAVE_INTERVAL = 10
+# `profile()` names of the block phases, the other names are message types
+BLOCK_PHASES = [
+    "parse_block",
+    "expire",
+    "close_pending",
+    "fairminter.before_block",
+    "parse_transactions",
+    "fairminter.after_block",
+    # only with `--check-asset-conservation`
+    "check_asset_conservation",
+    "consensus_hashes",
+    "flush_journal",
+]
+PROFILE_FIELDS = ["count", "duration", "sql_statements", "rows_written"]
+
+ENABLED = False
+PROFILE = {}
+SQL_STATEMENTS = 0
+LAST_SAVE = 0
+
+
+def count_statement(cursor, sql, bindings):
+    global SQL_STATEMENTS  # noqa: PLW0603
+    SQL_STATEMENTS += 1
+    return True
+
+
+def enable(db):
+    """Start recording the parsing of the blocks on `db`."""
+    global ENABLED, PROFILE, SQL_STATEMENTS  # noqa: PLW0603
+    logger.info(f"Parse profiler enabled, results in {config.PROFILE_FILE}")
+    ENABLED = True
+    PROFILE = {}
+    SQL_STATEMENTS = 0
+    db.exec_trace = count_statement
+
+
+def disable(db):
+    global ENABLED  # noqa: PLW0603
+    ENABLED = False
+    db.exec_trace = None
+
+
+@contextmanager
+def profile(db, name):
+    """Add the wall time, SQL statements and rows written inside the context to the `name` entry."""
+    # the mempool is parsed with the same functions
+    if not ENABLED or util.PARSING_MEMPOOL:
+        yield
+        return
+    start_time = time.time()
+    start_statements = SQL_STATEMENTS
+    start_changes = db.total_changes()
+    try:
+        yield
+    finally:
+        entry = PROFILE.setdefault(name, {field: 0 for field in PROFILE_FIELDS})
+        entry["count"] += 1
+        entry["duration"] += time.time() - start_time
+        entry["sql_statements"] += SQL_STATEMENTS - start_statements
+        entry["rows_written"] += db.total_changes() - start_changes
+
+
+def get_profile_dict(profile):
+    result = {"block_count": 0, "phases": {}, "messages": {}}
+    for name, entry in sorted(profile.items()):
+        if name in BLOCK_PHASES:
+            result["phases"][name] = entry
+        else:
+            result["messages"][name] = entry
+    if "parse_block" in profile:
+        result["block_count"] = profile["parse_block"]["count"]
+    return result
+
+
+def save(force=False):
+    """Write the profile for `show-profile` and the API, at most every `SAVE_INTERVAL` seconds."""
+    global LAST_SAVE  # noqa: PLW0603
+    if not ENABLED or (not force and time.time() - LAST_SAVE < SAVE_INTERVAL):
+        return
+    temp_file = f"{config.PROFILE_FILE}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(PROFILE, f)
+    os.replace(temp_file, config.PROFILE_FILE)
+    LAST_SAVE = time.time()
+
+
+def load():
+    if not os.path.exists(config.PROFILE_FILE):
+        return {}
+    with open(config.PROFILE_FILE, "r") as f:
+        return json.load(f)
+
+
+def to_prometheus(profile):
+    metrics = [
+        ("count", "calls_total", "Number of calls"),
+        ("duration", "duration_seconds_total", "Wall time in seconds"),
+        ("sql_statements", "sql_statements_total", "Number of SQL statements executed"),
+        ("rows_written", "rows_written_total", "Number of rows inserted, updated or deleted"),
+    ]
+    lines = [
+        "# HELP counterparty_parse_blocks_total Number of blocks parsed",
+        "# TYPE counterparty_parse_blocks_total counter",
+        f"counterparty_parse_blocks_total {profile['block_count']}",
+    ]
+    for field, metric_suffix, description in metrics:
+        metric_name = f"counterparty_parse_{metric_suffix}"
+        lines.append(f"# HELP {metric_name} {description}, by block phase or message type")
+        lines.append(f"# TYPE {metric_name} counter")
+        for kind in ["phases", "messages"]:
+            for name, entry in profile[kind].items():
+                lines.append(f'{metric_name}{{kind="{kind}",name="{name}"}} {entry[field]}')
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusText(str):
+    """Returned by `get_profile()` to be served as plain text."""
+
+
+def get_profile(format: str = "json"):
+    """
+    Returns the time spent, the SQL statements executed and the rows written while parsing the blocks, by block phase and by message type (the node must be started with `--profile`)
+    :param str format: The format of the profile, `json` or `prometheus` (e.g. json)
+    """
+    profile = get_profile_dict(load())
+    if format == "prometheus":
+        return PrometheusText(to_prometheus(profile))
+    return profile
@@ -0,0 +1,132 @@
+import logging
+import os
+import time
+
+import apsw
+
+from counterpartycore.lib import config, database
+
+logger = logging.getLogger(config.LOGGER_NAME)
+
+# number of snapshots kept in `config.SNAPSHOTS_DIR`
+SNAPSHOTS_TO_KEEP = 3
+# tables kept when a snapshot is restored, in foreign keys order
+BLOCKS_TABLES = ["blocks", "transactions", "transaction_outputs"]
+
+
+def get_snapshot_path(block_index):
+    return os.path.join(config.SNAPSHOTS_DIR, f"{block_index}.db")
+
+
+def get_snapshots():
+    """Return the block indexes of the available snapshots, oldest first."""
+    if not os.path.isdir(config.SNAPSHOTS_DIR):
+        return []
+    block_indexes = []
+    for filename in os.listdir(config.SNAPSHOTS_DIR):
+        name, extension = os.path.splitext(filename)
+        if extension == ".db" and name.isdigit():
+            block_indexes.append(int(name))
+    return sorted(block_indexes)
+
+
+def get_nearest_snapshot(block_index):
+    """Return the last snapshot taken before `block_index` or `None`."""
+    snapshots = [snapshot for snapshot in get_snapshots() if snapshot < block_index]
+    if len(snapshots) == 0:
+        return None
+    return snapshots[-1]
+
+
+def remove_snapshot(block_index):
+    logger.debug(f"Removing snapshot of Block {block_index}...")
+    os.remove(get_snapshot_path(block_index))
+
+
+def remove_from(block_index):
+    """Remove the snapshots invalidated by a rollback or a reparse from `block_index`."""
+    for snapshot in get_snapshots():
+        if snapshot >= block_index:
+            remove_snapshot(snapshot)
+
+
+def backup(source_db, destination_db):
+    with destination_db.backup("main", source_db, "main") as db_backup:
+        while not db_backup.done:
+            db_backup.step(10000)
+
+
+def take_snapshot(db, block_index, last_block_index=None):
+    """
+    Copy the database after the commit of `block_index` if the snapshot interval is reached.
+    The copy is made page by page with the SQLite backup API. While catching up to
+    `last_block_index`, the snapshots that would be removed before reaching it are skipped.
+    """
+    if not config.SNAPSHOT_INTERVAL or block_index % config.SNAPSHOT_INTERVAL != 0:
+        return
+    if (
+        last_block_index is not None
+        and last_block_index - block_index >= config.SNAPSHOT_INTERVAL * SNAPSHOTS_TO_KEEP
+    ):
+        return
+    start_time = time.time()
+    os.makedirs(config.SNAPSHOTS_DIR, exist_ok=True)
+    snapshot_path = get_snapshot_path(block_index)
+    temp_path = f"{snapshot_path}.tmp"
+    snapshot_db = apsw.Connection(temp_path)
+    backup(db, snapshot_db)
+    snapshot_db.close()
+    # never leave a partial snapshot
+    os.replace(temp_path, snapshot_path)
+    for snapshot in get_snapshots()[:-SNAPSHOTS_TO_KEEP]:
+        remove_snapshot(snapshot)
+    logger.info(f"Snapshot of Block {block_index} taken in {time.time() - start_time:.2f}s")
+
+
+def restore_snapshot(db, block_index):
+    """
+    Replace the database with the snapshot of `block_index`. The blocks and
+    transactions after the snapshot are kept so they can be replayed, they replace the
+    ones already in a snapshot taken while replaying blocks.
+    """
+    start_time = time.time()
+    kept_blocks_path = os.path.join(config.SNAPSHOTS_DIR, "kept_blocks.db")
+    if os.path.exists(kept_blocks_path):
+        os.remove(kept_blocks_path)
+
+    cursor = db.cursor()
+    kept_fields = {table: database.get_table_fields(cursor, table) for table in BLOCKS_TABLES}
+    cursor.execute("ATTACH DATABASE ? AS kept_blocks", (kept_blocks_path,))
+    for table in BLOCKS_TABLES:
+        # internal function, no sql injection here
+        cursor.execute(
+            f"CREATE TABLE kept_blocks.{table} AS SELECT * FROM main.{table} WHERE block_index > ?",  # nosec B608  # noqa: S608
+            (block_index,),
+        )
+    cursor.execute("DETACH DATABASE kept_blocks")
+    # the backup API needs all the cursors to be closed
+    cursor.close()
+
+    snapshot_db = apsw.Connection(get_snapshot_path(block_index))
+    backup(snapshot_db, db)
+    snapshot_db.close()
+
+    cursor = db.cursor()
+    cursor.execute("ATTACH DATABASE ? AS kept_blocks", (kept_blocks_path,))
+    with db:
+        for table in reversed(BLOCKS_TABLES):
+            cursor.execute(
+                f"DELETE FROM main.{table} WHERE block_index > ?",  # nosec B608  # noqa: S608
+                (block_index,),
+            )
+        for table in BLOCKS_TABLES:
+            # the snapshot can be older than the last migrations
+            snapshot_fields = database.get_table_fields(cursor, table)
+            fields = ", ".join([field for field in kept_fields[table] if field in snapshot_fields])
+            cursor.execute(
+                f"INSERT INTO main.{table} ({fields}) SELECT {fields} FROM kept_blocks.{table}"  # nosec B608  # noqa: S608
+            )
+    cursor.execute("DETACH DATABASE kept_blocks")
+    cursor.close()
+    os.remove(kept_blocks_path)
+    logger.info(f"Snapshot of Block {block_index} restored in {time.time() - start_time:.2f}s")
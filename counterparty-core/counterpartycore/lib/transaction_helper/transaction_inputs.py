@@ -170,6 +170,8 @@ def sort_unspent_txouts(unspent, dust_size=config.DEFAULT_REGULAR_DUST_SIZE):
 
 def prepare_inputs_set(inputs_set):
     new_inputs_set = []
+    # inputs without amount, a UTXO can be given more than once
+    missing_amounts = []
     utxos_list = inputs_set.split(",")
     if len(utxos_list) > MAX_INPUTS_SET:
         raise exceptions.ComposeError(
@@ -196,12 +198,6 @@ def prepare_inputs_set(inputs_set):
 
         txid, vout = str_input_split[0], int(str_input_split[1])
 
-        if amount is None:
-            try:
-                amount = backend.bitcoind.get_tx_out_amount(txid, vout)
-            except Exception as e:
-                raise exceptions.ComposeError(f"invalid UTXO: {str_input}") from e
-
         new_input = {
             "txid": txid,
             "vout": vout,
@@ -209,7 +205,26 @@ def prepare_inputs_set(inputs_set):
         }
         if script_pub_key is not None:
             new_input["script_pub_key"] = script_pub_key
+        if amount is None:
+            missing_amounts.append((str_input, new_input))
         new_inputs_set.append(new_input)
+
+    if len(missing_amounts) > 0:
+        # one batch of RPC calls for all the inputs
+        try:
+            amounts = backend.bitcoind.get_tx_outs_amount(
+                [
+                    (new_input["txid"], new_input["vout"])
+                    for _str_input, new_input in missing_amounts
+                ]
+            )
+        except Exception as e:
+            raise exceptions.ComposeError(f"invalid UTXO: {inputs_set}") from e
+        for str_input, new_input in missing_amounts:
+            output = (new_input["txid"], new_input["vout"])
+            if output not in amounts:
+                raise exceptions.ComposeError(f"invalid UTXO: {str_input}")
+            new_input["amount"] = amounts[output]
     return new_inputs_set
 
 
@@ -0,0 +1,95 @@
+import json
+import logging
+
+from counterpartycore.lib import config
+
+logger = logging.getLogger(config.LOGGER_NAME)
+
+# number of blocks that can be rolled back with the undo log
+UNDO_LOG_DEPTH = 1000
+
+
+def initialise(db):
+    """
+    The messages tables are insert-only so, after each block, saving the last rowid
+    of each table is enough to find the rows to delete to roll back the next blocks.
+    """
+    cursor = db.cursor()
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS undo_log(
+                      block_index INTEGER PRIMARY KEY,
+                      last_rowids TEXT)
+                   """
+    )
+    cursor.close()
+
+
+def get_last_rowids(db, tables):
+    # internal function, no sql injection here
+    fields = ", ".join(
+        [f"(SELECT IFNULL(MAX(rowid), 0) FROM {table}) AS {table}" for table in tables]  # noqa: S608
+    )
+    cursor = db.cursor()
+    last_rowids = cursor.execute(f"SELECT {fields}").fetchone()  # nosec B608  # noqa: S608
+    cursor.close()
+    return last_rowids
+
+
+def save_block(db, block_index, tables):
+    cursor = db.cursor()
+    cursor.execute(
+        "INSERT OR REPLACE INTO undo_log (block_index, last_rowids) VALUES (?, ?)",
+        (block_index, json.dumps(get_last_rowids(db, tables))),
+    )
+    cursor.execute("DELETE FROM undo_log WHERE block_index <= ?", (block_index - UNDO_LOG_DEPTH,))
+    cursor.close()
+
+
+def get_undo_rowids(db, block_index):
+    """Return the last rowid of each table before `block_index` or `None` if unknown."""
+    cursor = db.cursor()
+    undo_log = cursor.execute(
+        "SELECT last_rowids FROM undo_log WHERE block_index = ?", (block_index - 1,)
+    ).fetchone()
+    cursor.close()
+    if undo_log is None:
+        return None
+    return json.loads(undo_log["last_rowids"])
+
+
+def is_valid_undo_rowid(cursor, table, block_index, undo_rowid):
+    # internal function, no sql injection here
+    last_row = cursor.execute(
+        f"SELECT IFNULL(block_index, 0) AS block_index FROM {table} WHERE rowid = ?",  # nosec B608  # noqa: S608
+        (undo_rowid,),
+    ).fetchone()
+    if undo_rowid > 0 and (last_row is None or last_row["block_index"] >= block_index):
+        return False
+    first_block_index = cursor.execute(
+        f"SELECT MIN(block_index) AS block_index FROM {table} WHERE rowid > ?",  # nosec B608  # noqa: S608
+        (undo_rowid,),
+    ).fetchone()["block_index"]
+    return first_block_index is None or first_block_index >= block_index
+
+
+def get_rows_from(cursor, table, block_index, fields, undo_rowid=None):
+    """Return the rows of `table` that would be deleted by `clean_table_from()`."""
+    # internal function, no sql injection here
+    if undo_rowid is not None:
+        where, bindings = "rowid > ?", (undo_rowid,)
+    else:
+        where, bindings = "block_index >= ?", (block_index,)
+    query = f"SELECT {', '.join(fields)} FROM {table} WHERE {where}"  # nosec B608  # noqa: S608
+    return cursor.execute(query, bindings).fetchall()
+
+
+def clean_table_from(cursor, table, undo_rowid):
+    logger.debug(f"Rolling back table `{table}` from rowid {undo_rowid + 1}...")
+    # internal function, no sql injection here
+    cursor.execute(f"""DELETE FROM {table} WHERE rowid > ?""", (undo_rowid,))  # nosec B608  # noqa: S608
+
+
+def clean_from(db, block_index):
+    cursor = db.cursor()
+    cursor.execute("DELETE FROM undo_log WHERE block_index >= ?", (block_index,))
+    cursor.close()
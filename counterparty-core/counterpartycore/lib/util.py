@@ -447,6 +447,23 @@ def dhash_string(text):
     return binascii.hexlify(dhash(text)).decode()
 
 
+class DoubleHasher:
+    """
+    Compute `dhash_string()` of a text given piece by piece, without
+    building the whole text.
+    """
+
+    def __init__(self, text=""):
+        self.sha256 = hashlib.sha256()
+        self.update(text)
+
+    def update(self, text):
+        self.sha256.update(bytes(text, "utf-8"))
+
+    def hexdigest(self):
+        return binascii.hexlify(hashlib.sha256(self.sha256.digest()).digest()).decode()
+
+
 # Why on Earth does `binascii.hexlify()` return bytes?!
 def hexlify(x):
     """Return the hexadecimal representation of the binary data. Decode from ASCII to UTF-8."""
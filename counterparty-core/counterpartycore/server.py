@@ -3,6 +3,7 @@
 import _thread
 import binascii
 import decimal
+import json
 import logging
 import os
 import signal
@@ -26,7 +27,9 @@ from counterpartycore.lib import (
     database,
     exceptions,
     follow,
+    ledger,
     log,
+    profiler,
     util,
 )
 from counterpartycore.lib.api import api_server as api_v2
@@ -140,6 +143,8 @@ def initialise_config(
     testcoin=False,
     regtest=False,
     api_limit_rows=1000,
+    api_max_result_count=config.DEFAULT_API_MAX_RESULT_COUNT,
+    api_max_offset=config.DEFAULT_API_MAX_OFFSET,
     backend_connect=None,
     backend_port=None,
     backend_user=None,
@@ -175,6 +180,12 @@ def initialise_config(
     enable_zmq_publisher=False,
     zmq_publisher_port=None,
     db_connection_pool_size=config.DEFAULT_DB_CONNECTION_POOL_SIZE,
+    decoding_workers=config.DEFAULT_DECODING_WORKERS,
+    snapshot_interval=config.DEFAULT_SNAPSHOT_INTERVAL,
+    api_watcher_batch_size=config.DEFAULT_API_WATCHER_BATCH_SIZE,
+    api_watcher_rollback_depth=config.DEFAULT_API_WATCHER_ROLLBACK_DEPTH,
+    api_cache_size=config.DEFAULT_API_CACHE_SIZE,
+    profile=False,
     wsgi_server=None,
     waitress_threads=None,
     gunicorn_workers=None,
@@ -246,7 +257,15 @@ def initialise_config(
     )
 
     config.API_DATABASE = config.DATABASE.replace(".db", ".api.db")
+    config.SNAPSHOTS_DIR = config.DATABASE.replace(".db", ".snapshots")
+    config.PROFILE_FILE = config.DATABASE.replace(".db", ".profile.json")
+    config.API_CACHE_FILE = config.DATABASE.replace(".db", ".api.cache.db")
+    config.BACKEND_RAW_TRANSACTIONS_CACHE_FILE = config.DATABASE.replace(
+        ".db", ".rawtransactions.cache.db"
+    )
     config.API_LIMIT_ROWS = api_limit_rows
+    config.API_MAX_RESULT_COUNT = api_max_result_count
+    config.API_MAX_OFFSET = api_max_offset
 
     ##############
     # THINGS WE CONNECT TO
@@ -604,6 +623,12 @@ def initialise_config(
     config.NO_TELEMETRY = no_telemetry
 
     config.DB_CONNECTION_POOL_SIZE = db_connection_pool_size
+    config.DECODING_WORKERS = decoding_workers
+    config.SNAPSHOT_INTERVAL = snapshot_interval
+    config.API_WATCHER_BATCH_SIZE = api_watcher_batch_size
+    config.API_WATCHER_ROLLBACK_DEPTH = api_watcher_rollback_depth
+    config.API_CACHE_SIZE = api_cache_size
+    config.PROFILE = profile
     config.WSGI_SERVER = wsgi_server
     config.WAITRESS_THREADS = waitress_threads
     config.GUNICORN_THREADS_PER_WORKER = gunicorn_threads_per_worker
@@ -619,6 +644,8 @@ def initialise_log_and_config(args, api=False):
         "regtest": args.regtest,
         "customnet": args.customnet,
         "api_limit_rows": args.api_limit_rows,
+        "api_max_result_count": args.api_max_result_count,
+        "api_max_offset": args.api_max_offset,
         "backend_connect": args.backend_connect,
         "backend_port": args.backend_port,
         "backend_user": args.backend_user,
@@ -650,6 +677,12 @@ def initialise_log_and_config(args, api=False):
         "enable_zmq_publisher": args.enable_zmq_publisher,
         "zmq_publisher_port": args.zmq_publisher_port,
         "db_connection_pool_size": args.db_connection_pool_size,
+        "decoding_workers": args.decoding_workers,
+        "snapshot_interval": args.snapshot_interval,
+        "api_watcher_batch_size": args.api_watcher_batch_size,
+        "api_watcher_rollback_depth": args.api_watcher_rollback_depth,
+        "api_cache_size": args.api_cache_size,
+        "profile": args.profile,
         "wsgi_server": args.wsgi_server,
         "waitress_threads": args.waitress_threads,
         "gunicorn_workers": args.gunicorn_workers,
@@ -757,6 +790,8 @@ def start_all(args):
         blocks.initialise(db)
         blocks.check_database_version(db)
         database.optimize(db)
+        if config.PROFILE:
+            profiler.enable(db)
 
         # Check software version
         check.software_version()
@@ -764,6 +799,7 @@ def start_all(args):
         # API Server v2
         api_server_v2 = api_v2.APIServer()
         api_server_v2.start(args)
+        ledger.EVENT_FEED = api_server_v2.event_feed
         while not api_server_v2.is_ready() and not api_server_v2.has_stopped():
             logger.trace("Waiting for API server to start...")
             time.sleep(0.1)
@@ -853,6 +889,8 @@ def start_all(args):
 def reparse(block_index):
     backend.addrindexrs.init()
     db = database.initialise_db()
+    if config.PROFILE:
+        profiler.enable(db)
     try:
         blocks.reparse(db, block_index=block_index)
     finally:
@@ -900,6 +938,14 @@ def show_params():
             print(f"{k}: {output[k]}")
 
 
+def show_profile(output_format="json"):
+    profile = profiler.get_profile(output_format)
+    if output_format == "json":
+        print(json.dumps(profile, indent=4))
+    else:
+        print(profile, end="")
+
+
 def generate_move_random_hash(move):
     move = int(move).to_bytes(2, byteorder="big")
     random_bin = os.urandom(16)
@@ -0,0 +1,125 @@
+#! /usr/bin/python3
+import concurrent.futures
+import json
+import socketserver
+import threading
+import time
+
+import pytest
+
+from counterpartycore.lib.backend import addrindexrs
+
+
+class StubAddrindexrsHandler(socketserver.StreamRequestHandler):
+    # answers the requests by pairs in the reverse order, split in small chunks
+    def handle(self):
+        requests = []
+        for line in self.rfile:
+            requests.append(json.loads(line))
+            self.server.requests_received += 1
+            if len(requests) < 2:
+                continue
+            for request in reversed(requests):
+                self.server.requests_in_flight = max(self.server.requests_in_flight, len(requests))
+                response = json.dumps(self.response(request)) + "\n"
+                for i in range(0, len(response), 7):
+                    self.wfile.write(response[i : i + 7].encode("utf8"))
+                    self.wfile.flush()
+            requests = []
+
+    def response(self, request):
+        if request["params"][0] == "empty":
+            return {"id": request["id"], "error": "no txs for address"}
+        return {"id": request["id"], "result": [request["params"][0]] * 1000}
+
+
+class StubAddrindexrsServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    requests_in_flight = 0
+    requests_received = 0
+
+
+@pytest.fixture()
+def addrindexrs_server():
+    server = StubAddrindexrsServer(("127.0.0.1", 0), StubAddrindexrsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_pipelined_requests(addrindexrs_server):
+    client = addrindexrs.AddrIndexRsClient("127.0.0.1", addrindexrs_server.server_address[1])
+    client.start()
+    try:
+        params = [f"address{i}" for i in range(20)] + ["empty"] * 2
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(params)) as executor:
+            responses = list(
+                executor.map(
+                    lambda param: client.send({"method": "test", "params": [param]}), params
+                )
+            )
+    finally:
+        client.stop()
+
+    # the second request of each pair is sent before the response of the first one
+    assert addrindexrs_server.requests_in_flight == 2
+    for param, response in zip(params, responses):
+        if param == "empty":
+            assert response == {}
+        else:
+            assert response["result"] == [param] * 1000
+    assert client.pending == {}
+
+
+def test_lost_connection(addrindexrs_server):
+    client = addrindexrs.AddrIndexRsClient(
+        "127.0.0.1", addrindexrs_server.server_address[1], timeout=5, backoff_start=0.1
+    )
+    client.start()
+    try:
+        errors = []
+
+        def send_alone():
+            # never answered, the server waits for a second request
+            try:
+                client.send({"method": "test", "params": ["address"]})
+            except addrindexrs.AddrIndexRsClientError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=send_alone)
+        thread.start()
+        while addrindexrs_server.requests_received == 0:
+            time.sleep(0.01)
+        client.socket_manager.shutdown()
+        thread.join()
+        assert len(errors) == 1
+
+        # reconnected
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(
+                executor.map(
+                    lambda param: client.send({"method": "test", "params": [param]}),
+                    ["address1", "address2"],
+                )
+            )
+        assert [response["result"][0] for response in responses] == ["address1", "address2"]
+    finally:
+        client.stop()
+
+
+def test_read_message():
+    class ChunkedSocket:
+        def __init__(self, data):
+            self.chunks = [data[i : i + 3] for i in range(0, len(data), 3)]
+
+        def recv(self, buffer_size):
+            return self.chunks.pop(0) if self.chunks else b""
+
+    sock = ChunkedSocket(b'{"id": 0, "result": "a"}\n{"id": 1, "result": "b"}\n{"id"')
+    buffer = bytearray()
+    assert addrindexrs.read_message(sock, buffer) == {"id": 0, "result": "a"}
+    assert addrindexrs.read_message(sock, buffer) == {"id": 1, "result": "b"}
+    with pytest.raises(ConnectionAbortedError):
+        addrindexrs.read_message(sock, buffer)
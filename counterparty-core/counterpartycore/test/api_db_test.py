@@ -1,8 +1,12 @@
+import itertools
 import tempfile
+import threading
+import time
 
 import pytest
 
-from counterpartycore.lib import config, database
+from counterpartycore.lib import config, database, exceptions, ledger, snapshots, util
+from counterpartycore.lib.api import api_watcher, cache
 from counterpartycore.test.util_test import CURR_DIR
 
 FIXTURE_SQL_FILE = CURR_DIR + "/fixtures/scenarios/unittest_fixture.sql"
@@ -98,3 +102,274 @@ def test_api_database():
     assert len(ledger_assets_info) == len(api_assets_info)
     for ledger_asset_info, api_asset_info in zip(ledger_assets_info, api_assets_info):
         assert ledger_asset_info["asset_name"] == api_asset_info["asset"]
+
+
+def build_api_database(batch_size):
+    watcher = api_watcher.APIWatcher()
+    if batch_size is None:
+        # one transaction per event
+        event = api_watcher.get_next_event_to_parse(watcher.api_db, watcher.ledger_db)
+        while event is not None:
+            api_watcher.parse_event(watcher.api_db, event, watcher)
+            event = api_watcher.get_next_event_to_parse(watcher.api_db, watcher.ledger_db)
+    else:
+        config.API_WATCHER_BATCH_SIZE = batch_size
+        api_watcher.catch_up(watcher.api_db, watcher.ledger_db, watcher)
+    tables = get_api_tables(watcher.api_db)
+    watcher.api_db.close()
+    watcher.ledger_db.close()
+    return tables
+
+
+def get_api_tables(api_db):
+    tables = {}
+    for table in api_db.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE '%yoyo%'"
+    ).fetchall():
+        tables[table["name"]] = api_db.execute(
+            f"SELECT rowid, * FROM {table['name']} ORDER BY rowid"  # noqa: S608
+        ).fetchall()
+    return tables
+
+
+@pytest.mark.usefixtures("cp_server")
+def test_batched_catch_up(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "API_WATCHER_BATCH_SIZE", config.API_WATCHER_BATCH_SIZE)
+    api_tables = []
+    for batch_size in [None, 1, 500, 100000]:
+        monkeypatch.setattr(config, "API_DATABASE", str(tmp_path / f"api.{batch_size}.db"))
+        api_tables.append(build_api_database(batch_size))
+
+    assert len(api_tables[0]["messages"]) > 1000
+    for tables in api_tables[1:]:
+        assert tables == api_tables[0]
+
+
+@pytest.mark.usefixtures("cp_server")
+@pytest.mark.parametrize("rollback_depth", [config.DEFAULT_API_WATCHER_ROLLBACK_DEPTH, 0])
+def test_rollback_events(monkeypatch, tmp_path, rollback_depth):
+    monkeypatch.setattr(config, "API_WATCHER_ROLLBACK_DEPTH", rollback_depth)
+    monkeypatch.setattr(config, "API_DATABASE", str(tmp_path / "api.db"))
+    watcher = api_watcher.APIWatcher()
+    # roll back the last 20 updates
+    rollback_block_index = watcher.ledger_db.execute(
+        """
+        SELECT MIN(block_index) AS block_index FROM (
+            SELECT block_index FROM messages WHERE command = 'update'
+            ORDER BY message_index DESC LIMIT 20
+        )
+        """
+    ).fetchone()["block_index"]
+    events = api_watcher.get_events_to_parse(watcher.ledger_db, -1, 1000)
+    events_before = itertools.takewhile(
+        lambda event: event["block_index"] < rollback_block_index, events
+    )
+    while api_watcher.parse_events_batch(watcher.api_db, events_before, 1, watcher.stop_event):
+        pass
+    tables_before = get_api_tables(watcher.api_db)
+    api_watcher.catch_up(watcher.api_db, watcher.ledger_db, watcher)
+
+    if rollback_depth == 0:
+        # too deep, nothing is rolled back
+        tables_before = get_api_tables(watcher.api_db)
+        with pytest.raises(exceptions.APIWatcherError, match="Unable to roll back"):
+            api_watcher.rollback_events(watcher.api_db, rollback_block_index)
+        assert get_api_tables(watcher.api_db) == tables_before
+        watcher.api_db.close()
+        watcher.ledger_db.close()
+        return
+    assert len(get_api_tables(watcher.api_db)["previous_states"]) > 0
+    api_watcher.rollback_events(watcher.api_db, rollback_block_index)
+
+    tables_after = get_api_tables(watcher.api_db)
+    for table in ["previous_states", "mempool"]:
+        tables_before.pop(table)
+        tables_after.pop(table)
+    # the rolled back credits leave empty balances
+    tables_after["balances"] = [
+        balance for balance in tables_after["balances"] if balance["quantity"] != 0
+    ]
+    tables_before["balances"] = [
+        balance for balance in tables_before["balances"] if balance["quantity"] != 0
+    ]
+    assert tables_after == tables_before
+    watcher.api_db.close()
+    watcher.ledger_db.close()
+
+
+def test_event_feed():
+    event_feed = api_watcher.EventFeed()
+    assert event_feed.wait(timeout=0.01) is None
+    event_feed.notify(12)
+    event_feed.notify(15)
+    assert event_feed.wait(timeout=0.01) == 15
+    assert event_feed.wait(timeout=0.01) is None
+
+
+@pytest.mark.usefixtures("cp_server")
+def test_follow_event_feed(monkeypatch, tmp_path):
+    # a ledger database without its last block
+    ledger_db_file = str(tmp_path / "ledger.db")
+    ledger_db = database.get_db_connection(ledger_db_file, read_only=False, check_wal=False)
+    source_db = database.get_db_connection(config.DATABASE, read_only=True, check_wal=False)
+    snapshots.backup(source_db, ledger_db)
+    source_db.close()
+    last_block_index = api_watcher.get_last_event(ledger_db)["block_index"]
+    last_block_events = ledger_db.execute(
+        "SELECT * FROM messages WHERE block_index = ? ORDER BY message_index", (last_block_index,)
+    ).fetchall()
+    ledger_db.execute("DELETE FROM messages WHERE block_index = ?", (last_block_index,))
+
+    monkeypatch.setattr(config, "DATABASE", ledger_db_file)
+    monkeypatch.setattr(config, "API_DATABASE", str(tmp_path / "api.db"))
+    event_feed = api_watcher.EventFeed()
+    watcher = api_watcher.APIWatcher(event_feed)
+    # no mempool synchronization before the end of the test
+    watcher.last_mempool_sync = time.time()
+    follower = threading.Thread(target=watcher.follow)
+    follower.start()
+    api_db = database.get_db_connection(config.API_DATABASE, read_only=False, check_wal=False)
+    try:
+        last_api_event = api_watcher.get_last_event(api_db)
+        while last_api_event is None or last_api_event["block_index"] < last_block_index - 1:
+            time.sleep(0.01)
+            last_api_event = api_watcher.get_last_event(api_db)
+
+        # the ledger commits a block
+        start_time = time.time()
+        cursor = ledger_db.cursor()
+        cursor.executemany(ledger.INSERT_MESSAGE_QUERY, last_block_events)
+        event_feed.notify(last_block_events[-1]["message_index"])
+        while (
+            api_watcher.get_last_parsed_message_index(api_db)
+            < last_block_events[-1]["message_index"]
+        ):
+            assert time.time() - start_time < api_watcher.MEMPOOL_SYNC_INTERVAL / 2
+            time.sleep(0.01)
+    finally:
+        watcher.stop_event.set()
+        event_feed.wake()
+        follower.join()
+        api_db.close()
+        watcher.api_db.close()
+        watcher.ledger_db.close()
+        ledger_db.close()
+
+
+def insert_mempool_transaction(ledger_db, tx_hash, confirmed_tx_hash):
+    # the events of a confirmed transaction as if `tx_hash` was in the mempool
+    for message in ledger_db.execute(
+        "SELECT * FROM messages WHERE tx_hash = ? ORDER BY message_index", (confirmed_tx_hash,)
+    ).fetchall():
+        ledger_db.execute(
+            """INSERT INTO mempool (tx_hash, command, category, bindings, event, timestamp)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (
+                tx_hash,
+                message["command"],
+                message["category"],
+                message["bindings"].replace(confirmed_tx_hash, tx_hash),
+                message["event"],
+                message["timestamp"],
+            ),
+        )
+
+
+@pytest.mark.usefixtures("cp_server")
+def test_synchronize_mempool(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "NO_MEMPOOL", False)
+    monkeypatch.setattr(config, "API_DATABASE", str(tmp_path / "api.db"))
+    watcher = api_watcher.APIWatcher()
+    api_watcher.catch_up(watcher.api_db, watcher.ledger_db, watcher)
+    ledger_db = database.get_db_connection(str(tmp_path / "ledger.db"), read_only=False)
+    snapshots.backup(watcher.ledger_db, ledger_db)
+    # not in the fixtures
+    ledger_db.execute(
+        """CREATE TABLE mempool(
+           tx_hash TEXT, command TEXT, category TEXT, bindings TEXT, timestamp INTEGER, event TEXT)"""
+    )
+    confirmed_tx_hashes = [
+        row["tx_hash"]
+        for row in ledger_db.execute(
+            """SELECT tx_hash FROM messages WHERE event = 'SEND'
+               ORDER BY message_index DESC LIMIT 2"""
+        ).fetchall()
+    ]
+    tx_hashes = ["a" * 64, "b" * 64]
+    tables_without_mempool = get_api_tables(watcher.api_db)
+
+    insert_mempool_transaction(ledger_db, tx_hashes[0], confirmed_tx_hashes[0])
+    api_watcher.synchronize_mempool(watcher.api_db, ledger_db, watcher.stop_event)
+    tables_with_one_tx = get_api_tables(watcher.api_db)
+    assert {row["tx_hash"] for row in tables_with_one_tx["mempool"]} == {tx_hashes[0]}
+    assert len(tables_with_one_tx["sends"]) == len(tables_without_mempool["sends"]) + 1
+
+    # only the new transaction is executed
+    insert_mempool_transaction(ledger_db, tx_hashes[1], confirmed_tx_hashes[1])
+    api_watcher.synchronize_mempool(watcher.api_db, ledger_db, watcher.stop_event)
+    assert {row["tx_hash"] for row in get_api_tables(watcher.api_db)["mempool"]} == set(tx_hashes)
+    total_changes = watcher.api_db.total_changes()
+    api_watcher.synchronize_mempool(watcher.api_db, ledger_db, watcher.stop_event)
+    assert watcher.api_db.total_changes() == total_changes
+
+    # only the evicted transaction is removed
+    ledger_db.execute("DELETE FROM mempool WHERE tx_hash = ?", (tx_hashes[1],))
+    api_watcher.synchronize_mempool(watcher.api_db, ledger_db, watcher.stop_event)
+    assert get_api_tables(watcher.api_db) == tables_with_one_tx
+
+    ledger_db.execute("DELETE FROM mempool")
+    api_watcher.synchronize_mempool(watcher.api_db, ledger_db, watcher.stop_event)
+    assert get_api_tables(watcher.api_db) == tables_without_mempool
+    assert api_watcher.MEMPOOL_TRANSACTIONS == {}
+    ledger_db.close()
+    watcher.api_db.close()
+    watcher.ledger_db.close()
+
+
+@pytest.mark.usefixtures("cp_server")
+def test_worker_caches(monkeypatch, tmp_path, singleton_caches):
+    monkeypatch.setattr(config, "API_DATABASE", str(tmp_path / "api.db"))
+    monkeypatch.setattr(config, "API_CACHE_FILE", str(tmp_path / "api.cache.db"))
+    watcher = api_watcher.APIWatcher()
+    api_watcher.catch_up(watcher.api_db, watcher.ledger_db, watcher)
+    api_db = watcher.api_db
+    monkeypatch.setattr(util, "CURRENT_BLOCK_INDEX", ledger.last_db_index(api_db))
+    assets = ["DIVISIBLE", "NODIVISIBLE", "XCP", "BTC"]
+    block_indexes = [310001, 310002, util.CURRENT_BLOCK_INDEX]
+    expected_assets_info = ledger.get_assets_last_issuance(api_db, assets)
+    expected_block_times = ledger.get_blocks_time(api_db, block_indexes)
+
+    def get_cached_values():
+        assets_info = cache.AssetsInfoCache().get_assets_last_issuance(api_db, assets)
+        block_times = cache.BlocksTimeCache().get_blocks_time(api_db, block_indexes)
+        return {asset: assets_info[asset] for asset in assets}, block_times
+
+    assert get_cached_values() == (expected_assets_info, expected_block_times)
+    blocks_version = cache.BLOCKS_VERSION.value
+    cache.APIResponseCache().set("immutable", None, b"{}", "etag", blocks_version)
+    cache.APIResponseCache().set("block", util.CURRENT_BLOCK_INDEX, b"{}", "etag", blocks_version)
+
+    def fail(*args):
+        raise AssertionError("cache miss")
+
+    # served by the caches
+    monkeypatch.setattr(ledger, "get_assets_last_issuance", fail)
+    monkeypatch.setattr(ledger, "get_blocks_time", fail)
+    assert get_cached_values() == (expected_assets_info, expected_block_times)
+
+    # until the API Watcher commits a change of the assets or the blocks
+    last_issuance_block_index = api_db.execute(
+        "SELECT MAX(block_index) AS block_index FROM messages WHERE event = 'ASSET_ISSUANCE'"
+    ).fetchone()["block_index"]
+    api_watcher.rollback_events(api_db, last_issuance_block_index)
+    with pytest.raises(AssertionError, match="cache miss"):
+        cache.AssetsInfoCache().get_assets_last_issuance(api_db, assets)
+    with pytest.raises(AssertionError, match="cache miss"):
+        cache.BlocksTimeCache().get_blocks_time(api_db, block_indexes)
+    # the API responses are removed too, and not cached if computed before the rollback
+    assert cache.APIResponseCache().get("immutable", util.CURRENT_BLOCK_INDEX) is None
+    assert cache.APIResponseCache().get("block", util.CURRENT_BLOCK_INDEX) is None
+    cache.APIResponseCache().set("block", util.CURRENT_BLOCK_INDEX, b"{}", "etag", blocks_version)
+    assert cache.APIResponseCache().get("block", util.CURRENT_BLOCK_INDEX) is None
+    watcher.api_db.close()
+    watcher.ledger_db.close()
@@ -0,0 +1,49 @@
+#! /usr/bin/python3
+import pytest
+
+from counterpartycore.lib import config
+from counterpartycore.lib.api import cache
+
+
+@pytest.fixture()
+def response_cache(monkeypatch, tmp_path, singleton_caches):
+    monkeypatch.setattr(config, "API_CACHE_FILE", str(tmp_path / "api.cache.db"))
+    monkeypatch.setattr(config, "API_CACHE_SIZE", 2)
+    # empty cache, restored by `singleton_caches`
+    type(cache.APIResponseCache)._instances.pop(cache.APIResponseCache, None)
+    return cache.APIResponseCache()
+
+
+def test_response_cache(response_cache):
+    blocks_version = cache.BLOCKS_VERSION.value
+    response_cache.set("immutable", None, b"{}", "etag1", blocks_version)
+    response_cache.set("immutable", None, b"{[]}", "etag2", blocks_version)
+    response_cache.set("block", 100, b"{}", "etag3", blocks_version)
+    assert response_cache.get("immutable", 101) == (b"{[]}", "etag2", True)
+    assert response_cache.get("block", 100) == (b"{}", "etag3", False)
+    assert response_cache.get("block", 101) is None
+
+    # the hits are counted in memory
+    total_changes = response_cache.db.total_changes()
+    response_cache.get("immutable", 101)
+    assert response_cache.db.total_changes() == total_changes
+    assert response_cache.statistics() == {
+        "hits": 3,
+        "misses": 1,
+        "hit_rate": 0.75,
+        "entries": 2,
+        "size": 6,
+    }
+
+    # the least recently used response is evicted
+    response_cache.set("other", 100, b"{}", "etag4", blocks_version)
+    assert response_cache.get("block", 100) is None
+    assert response_cache.get("immutable", 100) is not None
+    assert response_cache.statistics()["entries"] == 2
+
+    # not cached if a block was rolled back
+    response_cache.set("block", 100, b"{}", "etag3", blocks_version - 1)
+    assert response_cache.get("block", 100) is None
+    response_cache.clear()
+    assert response_cache.statistics()["entries"] == 0
+    assert response_cache.statistics()["size"] == 0
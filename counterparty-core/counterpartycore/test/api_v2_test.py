@@ -1,11 +1,13 @@
 import json
 import tempfile
+from decimal import Decimal as D
 
 import pytest
 import requests
 
-from counterpartycore.lib import util
-from counterpartycore.lib.api import routes
+from counterpartycore.lib import ledger, util
+from counterpartycore.lib.api import cache, routes
+from counterpartycore.lib.api import util as api_util
 
 # this is require near the top to do setup of the test suite
 from counterpartycore.test import (
@@ -46,6 +48,7 @@ def test_api_v2(request):
         "info",
         "mempool",
         "healthz",
+        "cache",
         "bitcoin",
         "v1",
         "rpc",
@@ -522,3 +525,134 @@ def test_asset_dispensers():
             "confirmed": True,
         }
     ]
+
+
+def test_inject_oracle_prices(server_db, monkeypatch):
+    monkeypatch.setattr(util, "CURRENT_BLOCK_INDEX", 310500)
+    oracle_addresses = [ADDR[0], "2MyJHMUenMWonC35Yi6PHC7i2tkS7PuomCy", ADDR[5]]
+
+    oracle_prices = ledger.get_oracles_last_price(server_db, oracle_addresses, 310500)
+    assert set(oracle_prices) == set(oracle_addresses[:2])
+    for oracle_address in oracle_addresses:
+        assert oracle_prices.get(
+            oracle_address, (None, None, None, None)
+        ) == ledger.get_oracle_last_price(server_db, oracle_address, 310500)
+
+    dispensers = [
+        {"satoshirate": 100, "oracle_address": oracle_address}
+        for oracle_address in oracle_addresses[:2] * 2
+    ] + [{"satoshirate": 100, "oracle_address": None}]
+    expected = [api_util.inject_fiat_price(server_db, dict(dispenser)) for dispenser in dispensers]
+    assert api_util.inject_fiat_prices(server_db, dispensers) == expected
+    assert expected[0]["oracle_price"] == 1.0
+    assert expected[-1]["satoshi_price"] == 100
+
+
+def test_to_json_chunks():
+    rows = [{"tx_hash": "é" * 10, "quantity": D("1.5"), "data": b"\x01", "list": [1, None]}] * 50
+    for result in [[], rows[:1], rows]:
+        api_result = {"result": result, "next_cursor": None, "result_count": len(result)}
+        chunks = list(api_util.to_json_chunks(api_result, chunk_size=100))
+        assert "".join(chunks) == api_util.to_json(api_result)
+    assert len(chunks) > 1
+
+
+@pytest.mark.usefixtures("api_server_v2")
+def test_api_v2_streamed_response():
+    url = f"{API_ROOT}/v2/transactions?limit=50&verbose=true"
+    cached = requests.get(url)  # noqa: S113
+    # the responses that are not cached are streamed
+    streamed = requests.get(url + "&show_unconfirmed=true")  # noqa: S113
+    assert cached.headers.get("Content-Length") is not None
+    assert streamed.headers.get("Content-Length") is None
+    assert streamed.json() == cached.json()
+    assert len(streamed.json()["result"]) == 50
+
+
+@pytest.mark.usefixtures("api_server_v2")
+def test_api_v2_cache():
+    result = requests.get(f"{API_ROOT}/v2/cache")  # noqa: S113
+    statistics = result.json()["result"]
+    last_block_index = int(result.headers["X-COUNTERPARTY-HEIGHT"])
+    block_index = last_block_index - cache.IMMUTABLE_MIN_CONFIRMATIONS
+
+    # not confirmed enough to never change
+    url = f"{API_ROOT}/v2/blocks/{block_index + 1}/events?limit=5"
+    result = requests.get(url)  # noqa: S113
+    assert result.headers["Cache-Control"] == "no-cache"
+
+    # past blocks never change
+    url = f"{API_ROOT}/v2/blocks/{block_index}/events?limit=5"
+    result = requests.get(url)  # noqa: S113
+    assert result.status_code == 200
+    assert result.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    etag = result.headers["ETag"]
+
+    # same arguments in another order
+    cached_result = requests.get(f"{url}&verbose=false")  # noqa: S113
+    assert cached_result.headers["ETag"] == etag
+    assert cached_result.json() == result.json()
+    not_modified = requests.get(url, headers={"If-None-Match": etag})  # noqa: S113
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    # cached until the next block
+    result = requests.get(f"{API_ROOT}/v2/assets/NODIVISIBLE/balances")  # noqa: S113
+    assert result.headers["Cache-Control"] == "no-cache"
+
+    # not cached
+    result = requests.get(f"{API_ROOT}/v2/mempool/events")  # noqa: S113
+    assert "ETag" not in result.headers
+
+    new_statistics = requests.get(f"{API_ROOT}/v2/cache").json()["result"]  # noqa: S113
+    assert new_statistics["hits"] == statistics["hits"] + 2
+    assert new_statistics["misses"] == statistics["misses"] + 3
+    assert new_statistics["entries"] >= 3
+
+
+@pytest.mark.usefixtures("api_server_v2")
+def test_api_v2_result_count():
+    url = f"{API_ROOT}/v2/addresses/mn6q3dS2EnDUx3bmyWc6D4szJNVGtaR7zc/credits"
+    credits = requests.get(f"{url}?limit=1000").json()  # noqa: S113
+    credit_count = len(credits["result"])
+    assert credits["next_cursor"] is None
+    assert credits["result_count"] == credit_count
+
+    first_page = requests.get(f"{url}?limit=10").json()  # noqa: S113
+    assert first_page["result_count"] == credit_count
+    next_page = requests.get(  # noqa: S113
+        f"{url}?limit=10&cursor={first_page['next_cursor']}"
+    ).json()
+    assert next_page["result_count"] == credit_count
+    assert first_page["result"] + next_page["result"] == credits["result"][:20]
+
+    last_page = requests.get(f"{url}?limit=10&offset={credit_count - 5}").json()  # noqa: S113
+    assert last_page["result_count"] == credit_count
+    assert len(last_page["result"]) == 5
+    after_last_page = requests.get(f"{url}?limit=10&offset={credit_count + 5}").json()  # noqa: S113
+    assert after_last_page["result_count"] == credit_count
+    assert after_last_page["result"] == []
+
+
+@pytest.mark.usefixtures("api_server_v2")
+def test_api_v2_sorted_pagination():
+    url = f"{API_ROOT}/v2/orders?sort=expiration:desc,give_price:asc"
+    orders = requests.get(f"{url}&limit=1000").json()["result"]  # noqa: S113
+    assert len(orders) > 2
+
+    paginated_orders = []
+    cursor = None
+    while True:
+        page_url = f"{url}&limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = requests.get(page_url).json()  # noqa: S113
+        paginated_orders += page["result"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert paginated_orders == orders
+
+    result = requests.get(f"{url}&cursor=invalid")  # noqa: S113
+    assert result.status_code == 400
+    result = requests.get(f"{API_ROOT}/v2/events?offset=1000000")  # noqa: S113
+    assert result.status_code == 400
+    assert "use the `cursor` parameter" in result.json()["error"]
@@ -0,0 +1,68 @@
+#! /usr/bin/python3
+import tempfile
+
+import pytest
+
+from counterpartycore.lib import check, config, ledger
+from counterpartycore.test import (
+    conftest,  # noqa: F401
+)
+
+# this is require near the top to do setup of the test suite
+from counterpartycore.test.fixtures.params import ADDR
+from counterpartycore.test.util_test import CURR_DIR
+
+FIXTURE_SQL_FILE = CURR_DIR + "/fixtures/scenarios/unittest_fixture.sql"
+FIXTURE_DB = tempfile.gettempdir() + "/fixtures.unittest_fixture.db"
+
+
+@pytest.fixture()
+def block_deltas(monkeypatch, singleton_caches):
+    monkeypatch.setattr(config, "CHECK_ASSET_CONSERVATION", True)
+    monkeypatch.setattr(ledger, "BLOCK_SUPPLY_DELTAS", {})
+    monkeypatch.setattr(ledger, "BLOCK_HELD_DELTAS", {})
+
+
+def test_block_asset_conservation(server_db, block_deltas):
+    ledger.debit(server_db, ADDR[0], "XCP", 100, 0, action="test", event="test")
+    ledger.credit(server_db, ADDR[1], "XCP", 100, 0, action="test", event="test")
+
+    assert ledger.BLOCK_HELD_DELTAS == {"XCP": 0}
+    check.block_asset_conservation(server_db)
+
+
+def test_block_asset_conservation_error(server_db, block_deltas):
+    ledger.credit(server_db, ADDR[1], "XCP", 100, 0, action="test", event="test")
+
+    with pytest.raises(check.SanityError, match="0.0 XCP issued ≠ 0.000001 XCP held"):
+        check.block_asset_conservation(server_db)
+
+    ledger.track_asset_conservation("burns", None, {"status": "valid", "earned": 100})
+    check.block_asset_conservation(server_db)
+
+
+def test_block_asset_conservation_assets(server_db, block_deltas):
+    # like `held()`, all the balances without address nor utxo are counted
+    ledger.track_balance_held_delta(None, None, "XCP", 100, 60)
+    ledger.track_balance_held_delta(ADDR[0], None, "XCP", 100, 60)
+    assert ledger.BLOCK_HELD_DELTAS == {"XCP": 140}
+
+    # like `asset_conservation()`, the assets without supply are not checked
+    ledger.BLOCK_HELD_DELTAS = {"NOTISSUED": 100}
+    check.block_asset_conservation(server_db)
+
+
+def test_escrow_contributions():
+    order = {
+        "status": "open",
+        "give_asset": "DIVISIBLE",
+        "give_remaining": 50,
+        "get_asset": config.BTC,
+    }
+    assert ledger.escrow_contributions("orders", order) == [("DIVISIBLE", 50)]
+    assert ledger.escrow_contributions("orders", order | {"status": "filled"}) == []
+    assert ledger.escrow_contributions(
+        "orders", order | {"status": "filled", "give_asset": config.XCP}
+    ) == [(config.XCP, 50)]
+    assert ledger.escrow_contributions("dispensers", {"status": 10, "asset": "XCP"}) == []
+    assert ledger.escrow_contributions("credits", {"status": "valid"}) == []
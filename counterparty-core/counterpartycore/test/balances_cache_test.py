@@ -0,0 +1,59 @@
+#! /usr/bin/python3
+import tempfile
+
+import pytest
+
+from counterpartycore.lib import check, ledger, util
+from counterpartycore.test import (
+    conftest,  # noqa: F401
+)
+
+# this is require near the top to do setup of the test suite
+from counterpartycore.test.fixtures.params import ADDR
+from counterpartycore.test.util_test import CURR_DIR
+
+FIXTURE_SQL_FILE = CURR_DIR + "/fixtures/scenarios/unittest_fixture.sql"
+FIXTURE_DB = tempfile.gettempdir() + "/fixtures.unittest_fixture.db"
+
+
+@pytest.fixture()
+def balances_cache(server_db, monkeypatch):
+    monkeypatch.setattr(util, "BLOCK_PARSER_STATUS", "catching up")
+    cache = ledger.BalancesCache(server_db)
+    yield cache
+    ledger.drop_balances_cache()
+
+
+def test_balances_cache(server_db, balances_cache):
+    xcp_balance = ledger.get_balance_no_cache(server_db, ADDR[0], "XCP")[0]["quantity"]
+
+    assert ledger.get_balance(server_db, ADDR[0], "XCP") == xcp_balance
+    assert balances_cache.balances[(ADDR[0], "XCP")] == xcp_balance
+
+    ledger.debit(server_db, ADDR[0], "XCP", 100, 0, action="test", event="test")
+    ledger.credit(server_db, ADDR[1], "XCP", 100, 0, action="test", event="test")
+
+    assert balances_cache.balances[(ADDR[0], "XCP")] == xcp_balance - 100
+    assert ledger.get_balance(server_db, ADDR[0], "XCP") == xcp_balance - 100
+    check.balances_cache(server_db)
+
+
+def test_balances_cache_no_balance(server_db, balances_cache):
+    assert ledger.get_balance(server_db, ADDR[0], "NOBALANCE") == 0
+    assert balances_cache.balances[(ADDR[0], "NOBALANCE")] is None
+    with pytest.raises(ledger.DebitError, match="Insufficient funds."):
+        ledger.debit(server_db, ADDR[0], "NOBALANCE", 1, 0)
+
+
+def test_balances_cache_inconsistency(server_db, balances_cache):
+    ledger.get_balance(server_db, ADDR[0], "XCP")
+    balances_cache.update_balance(ADDR[0], "XCP", 1)
+    with pytest.raises(check.SanityError):
+        check.balances_cache(server_db)
+
+
+def test_balances_cache_following(server_db, balances_cache, monkeypatch):
+    ledger.get_balance(server_db, ADDR[0], "XCP")
+    monkeypatch.setattr(util, "BLOCK_PARSER_STATUS", "following")
+    ledger.credit(server_db, ADDR[1], "XCP", 100, 0, action="test", event="test")
+    assert (ADDR[1], "XCP") not in balances_cache.balances
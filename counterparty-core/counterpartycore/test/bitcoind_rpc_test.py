@@ -0,0 +1,104 @@
+#! /usr/bin/python3
+import http.server
+import json
+import threading
+
+import pytest
+
+from counterpartycore.lib import config, exceptions
+from counterpartycore.lib.backend import bitcoind
+
+# before the mock of `init_mock_functions()`
+GETRAWTRANSACTION_BATCH = bitcoind.getrawtransaction_batch
+
+
+class StubRPCHandler(http.server.BaseHTTPRequestHandler):
+    # keep-alive connections
+    protocol_version = "HTTP/1.1"
+    # the headers and the body are sent separately
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connection_count += 1
+
+    def do_POST(self):  # noqa: N802
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.request_count += 1
+        if isinstance(payload, list):
+            result = [self.server.call(request) for request in payload]
+        else:
+            result = self.server.call(payload)
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+class StubRPCServer(http.server.ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubRPCHandler)
+        self.connection_count = 0
+        self.request_count = 0
+
+    def call(self, request):
+        if request["method"] == "getblockcount":
+            return {"result": 100, "error": None, "id": request["id"]}
+        tx_hash = request["params"][0]
+        if tx_hash.startswith("missing"):
+            error = {"code": -5, "message": "No such mempool or blockchain transaction."}
+            return {"result": None, "error": error, "id": request["id"]}
+        if tx_hash.startswith("invalid"):
+            error = {"code": -8, "message": "parameter 1 must be hexadecimal string"}
+            return {"result": None, "error": error, "id": request["id"]}
+        return {"result": f"raw_{tx_hash}", "error": None, "id": request["id"]}
+
+
+@pytest.fixture()
+def stub_rpc_server(monkeypatch):
+    server = StubRPCServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        config, "BACKEND_URL", f"http://127.0.0.1:{server.server_port}", raising=False
+    )
+    monkeypatch.setattr(config, "BACKEND_SSL_NO_VERIFY", False, raising=False)
+    monkeypatch.setattr(config, "REQUESTS_TIMEOUT", 5, raising=False)
+    monkeypatch.setattr(config, "RPC_BATCH_SIZE", 20, raising=False)
+    # new sessions connected to the stub
+    monkeypatch.setattr(bitcoind, "SESSIONS", threading.local())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_rpc_keep_alive(stub_rpc_server):
+    for _i in range(5):
+        assert bitcoind.getblockcount() == 100
+    assert stub_rpc_server.request_count == 5
+    assert stub_rpc_server.connection_count == 1
+
+
+def test_rpc_batch(stub_rpc_server):
+    payload = [
+        {"method": "getrawtransaction", "params": [f"tx{i}", 0], "jsonrpc": "2.0", "id": i}
+        for i in range(50)
+    ]
+    responses = bitcoind.rpc_batch(payload)
+    assert sorted(response["id"] for response in responses) == list(range(50))
+    assert all(response["result"] == f"raw_tx{response['id']}" for response in responses)
+    # chunks of `config.RPC_BATCH_SIZE` calls
+    assert stub_rpc_server.request_count == 3
+
+
+def test_getrawtransaction_batch_skip_missing(stub_rpc_server, monkeypatch):
+    monkeypatch.setattr(bitcoind, "getrawtransaction_batch", GETRAWTRANSACTION_BATCH)
+    tx_hashes = ["tx1", "missing1", "tx2"]
+    assert bitcoind.getrawtransaction_batch(tx_hashes) == {"tx1": "raw_tx1", "tx2": "raw_tx2"}
+    with pytest.raises(exceptions.BitcoindRPCError):
+        bitcoind.getrawtransaction_batch(["tx1", "invalid"])
@@ -0,0 +1,57 @@
+#! /usr/bin/python3
+import copy
+import tempfile
+
+from counterpartycore.lib import blockdecoder, gettxinfo, util
+from counterpartycore.test import (
+    conftest,  # noqa: F401
+    util_test,
+)
+
+# this is require near the top to do setup of the test suite
+from counterpartycore.test.fixtures.contract_vectors.gettxinfo import GETTXINFO_VECTOR
+from counterpartycore.test.util_test import CURR_DIR
+
+FIXTURE_SQL_FILE = CURR_DIR + "/fixtures/scenarios/unittest_fixture.sql"
+FIXTURE_DB = tempfile.gettempdir() + "/fixtures.unittest_fixture.db"
+
+
+def get_vector_transactions():
+    return [
+        (vector["in"][1], vector["in"][0])
+        for vector in GETTXINFO_VECTOR["gettxinfo"]["get_tx_info"]
+        if "out" in vector
+    ]
+
+
+def test_predecoded_tx_info(server_db):
+    predecoded_count = 0
+    # vectors are encoded with the real ARC4 key
+    with util_test.ConfigContext(DISABLE_ARC4_MOCKING=True):
+        for block_index, decoded_tx in get_vector_transactions():
+            util.CURRENT_BLOCK_INDEX = block_index
+            expected = gettxinfo.get_tx_info(server_db, copy.deepcopy(decoded_tx), block_index)
+
+            predecoded_tx = copy.deepcopy(decoded_tx)
+            predecoded = gettxinfo.predecode_tx(copy.deepcopy(decoded_tx), block_index)
+            if predecoded is not None:
+                gettxinfo.merge_predecoded_tx(predecoded_tx, predecoded)
+                assert "vin_info" in predecoded
+                predecoded_count += 1
+
+            assert gettxinfo.get_tx_info(server_db, predecoded_tx, block_index) == expected
+
+    assert predecoded_count > 0
+
+
+def test_decode_transactions(server_db):
+    block_index, decoded_tx = get_vector_transactions()[0]
+    coinbase_tx = copy.deepcopy(decoded_tx) | {"coinbase": True}
+
+    with util_test.ConfigContext(DISABLE_ARC4_MOCKING=True):
+        results = blockdecoder.decode_transactions(
+            block_index, [(0, coinbase_tx), (1, copy.deepcopy(decoded_tx))]
+        )
+
+    assert [position for position, _predecoded in results] == [1]
+    assert util.CURRENT_BLOCK_INDEX == block_index
@@ -233,6 +233,14 @@ def server_db(request, cp_server, api_server):
     return db
 
 
+@pytest.fixture(scope="function")
+def singleton_caches(monkeypatch):
+    """Keep the caches created or reloaded by a test out of the next tests."""
+    # `util.SingletonMeta` is mocked by `init_mock_functions()`
+    singleton_meta = type(ledger.AssetCache)
+    monkeypatch.setattr(singleton_meta, "_instances", dict(singleton_meta._instances))
+
+
 @pytest.fixture(scope="module")
 def api_server(request, cp_server):
     """
@@ -272,6 +280,8 @@ def api_server_v2(request, cp_server):
         "testcoin": False,
         "regtest": False,
         "api_limit_rows": 1000,
+        "api_max_result_count": config.DEFAULT_API_MAX_RESULT_COUNT,
+        "api_max_offset": config.DEFAULT_API_MAX_OFFSET,
         "backend_connect": None,
         "backend_port": None,
         "backend_user": None,
@@ -314,6 +324,12 @@ def api_server_v2(request, cp_server):
         "enable_zmq_publisher": False,
         "zmq_publisher_port": None,
         "db_connection_pool_size": 10,
+        "decoding_workers": 0,
+        "snapshot_interval": 0,
+        "api_watcher_batch_size": 1,
+        "api_watcher_rollback_depth": config.DEFAULT_API_WATCHER_ROLLBACK_DEPTH,
+        "api_cache_size": config.DEFAULT_API_CACHE_SIZE,
+        "profile": False,
         "json_logs": False,
         "wsgi_server": "waitress",
         "gunicorn_workers": 2,
@@ -577,6 +593,17 @@ def init_mock_functions(request, monkeypatch, mock_utxos, rawtransactions_db):
     def mocked_getrawtransaction_batch(txhash_list, verbose=False, skip_missing=False):
         return util_test.getrawtransaction_batch(rawtransactions_db, txhash_list, verbose=verbose)
 
+    def mocked_bitcoind_getrawtransaction_batch(tx_hashes, verbose=False):
+        raw_transactions = {}
+        for tx_hash in tx_hashes:
+            try:
+                raw_transactions[tx_hash] = util_test.getrawtransaction(
+                    rawtransactions_db, tx_hash, verbose=verbose
+                )
+            except IndexError:
+                pass
+        return raw_transactions
+
     def mocked_search_raw_transactions(address, unconfirmed=False):
         return util_test.search_raw_transactions(rawtransactions_db, address, unconfirmed)
 
@@ -633,6 +660,10 @@ def init_mock_functions(request, monkeypatch, mock_utxos, rawtransactions_db):
     monkeypatch.setattr(
         "counterpartycore.lib.backend.bitcoind.getrawtransaction", mocked_getrawtransaction
     )
+    monkeypatch.setattr(
+        "counterpartycore.lib.backend.bitcoind.getrawtransaction_batch",
+        mocked_bitcoind_getrawtransaction_batch,
+    )
     monkeypatch.setattr("counterpartycore.lib.backend.bitcoind.is_valid_utxo", is_valid_utxo)
     monkeypatch.setattr(
         "counterpartycore.lib.backend.bitcoind.get_utxo_address_and_value",
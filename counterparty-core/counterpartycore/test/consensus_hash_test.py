@@ -0,0 +1,37 @@
+#! /usr/bin/python3
+import pytest
+
+from counterpartycore.lib import check, config, util
+from counterpartycore.test import (
+    conftest,  # noqa: F401
+)
+
+
+def test_double_hasher():
+    content = ["310000mn6q3dS2EnDUx3bmyWc6D4szJNVGtaR7zcXCP100", "insertcredits{}", "ñ€🚀", ""]
+    hasher = util.DoubleHasher("prefix")
+    for text in content:
+        hasher.update(text)
+    assert hasher.hexdigest() == util.dhash_string("prefix" + "".join(content))
+    assert util.DoubleHasher().hexdigest() == util.dhash_string("")
+
+
+def test_consensus_hash(monkeypatch):
+    monkeypatch.setattr(config, "TESTNET", True, raising=False)
+    monkeypatch.setattr(util, "CURRENT_BLOCK_INDEX", 1)
+    previous_hash = util.dhash_string(check.CONSENSUS_HASH_SEED)
+    content = ["1addressXCP100", "1addressXCP-100"]
+
+    hasher = check.consensus_hasher(previous_hash)
+    for text in content:
+        hasher.update(text)
+    calculated_hash = util.dhash_string(
+        previous_hash + f"{check.CONSENSUS_HASH_VERSION_TESTNET}{''.join(content)}"
+    )
+    assert check.consensus_hash("ledger_hash", hasher, None) == calculated_hash
+    assert check.consensus_hash("ledger_hash", hasher, calculated_hash) == calculated_hash
+    # messages hashes are not enforced
+    assert check.consensus_hash("messages_hash", hasher, "other") == calculated_hash
+
+    with pytest.raises(check.ConsensusError, match="Inconsistent ledger_hash for block 1"):
+        check.consensus_hash("ledger_hash", hasher, "other")
@@ -0,0 +1,62 @@
+#! /usr/bin/python3
+import tempfile
+
+from counterpartycore.lib import blocks, ledger, util
+from counterpartycore.test import (
+    conftest,  # noqa: F401
+)
+
+# this is require near the top to do setup of the test suite
+from counterpartycore.test.fixtures.params import ADDR
+from counterpartycore.test.util_test import CURR_DIR
+
+FIXTURE_SQL_FILE = CURR_DIR + "/fixtures/scenarios/unittest_fixture.sql"
+FIXTURE_DB = tempfile.gettempdir() + "/fixtures.unittest_fixture.db"
+
+
+def get_last_rows(db, table, current=False):
+    cursor = db.cursor()
+    if current:
+        query = f"SELECT *, rowid FROM {table}_current ORDER BY rowid"  # noqa: S608
+    else:
+        id_fields = ", ".join(ledger.CURRENT_STATE_TABLES[table])
+        query = f"""
+            SELECT *, rowid FROM {table}
+            WHERE rowid IN (SELECT MAX(rowid) FROM {table} GROUP BY {id_fields})
+            ORDER BY rowid
+        """  # noqa: S608
+    return cursor.execute(query).fetchall()
+
+
+def check_current_state(db):
+    for table in ledger.CURRENT_STATE_TABLES:
+        assert get_last_rows(db, table, current=True) == get_last_rows(db, table)
+
+
+def test_current_state_tables(server_db):
+    check_current_state(server_db)
+    assert len(get_last_rows(server_db, "orders", current=True)) > 0
+
+
+def test_current_state_update(server_db, singleton_caches):
+    order = get_last_rows(server_db, "orders", current=True)[0]
+    ledger.update_order(server_db, order["tx_hash"], {"status": "cancelled"})
+    ledger.credit(server_db, ADDR[0], "XCP", 100, 0, action="test", event="test")
+
+    assert ledger.get_order(server_db, order["tx_hash"])[0]["status"] == "cancelled"
+    check_current_state(server_db)
+
+
+def test_current_state_rollback(server_db, singleton_caches):
+    util.CURRENT_BLOCK_INDEX += 1
+    order = get_last_rows(server_db, "orders", current=True)[0]
+    ledger.update_order(server_db, order["tx_hash"], {"status": "cancelled"})
+    ledger.credit(server_db, ADDR[0], "XCP", 100, 0, action="test", event="test")
+
+    blocks.clean_messages_tables(server_db, block_index=util.CURRENT_BLOCK_INDEX)
+
+    assert ledger.get_order(server_db, order["tx_hash"])[0]["status"] == order["status"]
+    check_current_state(server_db)
+
+    blocks.clean_messages_tables(server_db, block_index=util.CURRENT_BLOCK_INDEX - 100)
+    check_current_state(server_db)
@@ -95,3 +95,17 @@ def test_deserialize():
     print(
         f"Time to deserialize  {4 * iterations} transactions with bitcoinlib: {end_time - start_time} seconds"
     )
+
+
+def test_deserialize_segwit_bytes():
+    segwit_hex = "01000000000102ab5357d8170304254e84cb66947995a1adcb534f562204e81889ee4badd2f1710000000000ffffffff9405cdfa4bb01f7656a1d2ce035bc232123f4fae23ac6d1fca03e135ca0994f00000000000ffffffff02a02526000000000016001450e3623e0095fa422a427421c3841c1e60a676c1f715a40a000000001600140c272ee21eb41191d1d9c2bd92e26fd958b58b440247304402205cc5a5ceaf59b36cfc6fd12f93bdfd54c6e625c09923ada2052576ef2221e9fb02201d7504f58459cce71f12f58eec01b6da3e43558fb8cb47c70eef34e2adf960b20121036d841256f891183be493f016fcbfec057bd5d88cbd8d2f9d06f13a36d9caf58502483045022100d80f2b4557258b528d4eaa313eff53a6db760ad1aaad3f78ff57103ba083984c02202ae089bcaffa38fcc8bfa2d0a7f5c7ef611f861e3309dc7baeb858f5b1a7198e01210298410495c0b4a9365842524467b58a84ca439c364605c510b50d6be442d32c8b00000000"
+    decoded_tx = deserialize.deserialize_tx(segwit_hex, use_txid=False)
+    # the bytes received from ZMQ are decoded without hex round-trip
+    assert deserialize.deserialize_tx(bytes.fromhex(segwit_hex), use_txid=False) == decoded_tx
+
+    decoded_tx_bitcoinlib = deserialize_bitcoinlib(segwit_hex)
+    assert decoded_tx["tx_id"] == util.ib2h(decoded_tx_bitcoinlib.GetTxid())
+    assert decoded_tx["tx_hash"] == util.ib2h(decoded_tx_bitcoinlib.GetHash())
+    assert decoded_tx["tx_id"] != decoded_tx["tx_hash"]
+    assert deserialize.deserialize_tx(segwit_hex, use_txid=True)["tx_hash"] == decoded_tx["tx_id"]
+    assert len(decoded_tx["vtxinwit"]) == 4
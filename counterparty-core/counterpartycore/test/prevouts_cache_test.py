@@ -0,0 +1,82 @@
+#! /usr/bin/python3
+import tempfile
+
+import pytest
+
+from counterpartycore.lib import deserialize, gettxinfo
+from counterpartycore.lib.backend import bitcoind
+from counterpartycore.test import (
+    conftest,  # noqa: F401
+)
+
+# this is require near the top to do setup of the test suite
+from counterpartycore.test.util_test import CURR_DIR
+
+FIXTURE_SQL_FILE = CURR_DIR + "/fixtures/scenarios/unittest_fixture.sql"
+FIXTURE_DB = tempfile.gettempdir() + "/fixtures.unittest_fixture.db"
+
+
+def get_transactions(rawtransactions_db):
+    raw_transactions = rawtransactions_db.execute(
+        "SELECT tx_hash, tx_hex FROM raw_transactions ORDER BY tx_hash LIMIT 2"
+    ).fetchall()
+    return {
+        tx_hash: deserialize.deserialize_tx(tx_hex, use_txid=True)
+        for tx_hash, tx_hex in raw_transactions
+    }
+
+
+@pytest.fixture()
+def prevouts_cache(server_db, monkeypatch, singleton_caches):
+    # empty cache, restored by `singleton_caches`
+    type(bitcoind.PrevoutsCache)._instances.pop(bitcoind.PrevoutsCache, None)
+    # the prevouts must come from the cache
+    monkeypatch.setattr(bitcoind, "get_decoded_transaction", None)
+    return bitcoind.PrevoutsCache()
+
+
+def test_fill_prevouts_cache(rawtransactions_db, prevouts_cache, monkeypatch):
+    batches = []
+    getrawtransaction_batch = bitcoind.getrawtransaction_batch
+
+    def counted_getrawtransaction_batch(tx_hashes):
+        batches.append(tx_hashes)
+        return getrawtransaction_batch(tx_hashes)
+
+    monkeypatch.setattr(bitcoind, "getrawtransaction_batch", counted_getrawtransaction_batch)
+
+    transactions = get_transactions(rawtransactions_db)
+    tx_hashes = list(transactions)
+    vins = [{"hash": tx_hash, "n": 0} for tx_hash in tx_hashes] + [{"hash": tx_hashes[0], "n": 1}]
+    bitcoind.fill_prevouts_cache(vins)
+    assert batches == [tx_hashes]
+
+    for vin in vins:
+        tx = transactions[vin["hash"]]
+        vout = tx["vout"][vin["n"]]
+        assert gettxinfo.get_vin_info(vin) == (
+            vout["value"],
+            vout["script_pub_key"],
+            len(tx["vtxinwit"]) > 0,
+        )
+
+    # already cached
+    bitcoind.fill_prevouts_cache(vins)
+    assert len(batches) == 1
+    statistics = prevouts_cache.statistics()
+    assert statistics["hits"] == 3
+    assert statistics["misses"] == 0
+
+
+def test_prevouts_cache_size(rawtransactions_db, prevouts_cache, monkeypatch):
+    transactions = get_transactions(rawtransactions_db)
+    tx_hashes = list(transactions)
+    prevouts_cache.add_transaction(transactions[tx_hashes[1]], tx_hashes[1])
+    monkeypatch.setattr(bitcoind, "PREVOUTS_CACHE_MAX_BYTES", prevouts_cache.size)
+    prevouts_cache.add_transaction(transactions[tx_hashes[0]], tx_hashes[0])
+    prevouts_cache.add_transaction(transactions[tx_hashes[1]], tx_hashes[1])
+
+    # the oldest outputs are evicted
+    assert prevouts_cache.size <= bitcoind.PREVOUTS_CACHE_MAX_BYTES
+    assert (tx_hashes[1], 0) in prevouts_cache
+    assert (tx_hashes[0], 0) not in prevouts_cache
@@ -0,0 +1,59 @@
+#! /usr/bin/python3
+import tempfile
+
+import pytest
+
+from counterpartycore.lib import config, profiler
+from counterpartycore.test import (
+    conftest,  # noqa: F401
+    util_test,
+)
+
+# this is require near the top to do setup of the test suite
+from counterpartycore.test.util_test import CURR_DIR
+
+FIXTURE_SQL_FILE = CURR_DIR + "/fixtures/scenarios/unittest_fixture.sql"
+FIXTURE_DB = tempfile.gettempdir() + "/fixtures.unittest_fixture.db"
+
+SEND_HEX = "0100000001c1d8c075936c3495f6d653c50f73d987f75448d97a750249b1eb83bee71b24ae000000001976a9144838d8b3588c4c7ba7c1d06f866e9b3739c6303788acffffffff0336150000000000001976a9141e9d9c2c34d4dda3cd71603d9ce1e447c3cc5c0588ac00000000000000001e6a1c8a5dda15fb6f05628a061e67576e926dc71a7fa2f0cceb951120a9322f30ea0b000000001976a9144838d8b3588c4c7ba7c1d06f866e9b3739c6303788ac00000000"
+
+
+@pytest.fixture()
+def enabled_profiler(server_db, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "PROFILE_FILE", str(tmp_path / "ledger.profile.json"))
+    profiler.enable(server_db)
+    yield
+    profiler.disable(server_db)
+
+
+def test_profile_block(server_db, enabled_profiler, singleton_caches):
+    assert profiler.get_profile() == {"block_count": 0, "phases": {}, "messages": {}}
+
+    with profiler.profile(server_db, "parse_block"):
+        util_test.insert_raw_transaction(SEND_HEX, server_db)
+    profiler.save(force=True)
+
+    profile = profiler.get_profile()
+    assert profile["block_count"] == 1
+    assert set(profile["phases"]) == set(profiler.BLOCK_PHASES) - {"check_asset_conservation"}
+    assert list(profile["messages"]) == ["send.parse"]
+    send_profile = profile["messages"]["send.parse"]
+    assert send_profile["count"] == 1
+    assert send_profile["sql_statements"] > 0
+    # debit, credit, send and their messages
+    assert send_profile["rows_written"] >= 3
+    block_profile = profile["phases"]["parse_block"]
+    assert block_profile["sql_statements"] > send_profile["sql_statements"]
+    assert block_profile["rows_written"] > send_profile["rows_written"]
+
+    prometheus = profiler.get_profile("prometheus")
+    assert isinstance(prometheus, profiler.PrometheusText)
+    assert "counterparty_parse_blocks_total 1\n" in prometheus
+    assert 'counterparty_parse_calls_total{kind="messages",name="send.parse"} 1\n' in (prometheus)
+
+
+def test_profile_disabled(server_db, enabled_profiler):
+    profiler.disable(server_db)
+    with profiler.profile(server_db, "parse_block"):
+        server_db.execute("SELECT 1")
+    assert profiler.PROFILE == {}
@@ -0,0 +1,144 @@
+#! /usr/bin/python3
+import pytest
+
+from counterpartycore.lib import config
+from counterpartycore.lib.backend import addrindexrs
+
+
+def make_transaction(tx_hash, confirmations=None):
+    transaction = {"txid": tx_hash, "hex": "00" * 100, "vout": []}
+    if confirmations is not None:
+        transaction["confirmations"] = confirmations
+    return transaction
+
+
+@pytest.fixture()
+def raw_transactions_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        config, "BACKEND_RAW_TRANSACTIONS_CACHE_FILE", str(tmp_path / "rawtransactions.cache.db")
+    )
+    cache = addrindexrs.RawTransactionsCache()
+    cache.new_block(100, "hash100")
+    return cache
+
+
+def test_confirmations(raw_transactions_cache):
+    raw_transactions_cache.set_many(
+        {
+            "confirmed": make_transaction("confirmed", 10),
+            "unconfirmed": make_transaction("unconfirmed"),
+            "missing": None,
+        },
+        100,
+    )
+    assert raw_transactions_cache.get_many(["confirmed", "unconfirmed", "missing"]) == {
+        "confirmed": make_transaction("confirmed", 10),
+        "unconfirmed": make_transaction("unconfirmed"),
+        "missing": None,
+    }
+
+    # only the unconfirmed and missing transactions are invalidated by a new block
+    raw_transactions_cache.new_block(102, "hash102")
+    assert raw_transactions_cache.get_many(["confirmed", "unconfirmed", "missing"]) == {
+        "confirmed": make_transaction("confirmed", 12),
+    }
+
+    # the transactions of the blocks removed by a reorg are invalidated
+    raw_transactions_cache.new_block(90, "hash90", reorg=True)
+    assert raw_transactions_cache.get_many(["confirmed"]) == {}
+
+
+def test_stale_block_count(raw_transactions_cache):
+    # fetched after a new block, before the next `new_block()`
+    raw_transactions_cache.set_many(
+        {
+            "confirmed": make_transaction("confirmed", 11),
+            "unconfirmed": make_transaction("unconfirmed"),
+        },
+        101,
+    )
+    assert raw_transactions_cache.get_many(["confirmed", "unconfirmed"]) == {
+        "unconfirmed": make_transaction("unconfirmed"),
+    }
+
+
+def test_reorg(raw_transactions_cache):
+    deep_confirmations = addrindexrs.RAW_TRANSACTIONS_STORE_MIN_CONFIRMATIONS
+    raw_transactions_cache.set_many(
+        {
+            "deep": make_transaction("deep", deep_confirmations),
+            "recent": make_transaction("recent", 2),
+        },
+        100,
+    )
+
+    # same block count, another tip
+    raw_transactions_cache.new_block(100, "otherhash100", reorg=True)
+    assert raw_transactions_cache.get_many(["deep", "recent"]) == {
+        "deep": make_transaction("deep", deep_confirmations),
+    }
+
+    # the stored transactions of the blocks that may be replaced are removed too
+    other_cache = addrindexrs.RawTransactionsCache()
+    other_cache.new_block(100, "otherhash100")
+    assert "deep" in other_cache.get_many(["deep"])
+    raw_transactions_cache.new_block(97, "hash97", reorg=True)
+    assert raw_transactions_cache.get_many(["deep"]) == {}
+    other_cache.clear()
+    assert other_cache.get_many(["deep"]) == {}
+
+
+def test_refresh_raw_transactions_cache(raw_transactions_cache, monkeypatch):
+    chain = {100: "hash100", 101: "hash101"}
+    monkeypatch.setattr(addrindexrs, "raw_transactions_cache", raw_transactions_cache)
+    monkeypatch.setattr(addrindexrs, "getblockcount", lambda: max(chain))
+    monkeypatch.setattr(addrindexrs, "getblockhash", lambda block_count: chain[block_count])
+    raw_transactions_cache.set_many({"recent": make_transaction("recent", 1)}, 100)
+
+    # new block
+    addrindexrs.refresh_raw_transactions_cache()
+    assert raw_transactions_cache.get_many(["recent"]) == {"recent": make_transaction("recent", 2)}
+
+    # the block of the last tip is replaced
+    chain.update({101: "otherhash101", 102: "hash102"})
+    addrindexrs.refresh_raw_transactions_cache()
+    assert (raw_transactions_cache.block_count, raw_transactions_cache.block_hash) == (
+        102,
+        "hash102",
+    )
+    assert raw_transactions_cache.get_many(["recent"]) == {}
+
+
+def test_reset_raw_transactions_cache(raw_transactions_cache):
+    raw_transactions_cache.set_many({"deep": make_transaction("deep", 10)}, 100)
+    addrindexrs.reset_raw_transactions_cache()
+    other_cache = addrindexrs.RawTransactionsCache()
+    other_cache.new_block(100, "hash100")
+    assert other_cache.get_many(["deep"]) == {}
+
+
+def test_shared_transactions(raw_transactions_cache):
+    raw_transactions_cache.set_many(
+        {
+            "deep": make_transaction("deep", addrindexrs.RAW_TRANSACTIONS_STORE_MIN_CONFIRMATIONS),
+            "recent": make_transaction("recent", 1),
+        },
+        100,
+    )
+
+    # another worker
+    other_cache = addrindexrs.RawTransactionsCache()
+    other_cache.new_block(101, "hash101")
+    assert other_cache.get_many(["deep", "recent"]) == {
+        "deep": make_transaction("deep", addrindexrs.RAW_TRANSACTIONS_STORE_MIN_CONFIRMATIONS + 1),
+    }
+
+
+def test_cache_size(raw_transactions_cache, monkeypatch):
+    raw_transactions_cache.set_many({"tx1": make_transaction("tx1", 1)}, 100)
+    monkeypatch.setattr(
+        addrindexrs, "RAW_TRANSACTIONS_CACHE_MAX_BYTES", raw_transactions_cache.size
+    )
+    raw_transactions_cache.set_many({"tx2": make_transaction("tx2", 1)}, 100)
+    assert raw_transactions_cache.size <= addrindexrs.RAW_TRANSACTIONS_CACHE_MAX_BYTES
+    assert raw_transactions_cache.get_many(["tx1", "tx2"]) == {"tx2": make_transaction("tx2", 1)}
@@ -0,0 +1,112 @@
+#! /usr/bin/python3
+import tempfile
+
+import pytest
+
+from counterpartycore.lib import blocks, config, database, ledger, snapshots, undolog, util
+from counterpartycore.test import (
+    conftest,  # noqa: F401
+    util_test,
+)
+
+# this is require near the top to do setup of the test suite
+from counterpartycore.test.util_test import CURR_DIR
+
+FIXTURE_SQL_FILE = CURR_DIR + "/fixtures/scenarios/unittest_fixture.sql"
+FIXTURE_DB = tempfile.gettempdir() + "/fixtures.unittest_fixture.db"
+
+
+@pytest.fixture()
+def snapshots_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "SNAPSHOTS_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(config, "SNAPSHOT_INTERVAL", 5)
+    return tmp_path
+
+
+@pytest.fixture()
+def copy_db(server_db, snapshots_dir, singleton_caches, monkeypatch):
+    # the fixtures start one block before the first block
+    monkeypatch.setattr(config, "BLOCK_FIRST", config.BLOCK_FIRST - 1)
+    # restoring a snapshot replaces the whole database
+    db_file = str(snapshots_dir / "ledger.db")
+    db = database.get_db_connection(db_file, read_only=False)
+    snapshots.backup(server_db, db)
+    yield db
+    db.close()
+    util_test.reset_current_block_index(server_db)
+
+
+def get_tables(db, block_index):
+    cursor = db.cursor()
+    tables = {}
+    for table in blocks.TABLES + ["blocks"]:
+        tables[table] = cursor.execute(
+            f"SELECT * FROM {table} WHERE block_index < ? ORDER BY rowid",  # noqa: S608
+            (block_index,),
+        ).fetchall()
+    return tables
+
+
+def test_take_snapshot(server_db, snapshots_dir):
+    snapshots.take_snapshot(server_db, 11)
+    assert snapshots.get_snapshots() == []
+
+    for block_index in [5, 10, 15, 20]:
+        snapshots.take_snapshot(server_db, block_index)
+    assert snapshots.get_snapshots() == [10, 15, 20]
+    assert snapshots.get_nearest_snapshot(20) == 15
+
+    # removed before the end of the catch up
+    snapshots.take_snapshot(server_db, 25, last_block_index=40)
+    assert snapshots.get_snapshots() == [10, 15, 20]
+    assert snapshots.get_nearest_snapshot(10) is None
+
+    snapshots.remove_from(15)
+    assert snapshots.get_snapshots() == [10]
+
+
+def test_rollback_from_snapshot(copy_db, monkeypatch):
+    snapshot_block_index = util.CURRENT_BLOCK_INDEX
+    monkeypatch.setattr(config, "SNAPSHOT_INTERVAL", 1)
+    snapshots.take_snapshot(copy_db, snapshot_block_index)
+    monkeypatch.setattr(config, "SNAPSHOT_INTERVAL", 0)
+    assert snapshots.get_snapshots() == [snapshot_block_index]
+
+    for _i in range(3):
+        util_test.create_next_block(copy_db)
+    # journal the blocks like a replay does
+    blocks.reparse(copy_db, snapshot_block_index + 1)
+    tables = get_tables(copy_db, snapshot_block_index + 2)
+    # too old for the undo log
+    copy_db.execute("DELETE FROM undo_log")
+
+    blocks.rollback(copy_db, snapshot_block_index + 2)
+
+    assert get_tables(copy_db, snapshot_block_index + 4) == tables
+    assert ledger.last_db_index(copy_db) == snapshot_block_index + 1
+    assert snapshots.get_snapshots() == [snapshot_block_index]
+    # the block after the snapshot is replayed
+    assert undolog.get_undo_rowids(copy_db, snapshot_block_index + 2) is not None
+
+
+def test_rollback_from_replay_snapshot(copy_db, monkeypatch):
+    first_block_index = util.CURRENT_BLOCK_INDEX + 1
+    for _i in range(3):
+        util_test.create_next_block(copy_db)
+    # the snapshots taken by the replay contain the blocks after them
+    monkeypatch.setattr(config, "SNAPSHOT_INTERVAL", 1)
+    blocks.reparse(copy_db, first_block_index)
+    monkeypatch.setattr(config, "SNAPSHOT_INTERVAL", 0)
+    assert snapshots.get_snapshots() == [
+        first_block_index,
+        first_block_index + 1,
+        first_block_index + 2,
+    ]
+    tables = get_tables(copy_db, first_block_index + 2)
+    copy_db.execute("DELETE FROM undo_log")
+
+    blocks.rollback(copy_db, first_block_index + 2)
+
+    assert get_tables(copy_db, first_block_index + 3) == tables
+    assert ledger.last_db_index(copy_db) == first_block_index + 1
+    assert snapshots.get_snapshots() == [first_block_index, first_block_index + 1]
@@ -0,0 +1,107 @@
+#! /usr/bin/python3
+import tempfile
+
+import pytest
+
+from counterpartycore.lib import blocks, ledger, undolog, util
+from counterpartycore.lib.messages import dispenser
+from counterpartycore.test import (
+    conftest,  # noqa: F401
+    util_test,
+)
+
+# this is require near the top to do setup of the test suite
+from counterpartycore.test.fixtures.params import ADDR
+from counterpartycore.test.util_test import CURR_DIR
+
+FIXTURE_SQL_FILE = CURR_DIR + "/fixtures/scenarios/unittest_fixture.sql"
+FIXTURE_DB = tempfile.gettempdir() + "/fixtures.unittest_fixture.db"
+
+
+@pytest.fixture()
+def caches(server_db, singleton_caches):
+    for cache in [ledger.AssetCache, ledger.OrdersCache, ledger.UTXOBalancesCache]:
+        cache(server_db)
+    dispenser.DispensableCache(server_db)
+    blocks.reset_caches(server_db)
+
+
+def get_tables(db):
+    cursor = db.cursor()
+    tables = {}
+    for table in blocks.TABLES + [f"{table}_current" for table in ledger.CURRENT_STATE_TABLES]:
+        tables[table] = cursor.execute(f"SELECT *, rowid FROM {table} ORDER BY rowid").fetchall()  # noqa: S608
+    return tables
+
+
+def get_caches(db):
+    asset_cache = ledger.AssetCache(db)
+    orders_cache = ledger.OrdersCache(db)
+    return {
+        "assets": asset_cache.assets,
+        "assets_total_issued": asset_cache.assets_total_issued,
+        "assets_total_destroyed": asset_cache.assets_total_destroyed,
+        "orders": orders_cache.cache_db.execute("SELECT * FROM orders ORDER BY tx_hash").fetchall(),
+        "utxos": ledger.UTXOBalancesCache(db).utxos_with_balance,
+        "dispensable": dispenser.DispensableCache(db).dispensable,
+    }
+
+
+def update_ledger(db):
+    util_test.create_next_block(db)
+    order = ledger.get_open_btc_orders(db, ADDR[0])[0]
+    ledger.update_order(db, order["tx_hash"], {"status": "cancelled"})
+    ledger.debit(db, ADDR[0], "DIVISIBLE", 100, 0, action="test", event="test")
+    destruction = {
+        "tx_index": 0,
+        "tx_hash": "test",
+        "block_index": util.CURRENT_BLOCK_INDEX,
+        "source": ADDR[0],
+        "asset": "DIVISIBLE",
+        "quantity": 100,
+        "tag": "test",
+        "status": "valid",
+    }
+    ledger.insert_record(db, "destructions", destruction, "ASSET_DESTRUCTION")
+    util_test.create_next_block(db)
+
+
+def test_undo_log_rollback(server_db, singleton_caches):
+    util_test.create_next_block(server_db)
+    block_index = util.CURRENT_BLOCK_INDEX + 1
+    tables = get_tables(server_db)
+
+    update_ledger(server_db)
+    assert get_tables(server_db) != tables
+    assert undolog.get_undo_rowids(server_db, block_index) is not None
+
+    blocks.clean_messages_tables(server_db, block_index=block_index)
+
+    assert get_tables(server_db) == tables
+    assert undolog.get_undo_rowids(server_db, block_index + 1) is None
+
+
+def test_invalid_undo_rowid(server_db):
+    util_test.create_next_block(server_db)
+    block_index = util.CURRENT_BLOCK_INDEX + 1
+    util_test.create_next_block(server_db)
+    undo_rowids = undolog.get_undo_rowids(server_db, block_index)
+
+    cursor = server_db.cursor()
+    for table in ["messages", "balances"]:
+        assert undolog.is_valid_undo_rowid(cursor, table, block_index, undo_rowids[table])
+        assert not undolog.is_valid_undo_rowid(cursor, table, block_index, undo_rowids[table] - 1)
+
+
+def test_rollback_patch_caches(server_db, caches):
+    util_test.create_next_block(server_db)
+    block_index = util.CURRENT_BLOCK_INDEX + 1
+    caches_before = get_caches(server_db)
+
+    update_ledger(server_db)
+    blocks.clean_messages_tables(server_db, block_index=block_index)
+    patched_caches = get_caches(server_db)
+
+    blocks.reset_caches(server_db)
+    assert patched_caches == get_caches(server_db)
+    assert patched_caches["assets_total_destroyed"] == caches_before["assets_total_destroyed"]
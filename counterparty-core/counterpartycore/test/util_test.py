@@ -41,6 +41,7 @@ from counterpartycore.lib import (  # noqa: E402
     gettxinfo,
     ledger,
     transaction,
+    undolog,
     util,
 )
 from counterpartycore.lib.api.util import to_json  # noqa: E402
@@ -71,6 +72,7 @@ COUNTERPARTYD_OPTIONS = {
     "p2sh_dust_return_pubkey": "11" * 33,
     "utxo_locks_max_addresses": 0,  # Disable UTXO locking for base test suite runs
     "estimate_fee_per_kb": False,
+    "snapshot_interval": 0,
 }
 
 # used for mocking the UTXO in various places, is automatically reset every test case
@@ -86,6 +88,8 @@ def init_database(sqlfile, dbfile, options=None):
     restore_database(config.DATABASE, sqlfile)
     db = database.get_connection(read_only=False)  # reinit the DB to deal with the restoring
     blocks.create_views(db)
+    blocks.create_current_state_tables(db)
+    undolog.initialise(db)
     database.update_version(db)
     util.FIRST_MULTISIG_BLOCK_TESTNET = 1
 
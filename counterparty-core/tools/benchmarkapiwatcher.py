@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+# Build an API database from the first events of a ledger database, one transaction per event
+# then with the batched catch up.
+# Usage: benchmarkapiwatcher.py <database_file> [mainnet|testnet|regtest] [event_count]
+
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from counterpartycore import server
+from counterpartycore.lib import config, log
+from counterpartycore.lib.api import api_watcher
+
+assert len(sys.argv) >= 2, "path to DB required"
+
+dbfile = sys.argv[1]
+network = sys.argv[2] if len(sys.argv) > 2 else "mainnet"
+event_count = int(sys.argv[3]) if len(sys.argv) > 3 else 200000
+
+if not os.path.isfile(dbfile):
+    print(f"dbfile {dbfile} does not exist")
+    sys.exit(1)
+
+server.initialise(
+    database_file=dbfile,
+    testnet=network == "testnet",
+    regtest=network == "regtest",
+    no_log_files=True,
+    quiet=True,
+    no_mempool=True,
+    # events are read from the database, no backend calls needed
+    backend_password="benchmark",  # noqa: S106
+)
+log.set_up(quiet=True)
+tmpdir = tempfile.mkdtemp()
+
+
+def benchmark_catch_up(name, parse_events):
+    config.API_DATABASE = os.path.join(tmpdir, f"{name}.api.db")
+    watcher = api_watcher.APIWatcher()
+    start_time = time.time()
+    parsed_count = parse_events(watcher)
+    duration = time.time() - start_time
+    watcher.api_db.close()
+    watcher.ledger_db.close()
+    print(
+        f"{name}: {parsed_count} events in {duration:.2f}s ({parsed_count / duration:.0f} events/s)"
+    )
+
+
+def parse_event_by_event(watcher):
+    parsed_count = 0
+    while parsed_count < event_count:
+        event = api_watcher.get_next_event_to_parse(watcher.api_db, watcher.ledger_db)
+        if event is None:
+            break
+        api_watcher.parse_event(watcher.api_db, event, watcher)
+        parsed_count += 1
+    return parsed_count
+
+
+def parse_events_by_batch(watcher):
+    events = itertools.islice(
+        api_watcher.get_events_to_parse(watcher.ledger_db, -1, config.API_WATCHER_BATCH_SIZE),
+        event_count,
+    )
+    parsed_count = 0
+    while True:
+        batch_event_count = api_watcher.parse_events_batch(
+            watcher.api_db, events, config.API_WATCHER_BATCH_SIZE, watcher.stop_event
+        )
+        if batch_event_count == 0:
+            return parsed_count
+        parsed_count += batch_event_count
+
+
+benchmark_catch_up("event by event", parse_event_by_event)
+benchmark_catch_up(f"batches of {config.API_WATCHER_BATCH_SIZE} events", parse_events_by_batch)
+
+shutil.rmtree(tmpdir)
@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+
+# Fetch transactions from a local stub of the Bitcoin Core RPC server, with a new connection
+# by call, with the keep-alive sessions and with JSON-RPC batches.
+# Usage: benchmarkbitcoindrpc.py [transaction_count] [batch_size]
+
+import http.server
+import json
+import sys
+import threading
+import time
+
+import requests
+from counterpartycore.lib import config
+from counterpartycore.lib.backend import bitcoind
+
+transaction_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else config.DEFAULT_RPC_BATCH_SIZE
+
+# a small segwit transaction
+RAW_TRANSACTION = "0200000000010199c94580cbea44aead18f429be20552e640804dc3b4808e39115197f1312954d000000001600147c6b1112ed7bc76fd03af8b91d02fd6942c5a8d0ffffffff0280f0fa02000000001976a914a11b66a67b3ff69671c8f82254099faf374b800e88ac70da0a27010000001600147c6b1112ed7bc76fd03af8b91d02fd6942c5a8d002000000000000"
+
+
+class StubRPCHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # the headers and the body are sent separately
+    disable_nagle_algorithm = True
+
+    def do_POST(self):  # noqa: N802
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if isinstance(payload, list):
+            result = [self.call(request) for request in payload]
+        else:
+            result = self.call(payload)
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def call(self, request):
+        return {"result": RAW_TRANSACTION, "error": None, "id": request["id"]}
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubRPCHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+config.BACKEND_URL = f"http://127.0.0.1:{server.server_port}"
+config.BACKEND_SSL_NO_VERIFY = False
+config.REQUESTS_TIMEOUT = 20
+config.RPC_BATCH_SIZE = batch_size
+tx_hashes = [f"{i:064x}" for i in range(transaction_count)]
+
+
+def fetch_with_new_connections():
+    for tx_hash in tx_hashes:
+        payload = {"method": "getrawtransaction", "params": [tx_hash, 0], "jsonrpc": "2.0", "id": 0}
+        requests.post(
+            config.BACKEND_URL,
+            data=json.dumps(payload),
+            headers={"content-type": "application/json"},
+            timeout=config.REQUESTS_TIMEOUT,
+        ).json()
+
+
+def fetch_with_session():
+    for tx_hash in tx_hashes:
+        bitcoind.rpc("getrawtransaction", [tx_hash, 0])
+
+
+def fetch_with_batches():
+    bitcoind.getrawtransaction_batch(tx_hashes)
+
+
+def benchmark(name, fetch):
+    start_time = time.time()
+    fetch()
+    duration = time.time() - start_time
+    print(
+        f"{name}: {transaction_count} transactions in {duration:.2f}s ({transaction_count / duration:.0f} tx/s)"
+    )
+
+
+benchmark("one connection by call", fetch_with_new_connections)
+benchmark("keep-alive session", fetch_with_session)
+benchmark(f"batches of {batch_size} calls", fetch_with_batches)
+
+server.shutdown()
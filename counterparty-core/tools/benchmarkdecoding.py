@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+# Decode the transactions of a range of blocks sequentially then with the
+# parallel decoding stage and report the throughput of both.
+# Needs a running Bitcoin Core with `txindex` enabled.
+# Usage: benchmarkdecoding.py <from_block_index> <to_block_index> [mainnet|testnet|regtest] [workers]
+
+import copy
+import sys
+import time
+
+from counterpartycore import server
+from counterpartycore.lib import backend, blockdecoder, config, gettxinfo, log, util
+
+assert len(sys.argv) >= 3, "block range required"
+
+from_block_index = int(sys.argv[1])
+to_block_index = int(sys.argv[2])
+network = sys.argv[3] if len(sys.argv) > 3 else "mainnet"
+workers = int(sys.argv[4]) if len(sys.argv) > 4 else config.DEFAULT_DECODING_WORKERS
+
+
+class ListFetcher:
+    def __init__(self, decoded_blocks):
+        self.decoded_blocks = decoded_blocks
+        self.next_height = decoded_blocks[0]["height"]
+
+    def get_block(self):
+        decoded_block = copy.deepcopy(self.decoded_blocks[self.next_height - from_block_index])
+        self.next_height += 1
+        return decoded_block
+
+
+def decode_sequentially(decoded_blocks):
+    results = []
+    for decoded_block in decoded_blocks:
+        util.CURRENT_BLOCK_INDEX = decoded_block["height"]
+        for decoded_tx in copy.deepcopy(decoded_block["transactions"]):
+            try:
+                predecoded = gettxinfo.predecode_tx(decoded_tx, decoded_block["height"])
+            except Exception:  # noqa: S112
+                continue
+            if predecoded is not None:
+                results.append((decoded_tx["tx_hash"], repr(predecoded.get("parsed_sources"))))
+    return results
+
+
+def decode_in_parallel(decoded_blocks):
+    results = []
+    decoder = blockdecoder.BlockDecoder(ListFetcher(decoded_blocks), workers)
+    for _decoded_block in decoded_blocks:
+        decoded_block = decoder.get_block(to_block_index)
+        for decoded_tx in decoded_block["transactions"]:
+            # predecoded inputs carry the value of the spent outputs
+            if decoded_tx["vin"] and "value" in decoded_tx["vin"][0]:
+                results.append((decoded_tx["tx_hash"], repr(decoded_tx.get("parsed_sources"))))
+    decoder.stop()
+    return results
+
+
+if __name__ == "__main__":
+    server.initialise(
+        testnet=network == "testnet",
+        regtest=network == "regtest",
+        no_log_files=True,
+        quiet=True,
+    )
+    log.set_up(quiet=True)
+
+    print(f"Fetching blocks {from_block_index} to {to_block_index}...")
+    decoded_blocks = []
+    for block_index in range(from_block_index, to_block_index + 1):
+        util.CURRENT_BLOCK_INDEX = block_index
+        decoded_block = backend.bitcoind.get_decoded_block(block_index)
+        decoded_block["height"] = block_index
+        decoded_blocks.append(decoded_block)
+    tx_count = sum(len(decoded_block["transactions"]) for decoded_block in decoded_blocks)
+
+    # don't let the sequential run warm the cache for the parallel one
+    backend.bitcoind.TRANSACTIONS_CACHE.clear()
+    start_time = time.time()
+    sequential_results = decode_sequentially(decoded_blocks)
+    sequential_duration = time.time() - start_time
+
+    backend.bitcoind.TRANSACTIONS_CACHE.clear()
+    start_time = time.time()
+    parallel_results = decode_in_parallel(decoded_blocks)
+    parallel_duration = time.time() - start_time
+
+    print(f"Blocks: {len(decoded_blocks)}")
+    print(f"Transactions: {tx_count}")
+    print(f"Predecoded transactions: {len(sequential_results)}")
+    print(f"Sequential: {sequential_duration:.3f}s ({tx_count / sequential_duration:.2f} tx/s)")
+    print(f"Parallel ({workers} workers): {parallel_duration:.3f}s", end=" ")
+    print(f"({tx_count / parallel_duration:.2f} tx/s)")
+    print(f"Identical results: {sequential_results == parallel_results}")
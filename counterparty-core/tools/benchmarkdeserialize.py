@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+# Decode the raw transactions of the test fixtures one by one and grouped in a block, from hex
+# (RPC) and from bytes (ZMQ), or the blocks of a file with one raw block in hex by line.
+# Usage: benchmarkdeserialize.py [iterations] [blocks_file]
+
+import os
+import sqlite3
+import struct
+import sys
+import time
+
+from counterpartycore.lib import deserialize
+
+iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+blocks_file = sys.argv[2] if len(sys.argv) > 2 else None
+
+CURR_DIR = os.path.dirname(os.path.realpath(__file__))
+RAW_TRANSACTIONS_DB = os.path.join(
+    CURR_DIR, "..", "counterpartycore", "test", "fixtures", "rawtransactions.db"
+)
+
+
+def get_blocks():
+    if blocks_file is not None:
+        with open(blocks_file) as f:
+            return [line.strip() for line in f if line.strip()]
+    db = sqlite3.connect(RAW_TRANSACTIONS_DB)
+    transactions_hex = [row[0] for row in db.execute("SELECT tx_hex FROM raw_transactions")]
+    db.close()
+    # fake header followed by a `compact size` of 0xfd and all the transactions
+    header = struct.pack("<i32s32sIII", 4, b"\x00" * 32, b"\x00" * 32, 0, 0, 0)
+    transaction_count = struct.pack("<BH", 253, len(transactions_hex))
+    return [(header + transaction_count).hex() + "".join(transactions_hex)]
+
+
+def benchmark(name, decode, blocks):
+    start_time = time.time()
+    tx_count = 0
+    for _i in range(iterations):
+        for block in blocks:
+            tx_count += decode(block)
+    duration = time.time() - start_time
+    print(f"{name}: {tx_count} transactions in {duration:.2f}s ({tx_count / duration:.0f} tx/s)")
+
+
+def decode_transactions(block_hex):
+    transactions = deserialize.deserialize_block(block_hex, use_txid=True)["transactions"]
+    for transaction in transactions:
+        deserialize.deserialize_tx(transaction["__data__"], use_txid=True)
+    return len(transactions)
+
+
+def decode_block_hex(block_hex):
+    return len(deserialize.deserialize_block(block_hex, use_txid=True)["transactions"])
+
+
+def decode_block_bytes(block_bytes):
+    return len(deserialize.deserialize_block(block_bytes, use_txid=True)["transactions"])
+
+
+def decode_block_wtxid(block_bytes):
+    return len(deserialize.deserialize_block(block_bytes, use_txid=False)["transactions"])
+
+
+blocks_hex = get_blocks()
+blocks_bytes = [bytes.fromhex(block_hex) for block_hex in blocks_hex]
+
+# the first one includes the decoding of the block, for its transactions
+benchmark("block then transactions from hex", decode_transactions, blocks_hex)
+benchmark("block from hex", decode_block_hex, blocks_hex)
+benchmark("block from bytes", decode_block_bytes, blocks_bytes)
+benchmark("block from bytes with wtxids", decode_block_wtxid, blocks_bytes)
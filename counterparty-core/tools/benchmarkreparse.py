@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+
+# Reparse a copy of a ledger database and report the journal throughput.
+# Usage: benchmarkreparse.py <database_file> [from_block_index] [mainnet|testnet|regtest]
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from counterpartycore import server
+from counterpartycore.lib import blocks, config, ledger, log, util
+
+assert len(sys.argv) >= 2, "path to DB required"
+
+dbfile = sys.argv[1]
+network = sys.argv[3] if len(sys.argv) > 3 else "mainnet"
+
+if not os.path.isfile(dbfile):
+    print(f"dbfile {dbfile} does not exist")
+    sys.exit(1)
+
+# never touch the original database
+tmpdir = tempfile.mkdtemp()
+bench_dbfile = os.path.join(tmpdir, os.path.basename(dbfile))
+print(f"Copying {dbfile} to {bench_dbfile}...")
+shutil.copyfile(dbfile, bench_dbfile)
+
+db = server.initialise(
+    database_file=bench_dbfile,
+    testnet=network == "testnet",
+    regtest=network == "regtest",
+    no_log_files=True,
+    quiet=True,
+    # blocks are replayed from the database, no backend calls needed
+    backend_password="benchmark",  # noqa: S106
+)
+log.set_up(quiet=True)
+util.CURRENT_BLOCK_INDEX = ledger.last_db_index(db)
+
+from_block_index = int(sys.argv[2]) if len(sys.argv) > 2 else config.BLOCK_FIRST
+block_count = util.CURRENT_BLOCK_INDEX - from_block_index + 1
+
+start_time = time.time()
+blocks.reparse(db, block_index=from_block_index)
+duration = time.time() - start_time
+
+cursor = db.cursor()
+event_count = cursor.execute(
+    "SELECT COUNT(*) AS cnt FROM messages WHERE block_index >= ?", (from_block_index,)
+).fetchone()["cnt"]
+
+print(f"Blocks reparsed: {block_count}")
+print(f"Events journaled: {event_count}")
+print(f"Duration: {duration:.3f}s")
+print(f"Blocks/s: {block_count / duration:.2f}")
+print(f"Events/s: {event_count / duration:.2f}")
+
+db.close()
+shutil.rmtree(tmpdir)
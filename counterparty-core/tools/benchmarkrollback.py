@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+
+# Roll back copies of a ledger database by 1, 6 and 100 blocks, with and without the undo log.
+# Usage: benchmarkrollback.py <database_file> [mainnet|testnet|regtest]
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from counterpartycore import server
+from counterpartycore.lib import blocks, database, ledger, log, util
+
+ROLLBACK_DEPTHS = [1, 6, 100]
+
+assert len(sys.argv) >= 2, "path to DB required"
+
+dbfile = sys.argv[1]
+network = sys.argv[2] if len(sys.argv) > 2 else "mainnet"
+
+if not os.path.isfile(dbfile):
+    print(f"dbfile {dbfile} does not exist")
+    sys.exit(1)
+
+# never touch the original database
+tmpdir = tempfile.mkdtemp()
+bench_dbfile = os.path.join(tmpdir, os.path.basename(dbfile))
+print(f"Copying {dbfile} to {bench_dbfile}...")
+shutil.copyfile(dbfile, bench_dbfile)
+
+db = server.initialise(
+    database_file=bench_dbfile,
+    testnet=network == "testnet",
+    regtest=network == "regtest",
+    no_log_files=True,
+    quiet=True,
+    # blocks are replayed from the database, no backend calls needed
+    backend_password="benchmark",  # noqa: S106
+)
+log.set_up(quiet=True)
+last_block_index = ledger.last_db_index(db)
+
+# reparse the last blocks to fill the undo log
+print(f"Reparsing the last {max(ROLLBACK_DEPTHS)} blocks...")
+util.CURRENT_BLOCK_INDEX = last_block_index
+blocks.reparse(db, block_index=last_block_index - max(ROLLBACK_DEPTHS) + 1)
+db.close()
+
+
+def benchmark_rollback(depth, with_undo_log):
+    run_dbfile = os.path.join(tmpdir, f"rollback.{depth}.db")
+    shutil.copyfile(bench_dbfile, run_dbfile)
+    run_db = database.get_db_connection(run_dbfile, read_only=False)
+    if not with_undo_log:
+        run_db.execute("DELETE FROM undo_log")
+    util.CURRENT_BLOCK_INDEX = last_block_index
+    blocks.reset_caches(run_db)
+
+    start_time = time.time()
+    blocks.rollback(run_db, block_index=last_block_index - depth + 1)
+    duration = time.time() - start_time
+
+    run_db.close()
+    os.remove(run_dbfile)
+    return duration
+
+
+for depth in ROLLBACK_DEPTHS:
+    undo_log_duration = benchmark_rollback(depth, with_undo_log=True)
+    block_index_duration = benchmark_rollback(depth, with_undo_log=False)
+    print(
+        f"{depth} block(s): {undo_log_duration:.3f}s with undo log, "
+        f"{block_index_duration:.3f}s without"
+    )
+
+shutil.rmtree(tmpdir)
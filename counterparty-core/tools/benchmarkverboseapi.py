@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+# Time the enrichment of verbose API responses, with the asset info and block time lookups
+# sent to the database then served by the caches of the API workers.
+# Usage: benchmarkverboseapi.py <database_file> [mainnet|testnet|regtest] [iterations]
+
+import copy
+import os
+import sys
+import time
+
+import flask
+from counterpartycore import server
+from counterpartycore.lib import config, database, ledger, log, util
+from counterpartycore.lib.api import queries
+from counterpartycore.lib.api.util import inject_details
+
+QUERIES = {
+    "events": queries.get_all_events,
+    "orders": queries.get_orders,
+    "issuances": queries.get_issuances,
+    "dispenses": queries.get_dispenses,
+}
+
+assert len(sys.argv) >= 2, "path to DB required"
+
+dbfile = sys.argv[1]
+network = sys.argv[2] if len(sys.argv) > 2 else "mainnet"
+iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+if not os.path.isfile(dbfile):
+    print(f"dbfile {dbfile} does not exist")
+    sys.exit(1)
+
+server.initialise(
+    database_file=dbfile,
+    testnet=network == "testnet",
+    regtest=network == "regtest",
+    no_log_files=True,
+    quiet=True,
+    # nothing is parsed, no backend calls needed
+    backend_password="benchmark",  # noqa: S106
+)
+log.set_up(quiet=True)
+
+if not os.path.isfile(config.API_DATABASE):
+    print(f"API database {config.API_DATABASE} does not exist")
+    sys.exit(1)
+
+api_db = database.get_db_connection(config.API_DATABASE, read_only=True, check_wal=False)
+util.CURRENT_BLOCK_INDEX = ledger.last_db_index(api_db)
+
+
+def benchmark_inject_details(name, query_function, use_worker_caches):
+    result = query_function(api_db, limit=100).result
+    start_time = time.time()
+    for _ in range(iterations):
+        inject_details(api_db, copy.deepcopy(result), use_worker_caches=use_worker_caches)
+    duration = (time.time() - start_time) / iterations
+    caches = "worker caches" if use_worker_caches else "database"
+    print(f"{name} ({len(result)} rows) from the {caches}: {duration * 1000:.2f}ms per request")
+
+
+# the queries read the `show_unconfirmed` parameter of the request
+with flask.Flask(config.APP_NAME).test_request_context():
+    for query_name, query_function in QUERIES.items():
+        benchmark_inject_details(query_name, query_function, use_worker_caches=False)
+        benchmark_inject_details(query_name, query_function, use_worker_caches=True)
+
+api_db.close()